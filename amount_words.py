@@ -0,0 +1,126 @@
+"""Amounts in words with Indian numbering (lakh / crore).
+
+The invoice prints the total in words in cell A37 ("AMOUNT : One Lakh  Twenty
+Three Thousand ... Only") and the preview shows the same text.  Both used to
+go through ``num2words(n, lang='en_IN')``, which builds the words by recursive
+splitting and merging on every call, followed by string clean-up.  This module
+produces the identical text directly from the crore / lakh / thousand /
+hundred groups and caches the result, since the same totals come up again and
+again.
+
+``number_to_words`` matches ``num2words(n, lang='en_IN')`` exactly (including
+its limit of 999 crore); ``amount_in_words`` adds the invoice formatting and
+optionally paise.  ``python amount_words.py`` checks it against num2words and
+times both.
+"""
+from __future__ import annotations
+
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+
+MAX_AMOUNT = 10 ** 10  # num2words' en_IN limit
+
+_ONES = [
+    'zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine',
+    'ten', 'eleven', 'twelve', 'thirteen', 'fourteen', 'fifteen', 'sixteen',
+    'seventeen', 'eighteen', 'nineteen',
+]
+_TENS = ['', '', 'twenty', 'thirty', 'forty', 'fifty', 'sixty', 'seventy', 'eighty', 'ninety']
+
+
+def _below_100(n: int) -> str:
+    if n < 20:
+        return _ONES[n]
+    tens, ones = divmod(n, 10)
+    return f"{_TENS[tens]}-{_ONES[ones]}" if ones else _TENS[tens]
+
+
+def _below_1000(n: int) -> str:
+    hundreds, rest = divmod(n, 100)
+    if not hundreds:
+        return _below_100(rest)
+    if not rest:
+        return f"{_ONES[hundreds]} hundred"
+    return f"{_ONES[hundreds]} hundred and {_below_100(rest)}"
+
+
+@lru_cache(maxsize=4096)
+def number_to_words(n: int) -> str:
+    """Same text as ``num2words(n, lang='en_IN')`` for whole numbers."""
+    if n < 0:
+        return "minus " + number_to_words(-n)
+    if n >= MAX_AMOUNT:
+        raise OverflowError(f"abs({n}) must be less than {MAX_AMOUNT}.")
+    if n == 0:
+        return 'zero'
+    crore, rest = divmod(n, 10 ** 7)
+    lakh, rest = divmod(rest, 10 ** 5)
+    thousand, rest = divmod(rest, 1000)
+    groups = []
+    if crore:
+        groups.append((f"{_below_1000(crore)} crore", crore * 10 ** 7))
+    if lakh:
+        groups.append((f"{_below_100(lakh)} lakh", lakh * 10 ** 5))
+    if thousand:
+        groups.append((f"{_below_100(thousand)} thousand", thousand * 1000))
+    if rest:
+        groups.append((_below_1000(rest), rest))
+    text = groups[0][0]
+    for words, value in groups[1:]:
+        # num2words joins a trailing part below 100 with "and", others with ","
+        text += f" and {words}" if value < 100 else f", {words}"
+    return text
+
+
+@lru_cache(maxsize=4096)
+def _title_words(n: int, comma: str) -> str:
+    return number_to_words(n).replace('-', ' ').replace(',', comma).title()
+
+
+def amount_in_words(amount, comma: str = ' ', paise: bool = False) -> str:
+    """Invoice text for an amount, e.g. 'One Lakh  Twenty Three Thousand Only'.
+
+    ``comma`` replaces num2words' commas: ``' '`` gives the A37 text (double
+    space after each group), ``''`` the single-spaced preview text.  With
+    ``paise=True`` a fractional amount reads '... And Fifty Paise Only';
+    otherwise only the whole rupees are written, as on the invoice.
+    """
+    if amount is None:
+        return "Zero Only"
+    if not paise:
+        return _title_words(int(amount), comma) + " Only"
+    value = Decimal(str(amount)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    sign = "Minus " if value < 0 else ""
+    rupees, cents = divmod(int(abs(value) * 100), 100)
+    parts = [_title_words(rupees, comma)] if rupees or not cents else []
+    if cents:
+        parts.append(_title_words(cents, comma) + " Paise")
+    return sign + " And ".join(parts) + " Only"
+
+
+__all__ = ["number_to_words", "amount_in_words", "MAX_AMOUNT"]
+
+
+if __name__ == '__main__':
+    # Manual check: python amount_words.py
+    import random
+    import time
+    from num2words import num2words
+
+    def num2words_path(n):
+        return num2words(int(n), lang='en_IN').replace('-', ' ').replace(',', ' ').title() + " Only"
+
+    rng = random.Random(2025)
+    values = list(range(-1000, 300000)) + [rng.randrange(MAX_AMOUNT) for _ in range(300000)]
+    mismatches = [n for n in values if amount_in_words(n) != num2words_path(n)]
+    print(f"{len(values)} values checked, {len(mismatches)} mismatches {mismatches[:10]}")
+
+    # Typical use: the same few thousand totals converted repeatedly
+    totals = [rng.randint(1, 500000) for _ in range(2000)] * 25
+    number_to_words.cache_clear()
+    _title_words.cache_clear()
+    for label, fn in (("num2words", num2words_path), ("amount_words", amount_in_words)):
+        start = time.perf_counter()
+        for n in totals:
+            fn(n)
+        print(f"{label:>12}: {(time.perf_counter() - start) / len(totals) * 1e6:.2f} us per amount")
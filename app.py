@@ -7,65 +7,86 @@ A Flask-based invoice generation system for GST billing with features:
 - Transport mode management (type or select)
 - Load and edit existing invoices
 - Excel generation with formulas
-- PDF conversion (Windows only)
+- PDF conversion (Excel on Windows, built-in renderer elsewhere)
 """
 
+import atexit
+import itertools
 import os
 import json
 import re
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory, flash, jsonify
+import sqlite3
+import tempfile
+from flask import (Flask, Response, render_template, request, redirect, url_for, send_file, send_from_directory,
+                   flash, jsonify, stream_with_context)
 from datetime import datetime
 import uuid
-from num2words import num2words
-import pythoncom
-from typing import Any, List, Dict, Optional
+from typing import Any, List, Dict, Optional, Tuple
 from copy1 import copy_excel_with_formatting
+from xlsx_patch import patch_excel_template
+from pdf_service import (
+    WIN32COM_AVAILABLE, BuiltinConverter, ExcelConverter, PdfConverterService
+)
+from invoice_index import InvoiceIndex, invoice_summary
+from invoice_search import InvoiceSearchIndex
+from invoice_listing import InvoiceListing
+from reports import GstReports, financial_year
+from register_export import EXPORT_FORMATS, check_date, csv_chunks, matching_invoices, register_rows, write_xlsx
+from zip_stream import stream_zip
+from journal import ChangeJournal
+from change_log import ChangeLog, content_token
+from invoice_numbers import InvoiceNumberAllocator, DuplicateInvoiceNumber, _financial_year_suffix
+from profile_store import ProfileStore, ProfileConflict, profile_version
+from profile_search import ProfileSearchIndex
+from profile_dedup import plan_cleanup, apply_plan, plan_summary
+from atomic_io import atomic_write_json, lock_for
+from xlsx_reader import read_cells
+from transport import extract_transport_core, normalize_transport_mode
+from tax_rules import client_rules, preview_values
 from config import (
     BUYER_PROFILES_JSON, TRANSPORT_MODES_JSON, OUTPUT_DIR, 
-    PDF_OUTPUT_DIR, TEMPLATE_EXCEL_FILE, ensure_dirs, BASE_DIR
+    PDF_OUTPUT_DIR, TEMPLATE_EXCEL_FILE, ensure_dirs,
+    INVOICE_INDEX_JSON, INVOICE_ENGINE, PDF_BACKEND, PDF_WORKERS,
+    PDF_QUEUE_SIZE, PDF_TIMEOUT, STORAGE_BACKEND, SQLITE_DB, JOURNAL_DIR,
+    JOURNAL_COMPACT_EVERY, JOURNAL_RETENTION_DAYS, INVOICE_NUMBERS_JSON, CHANGE_LOG_DIR
 )
 
-# Attempt to import win32com.client for PDF conversion
-try:
-    import win32com.client
-    WIN32COM_AVAILABLE = True
-except ImportError:
-    WIN32COM_AVAILABLE = False
-    print("WARNING: pywin32 library not found. PDF conversion will be skipped.")
-
-# Optional openpyxl for reading invoices
-try:
-    import openpyxl
-    OPENPYXL_AVAILABLE = True
-except ImportError:
-    OPENPYXL_AVAILABLE = False
-    print("WARNING: openpyxl not found. Loading old invoices will be limited.")
-
 app = Flask(__name__)
 app.secret_key = 'shakambhari-secret-key-2024-secure'
+# Tax rules rendered into templates/tax_rules.js for the live preview
+app.jinja_env.globals['tax_rules'] = client_rules()
 ensure_dirs()
 
-BACKUP_DIR = os.path.join(BASE_DIR, "_backups")
-os.makedirs(BACKUP_DIR, exist_ok=True)
+# Every change to the JSON data files is journaled (see journal.py)
+journal = ChangeJournal(JOURNAL_DIR, JOURNAL_COMPACT_EVERY, JOURNAL_RETENTION_DAYS)
+journal.prune()  # drop history past the retention even if nothing is saved for a while
 
+# Excel generation engines (selected with INVOICE_ENGINE in config.py)
+INVOICE_WRITERS = {
+    'openpyxl': copy_excel_with_formatting,
+    'zip': patch_excel_template,
+}
+if INVOICE_ENGINE not in INVOICE_WRITERS:
+    print(f"WARNING: Unknown INVOICE_ENGINE '{INVOICE_ENGINE}', using openpyxl.")
+write_invoice_workbook = INVOICE_WRITERS.get(INVOICE_ENGINE, copy_excel_with_formatting)
 
-# ===================== UTILITY FUNCTIONS =====================
+# Optional SQLite storage (selected with STORAGE_BACKEND in config.py)
+sqlite_store = None
+if STORAGE_BACKEND == 'sqlite':
+    from sqlite_store import SqliteStore
+    sqlite_store = SqliteStore(SQLITE_DB)
+elif STORAGE_BACKEND != 'json':
+    print(f"WARNING: Unknown STORAGE_BACKEND '{STORAGE_BACKEND}', using json.")
 
-def backup_json(path: str) -> None:
-    """Create a timestamped backup of a JSON file."""
-    if not os.path.isfile(path):
-        return
-    try:
-        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_file = os.path.join(BACKUP_DIR, f"{os.path.basename(path)}.{stamp}.bak")
-        with open(path, 'rb') as src, open(backup_file, 'wb') as dst:
-            dst.write(src.read())
-    except Exception as e:
-        print(f"WARNING: Backup failed for {path}: {e}")
 
+# ===================== UTILITY FUNCTIONS =====================
 
 def load_data(json_path: str) -> List:
-    """Load JSON data from a file."""
+    """Load JSON data from a file (or its table when SQLite storage is on)."""
+    if sqlite_store is not None and json_path == BUYER_PROFILES_JSON:
+        return sqlite_store.load_profiles()
+    if sqlite_store is not None and json_path == TRANSPORT_MODES_JSON:
+        return sqlite_store.load_transport_modes()
     try:
         with open(json_path, 'r', encoding='utf-8') as f:
             return json.load(f)
@@ -76,81 +97,107 @@ def load_data(json_path: str) -> List:
         return []
 
 
+def journal_change(json_path: str, old: Any, new: Any) -> None:
+    """Append the change to the data file's journal (never fails the save)."""
+    try:
+        journal.record(os.path.basename(json_path), old, new)
+    except Exception as e:
+        print(f"WARNING: Journaling failed for {json_path}: {e}")
+
+
 def save_data(json_path: str, data: Any) -> bool:
-    """Save data to a JSON file with backup."""
+    """Save data to a JSON file and journal the change.
+
+    The file is replaced atomically while holding its inter-process lock;
+    callers doing read-modify-write should hold ``lock_for(json_path)`` around
+    the whole sequence (the lock is re-entrant).
+
+    With SQLite storage the profile and transport lists are written to their
+    tables instead, touching only the rows that changed; the change is
+    journaled either way.
+    """
     try:
-        backup_json(json_path)
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        with lock_for(json_path):
+            previous = load_data(json_path)
+            if sqlite_store is not None and json_path == BUYER_PROFILES_JSON:
+                sqlite_store.save_profiles(data)
+            elif sqlite_store is not None and json_path == TRANSPORT_MODES_JSON:
+                sqlite_store.save_transport_modes(data)
+            else:
+                atomic_write_json(json_path, data, indent=4)
+            journal_change(json_path, previous, data)
         return True
-    except IOError as e:
+    except (IOError, TimeoutError, sqlite3.Error) as e:
         print(f"Error saving data to {json_path}: {e}")
         return False
 
 
-def _financial_year_suffix(today: datetime = None) -> str:
-    """Get the financial year suffix like /2025-26."""
-    today = today or datetime.now()
-    year = today.year
-    if today.month >= 4:
-        start = year
-        end = year + 1
-    else:
-        start = year - 1
-        end = year
-    return f"/{start}-{str(end)[-2:]}"
+# Versions of the collections the invoice form polls, shared by all worker
+# processes (see change_log.py)
+invoice_changes = ChangeLog('invoices', os.path.join(CHANGE_LOG_DIR, 'invoices.log'))
+profile_changes = ChangeLog('profiles', os.path.join(CHANGE_LOG_DIR, 'profiles.log'))
+number_changes = ChangeLog('invoice-numbers', os.path.join(CHANGE_LOG_DIR, 'invoice_numbers.log'))
 
+# Buyer profiles cached in memory, reloaded when the file changes on disk
+profile_search = ProfileSearchIndex()
 
-def next_invoice_number(existing_files: List[str]) -> str:
-    """Calculate the next invoice number based on existing files."""
-    max_num = 0
-    pattern = re.compile(r"Invoice_(\d+)_")
-    for fname in existing_files:
-        m = pattern.search(fname)
-        if m:
-            try:
-                num = int(m.group(1))
-                if num > max_num:
-                    max_num = num
-            except ValueError:
-                continue
-    return f"{max_num + 1:03d}{_financial_year_suffix()}"
 
-
-def suggest_next_invoice_number() -> str:
-    """Get the suggested next invoice number."""
-    try:
-        files = os.listdir(OUTPUT_DIR)
-    except FileNotFoundError:
-        files = []
-    return next_invoice_number(files)
+def _on_profile_changed(profile_id: str, profile: Optional[Dict]) -> None:
+    """Profile store listener: keep the buyer search index and the profiles version current."""
+    profile_changes.record(profile_id, profile_version(profile) if profile is not None else None)
+    if profile_search.ready:
+        profile_search.update(profile_id, profile)
 
 
-TRANSPORT_PREFIX_VARIANTS = [
-    'mode of transport:', 'mode of transports:', 
-    'mode of transport', 'mode of transports'
-]
-
-
-def extract_transport_core(raw: str) -> str:
-    """Extract the core transport value without prefix."""
-    if not raw:
-        return ''
-    val = raw.strip()
-    low = val.lower()
-    for prefix in TRANSPORT_PREFIX_VARIANTS:
-        if low.startswith(prefix):
-            val = val[len(prefix):].strip(' -:')
-            break
-    return val.strip()
+profile_store = ProfileStore(
+    BUYER_PROFILES_JSON, load_data, save_data,
+    signature=sqlite_store.profiles_version if sqlite_store is not None else None,
+    lock=lambda: lock_for(BUYER_PROFILES_JSON),
+    listener=_on_profile_changed
+)
 
+# Buyer profiles embedded in the invoice form; the rest come from /api/profiles/search
+EMBEDDED_PROFILES = 50
+
+
+def search_profiles(query: str, limit: int = 20) -> List[Dict]:
+    """Buyer profiles best matching ``query`` (first by name if it is empty)."""
+    profile_store.refresh()
+    if not query.strip():
+        return [dict(p) for p in profile_store.sorted_profiles()[:limit]]
+    if not profile_search.ready:
+        profile_search.rebuild(profile_store.sorted_profiles())
+    results = []
+    for profile_id, score in profile_search.search(query, limit):
+        profile = profile_store.get(profile_id)
+        if profile is not None:
+            results.append(dict(profile, score=score))
+    return results
+
+
+def match_buyer_profile(invoice_data: Dict) -> Optional[Dict]:
+    """The buyer profile of a loaded invoice: saved id, else GSTIN, else name."""
+    profile = profile_store.get(invoice_data.get('buyer_profile_id'))
+    if profile is not None:
+        return profile
+    buyer_details = invoice_data.get('buyer_details') or []
+    profiles = profile_store.sorted_profiles()
+    for detail in buyer_details:
+        m = _GSTIN_RE.search(detail)
+        if m:
+            profile = next((p for p in profiles if p.get('gstin') == m.group(1)), None)
+            if profile is not None:
+                return dict(profile)
+    if len(buyer_details) > 1:
+        buyer_name = buyer_details[1].lower()
+        for p in profiles:
+            name = p['buyer_name'].lower()
+            if name == buyer_name or buyer_name in name or name in buyer_name:
+                return dict(p)
+    return None
 
-def normalize_transport_mode(raw: str) -> str:
-    """Normalize transport mode to a canonical format."""
-    core = extract_transport_core(raw)
-    if not core:
-        return ''
-    return f"Mode of Transport: {core}"
+# Invoice numbers per financial year, seeded once from OUTPUT_DIR
+invoice_numbers = InvoiceNumberAllocator(INVOICE_NUMBERS_JSON, OUTPUT_DIR)
 
 
 def save_new_transport_mode(transport_value: str) -> bool:
@@ -162,183 +209,312 @@ def save_new_transport_mode(transport_value: str) -> bool:
     if not core_value:
         return False
     
-    transport_modes = load_data(TRANSPORT_MODES_JSON)
+    with lock_for(TRANSPORT_MODES_JSON):
+        transport_modes = load_data(TRANSPORT_MODES_JSON)
+        
+        # Check if this transport mode already exists (case-insensitive)
+        existing_cores = set()
+        for mode in transport_modes:
+            existing_cores.add(extract_transport_core(mode).lower())
+        
+        if core_value.lower() not in existing_cores:
+            transport_modes.append(f"Mode of Transport: {core_value}")
+            save_data(TRANSPORT_MODES_JSON, transport_modes)
+            print(f"Saved new transport mode: {core_value}")
+            return True
+    return False
+
+
+def parse_invoice_date(raw: Any) -> str:
+    """ISO date (YYYY-MM-DD) from an H2 value like 'Date : 01/04/2025', or ''."""
+    if isinstance(raw, datetime):
+        return raw.strftime('%Y-%m-%d')
+    if not raw:
+        return ''
+    date_str = str(raw).replace('Date :', '').replace('Date:', '').strip()
+    try:
+        return datetime.strptime(date_str, '%d/%m/%Y').strftime('%Y-%m-%d')
+    except ValueError:
+        try:
+            datetime.strptime(date_str, '%Y-%m-%d')
+            return date_str
+        except ValueError:
+            return ''
+
+
+_GSTIN_RE = re.compile(r'GSTIN\s*[-:]\s*([A-Z0-9]+)', re.IGNORECASE)
+
+
+def _cell_amount(cells: Dict, ref: str) -> float:
+    value = cells.get(ref)
+    return float(value) if isinstance(value, (int, float)) else 0.0
+
+
+def read_invoice_metadata(filepath: str) -> Dict:
+    """Read summary fields (total, item count, tax type, transport, GSTIN, items, GST amounts) from a workbook."""
+    meta = {
+        'total_amount': '',
+        'grand_total': 0.0,
+        'taxable_value': 0.0,
+        'igst': 0.0,
+        'cgst': 0.0,
+        'sgst': 0.0,
+        'items_count': 0,
+        'tax_type': '',
+        'transport_mode': '',
+        'invoice_date': '',
+        'gstin': '',
+        'item_descriptions': []
+    }
+    cells = read_cells(filepath)
+    meta['invoice_date'] = parse_invoice_date(cells['H2'])
     
-    # Check if this transport mode already exists (case-insensitive)
-    existing_cores = set()
-    for mode in transport_modes:
-        existing_cores.add(extract_transport_core(mode).lower())
+    # Get total amount (cell I33, or the TOTAL in I35 the app itself writes)
+    total = cells['I33']
+    if not isinstance(total, (int, float)):
+        total = cells['I35']
+    if isinstance(total, (int, float)):
+        meta['total_amount'] = f"{total:,.2f}"
+        meta['grand_total'] = float(total)
     
-    if core_value.lower() not in existing_cores:
-        transport_modes.append(f"Mode of Transport: {core_value}")
-        save_data(TRANSPORT_MODES_JSON, transport_modes)
-        print(f"Saved new transport mode: {core_value}")
-        return True
-    return False
+    # GST amounts for the reports: subtotal in I29 (or the item amounts),
+    # IGST / CGST / SGST in I30:I32
+    meta['taxable_value'] = (_cell_amount(cells, 'I29')
+                             or round(sum(_cell_amount(cells, f'I{row}') for row in range(18, 28)), 2))
+    for key, ref in (('igst', 'I30'), ('cgst', 'I31'), ('sgst', 'I32')):
+        meta[key] = _cell_amount(cells, ref)
+    
+    # Buyer GSTIN (one of the buyer detail lines A8:A15)
+    for row in range(8, 16):
+        m = _GSTIN_RE.search(str(cells[f'A{row}'] or ''))
+        if m:
+            meta['gstin'] = m.group(1).upper()
+            break
+
+    # Count items (rows 18-27)
+    items_count = 0
+    for row in range(18, 28):
+        if cells[f'A{row}'] or cells[f'F{row}']:
+            items_count += 1
+        if cells[f'A{row}']:
+            meta['item_descriptions'].append(str(cells[f'A{row}']).strip())
+    meta['items_count'] = items_count
+    
+    # Get tax type
+    cgst_val = cells['I31'] or 0
+    if isinstance(cgst_val, (int, float)) and cgst_val > 0:
+        meta['tax_type'] = 'CGST+SGST'
+    else:
+        meta['tax_type'] = 'IGST'
+    
+    # Get transport mode
+    transport = cells['E10'] or ''
+    meta['transport_mode'] = extract_transport_core(str(transport))
+    return meta
+
+
+def _mirror_invoice(filename: str, entry: Optional[Dict]) -> None:
+    """Keep the SQLite invoice register in step with the invoice index."""
+    if entry is None:
+        sqlite_store.delete_invoice(filename)
+    else:
+        sqlite_store.upsert_invoice(invoice_summary(filename, entry))
 
 
-def convert_excel_to_pdf(excel_filepath: str, pdf_filepath: str) -> bool:
-    """Convert an Excel file to PDF using Excel COM automation."""
-    if not WIN32COM_AVAILABLE:
-        print(f"Skipping PDF conversion - pywin32 not available")
+# In-memory views of the invoice index, built on first use
+search_index = InvoiceSearchIndex()
+invoice_listing = InvoiceListing()
+gst_reports = GstReports()
+
+
+def _on_invoice_changed(filename: str, entry: Optional[Dict]) -> None:
+    """Invoice index listener: update the in-memory views, the version and the SQLite register."""
+    invoice_changes.record(filename, content_token(entry) if entry is not None else None)
+    summary = invoice_summary(filename, entry) if entry is not None else None
+    for view in (search_index, invoice_listing, gst_reports):
+        if view.ready:
+            view.update(filename, summary)
+    if sqlite_store is not None:
+        _mirror_invoice(filename, entry)
+
+
+invoice_index = InvoiceIndex(INVOICE_INDEX_JSON, OUTPUT_DIR, read_invoice_metadata,
+                             listener=_on_invoice_changed)
+
+
+@app.teardown_request
+def _sync_changes(exc=None) -> None:
+    """Log the changes a request made (e.g. a saved profile) before the next poll."""
+    for changes in (invoice_changes, profile_changes):
+        try:
+            changes.sync()
+        except (OSError, TimeoutError) as e:
+            print(f"WARNING: Could not update the {changes.name} change log: {e}")
+
+
+def _not_modified(changes: ChangeLog, version: str):
+    """An empty 304 response if the client already has this version, else None."""
+    if request.if_none_match.contains(changes.etag(version)):
+        return _versioned(app.response_class(status=304), changes, version)
+    return None
+
+
+def _versioned(response, changes: ChangeLog, version: str):
+    """Tag a collection response with its version; clients must revalidate before reuse."""
+    response.set_etag(changes.etag(version))
+    response.headers['X-Collection-Version'] = version
+    response.cache_control.no_cache = True
+    return response
+
+
+def _invoice_view(view):
+    """Bring the invoice index up to date and return ``view``, built on first use."""
+    entries = invoice_index.refresh()
+    if not view.ready:
+        view.rebuild([invoice_summary(f, e) for f, e in entries.items()])
+    return view
+
+if sqlite_store is not None:
+    # One-shot import of the JSON files on first start
+    if sqlite_store.migrate_from_json(BUYER_PROFILES_JSON, TRANSPORT_MODES_JSON,
+                                      (invoice_summary(f, e) for f, e in invoice_index.items())):
+        profile_store.invalidate()
+
+
+# PDF backends (selected with PDF_BACKEND in config.py)
+PDF_BACKENDS = {
+    'excel': ExcelConverter,
+    'builtin': lambda: BuiltinConverter(TEMPLATE_EXCEL_FILE),
+}
+
+
+def resolve_pdf_backend(name: str) -> Optional[str]:
+    """Map the configured backend name to an available backend (None = no PDF)."""
+    if name == 'none':
+        return None
+    if name == 'auto':
+        return 'excel' if WIN32COM_AVAILABLE else 'builtin'
+    if name == 'excel' and not WIN32COM_AVAILABLE:
+        print("WARNING: PDF_BACKEND=excel but pywin32 is not available, using builtin.")
+        return 'builtin'
+    if name not in PDF_BACKENDS:
+        print(f"WARNING: Unknown PDF_BACKEND '{name}', using builtin.")
+        return 'builtin'
+    return name
+
+
+ACTIVE_PDF_BACKEND = resolve_pdf_backend(PDF_BACKEND)
+
+# Warm converter workers shared by all requests (started on first use)
+pdf_converter = PdfConverterService(
+    PDF_BACKENDS[ACTIVE_PDF_BACKEND], workers=PDF_WORKERS,
+    queue_size=PDF_QUEUE_SIZE, timeout=PDF_TIMEOUT
+) if ACTIVE_PDF_BACKEND else None
+if pdf_converter is not None:
+    atexit.register(pdf_converter.shutdown)
+
+
+def make_invoice_pdf(excel_filepath: str, pdf_filepath: str, config_data: Dict) -> bool:
+    """Produce the PDF for a generated invoice through the converter pool."""
+    if pdf_converter is None:
         return False
+    return pdf_converter.convert(excel_filepath, pdf_filepath, config_data)
+
+
+def get_generated_invoices(sort: str = 'date', order: str = 'desc', limit: int = 50,
+                           cursor: Optional[str] = None) -> tuple:
+    """One page of generated invoices with metadata, and the next page's cursor.
     
-    excel = None
-    workbook = None
-    pythoncom.CoInitialize()
+    Metadata comes from the persistent invoice index; only workbooks that are
+    new or changed since the last call are opened.
+    """
+    page, next_cursor = _invoice_view(invoice_listing).page(sort, order, limit, cursor)
+    invoices = [dict(invoice_info, filepath=os.path.join(OUTPUT_DIR, invoice_info['filename']))
+                for invoice_info in page]
+    return invoices, next_cursor
+
+
+SIDECAR_VERSION = 1
+
+
+def sidecar_path(excel_filepath: str) -> str:
+    """Path of the JSON sidecar stored next to an invoice workbook."""
+    return os.path.splitext(excel_filepath)[0] + '.json'
+
+
+def write_invoice_sidecar(excel_filepath: str, data: Dict) -> None:
+    """Write the exact form data used to generate an invoice next to its workbook."""
+    path = sidecar_path(excel_filepath)
     try:
-        excel = win32com.client.Dispatch("Excel.Application")
-        excel.Visible = False
-        excel.DisplayAlerts = False
-        
-        if not os.path.exists(excel_filepath):
-            print(f"Error: Excel file not found at {excel_filepath}")
-            return False
-        
-        workbook = excel.Workbooks.Open(excel_filepath)
-        os.makedirs(os.path.dirname(pdf_filepath), exist_ok=True)
-        workbook.ExportAsFixedFormat(
-            0, pdf_filepath, 
-            Quality=0, 
-            IncludeDocProperties=True, 
-            IgnorePrintAreas=False, 
-            OpenAfterPublish=False
-        )
-        print(f"PDF created: {pdf_filepath}")
-        return True
-    except Exception as e:
-        print(f"Error converting to PDF: {e}")
-        return False
-    finally:
-        if workbook:
-            workbook.Close(SaveChanges=False)
-        if excel:
-            excel.Quit()
-        pythoncom.CoUninitialize()
+        atomic_write_json(path, dict(data, version=SIDECAR_VERSION), separators=(',', ':'))
+    except OSError as e:
+        print(f"WARNING: Could not write invoice sidecar {path}: {e}")
 
 
-def get_generated_invoices() -> List[Dict]:
-    """Get list of all generated invoices with metadata."""
-    invoices = []
+def load_invoice_sidecar(excel_filepath: str) -> Optional[Dict]:
+    """Load invoice form data from its sidecar, if present and still current.
+    
+    Returns None for legacy invoices (no sidecar) and for workbooks edited
+    after the sidecar was written, so callers fall back to reading Excel.
+    """
+    path = sidecar_path(excel_filepath)
     try:
-        files = os.listdir(OUTPUT_DIR)
-        for fname in sorted(files, reverse=True):
-            if fname.endswith('.xlsx') and fname.startswith('Invoice_'):
-                filepath = os.path.join(OUTPUT_DIR, fname)
-                try:
-                    mtime = os.path.getmtime(filepath)
-                    date_str = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M')
-                    
-                    # Parse invoice number and buyer from filename
-                    parts = fname.replace('.xlsx', '').split('_')
-                    invoice_num = parts[1] if len(parts) > 1 else ''
-                    buyer_name = ' '.join(parts[3:]) if len(parts) > 3 else ''
-                    buyer_name = buyer_name.replace('_', ' ')
-                    
-                    invoice_info = {
-                        'filename': fname,
-                        'filepath': filepath,
-                        'invoice_number': invoice_num,
-                        'buyer_name': buyer_name,
-                        'modified_date': date_str,
-                        'total_amount': '',
-                        'items_count': 0,
-                        'tax_type': '',
-                        'transport_mode': ''
-                    }
-                    
-                    # Try to extract additional details from the Excel file
-                    if OPENPYXL_AVAILABLE:
-                        try:
-                            wb = openpyxl.load_workbook(filepath, data_only=True)
-                            sheet = wb.active
-                            
-                            # Get total amount (cell I33)
-                            total = sheet['I33'].value
-                            if isinstance(total, (int, float)):
-                                invoice_info['total_amount'] = f"{total:,.2f}"
-                            
-                            # Count items (rows 18-27)
-                            items_count = 0
-                            for row in range(18, 28):
-                                desc = sheet[f'A{row}'].value
-                                qty = sheet[f'F{row}'].value
-                                if desc or qty:
-                                    items_count += 1
-                            invoice_info['items_count'] = items_count
-                            
-                            # Get tax type
-                            cgst_val = sheet['I31'].value or 0
-                            if isinstance(cgst_val, (int, float)) and cgst_val > 0:
-                                invoice_info['tax_type'] = 'CGST+SGST'
-                            else:
-                                invoice_info['tax_type'] = 'IGST'
-                            
-                            # Get transport mode
-                            transport = sheet['E10'].value or ''
-                            transport_core = extract_transport_core(str(transport))
-                            invoice_info['transport_mode'] = transport_core
-                            
-                            wb.close()
-                        except Exception as e:
-                            # Silently fail - we still have basic info from filename
-                            pass
-                    
-                    invoices.append(invoice_info)
-                except Exception:
-                    continue
-    except FileNotFoundError:
-        pass
-    return invoices
+        if os.path.getmtime(path) < os.path.getmtime(excel_filepath):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if data.get('version') != SIDECAR_VERSION:
+        return None
+    return {
+        'invoice_number': data.get('invoice_number', ''),
+        'invoice_date': data.get('invoice_date', ''),
+        'buyer_profile_id': data.get('buyer_profile_id', ''),
+        'buyer_details': data.get('buyer_details', []),
+        'transport_mode': data.get('transport_mode', ''),
+        'items': data.get('items') or [{'description': '', 'bags': '', 'quantity': 0, 'rate': 0}],
+        'tax_type': data.get('tax_type', 'IGST')
+    }
+
+
+def load_invoice(filepath: str) -> Optional[Dict]:
+    """Load invoice data for editing: sidecar first, Excel parsing for legacy files."""
+    return load_invoice_sidecar(filepath) or extract_invoice_data(filepath)
 
 
 def extract_invoice_data(filepath: str) -> Optional[Dict]:
     """Extract data from an existing invoice Excel file."""
-    if not OPENPYXL_AVAILABLE:
-        return None
-    
     try:
-        wb = openpyxl.load_workbook(filepath, data_only=True)
-        sheet = wb.active
+        cells = read_cells(filepath)
         
         # Extract invoice number and date
-        invoice_num_raw = sheet['E2'].value or ''
-        invoice_date_raw = sheet['H2'].value or ''
+        invoice_num_raw = cells['E2'] or ''
+        invoice_date_raw = cells['H2'] or ''
         
         # Clean up invoice number
         invoice_number = str(invoice_num_raw).replace('INVOICE No.', '').replace('Invoice No.', '').strip()
         
         # Parse date
-        invoice_date = ''
-        if invoice_date_raw:
-            date_str = str(invoice_date_raw).replace('Date :', '').replace('Date:', '').strip()
-            try:
-                dt = datetime.strptime(date_str, '%d/%m/%Y')
-                invoice_date = dt.strftime('%Y-%m-%d')
-            except ValueError:
-                try:
-                    dt = datetime.strptime(date_str, '%Y-%m-%d')
-                    invoice_date = date_str
-                except ValueError:
-                    pass
+        invoice_date = parse_invoice_date(invoice_date_raw)
         
         # Extract buyer details
         buyer_details = []
         for i in range(8, 16):
-            cell_value = sheet[f'A{i}'].value
+            cell_value = cells[f'A{i}']
             if cell_value:
                 buyer_details.append(str(cell_value).strip())
         
         # Extract transport mode
-        transport_mode = str(sheet['E10'].value or '').strip()
+        transport_mode = str(cells['E10'] or '').strip()
         transport_core = extract_transport_core(transport_mode)
         
         # Extract items
         items = []
         for row in range(18, 28):  # Check rows 18-27 for items
-            description = sheet[f'A{row}'].value
-            quantity = sheet[f'F{row}'].value
-            rate = sheet[f'G{row}'].value
+            description = cells[f'A{row}']
+            quantity = cells[f'F{row}']
+            rate = cells[f'G{row}']
             
             if description or (quantity and rate):
                 desc_str = str(description or '').strip()
@@ -364,16 +540,14 @@ def extract_invoice_data(filepath: str) -> Optional[Dict]:
         # Detect tax type
         tax_type = 'IGST'
         try:
-            igst_val = sheet['I30'].value or 0
-            cgst_val = sheet['I31'].value or 0
+            igst_val = cells['I30'] or 0
+            cgst_val = cells['I31'] or 0
             
             if isinstance(cgst_val, (int, float)) and cgst_val > 0:
                 tax_type = 'CGST_SGST'
         except:
             pass
         
-        wb.close()
-        
         return {
             'invoice_number': invoice_number,
             'invoice_date': invoice_date,
@@ -395,13 +569,11 @@ def extract_invoice_data(filepath: str) -> Optional[Dict]:
 @app.route('/')
 def index():
     """Main invoice generation page."""
-    buyer_profiles = load_data(BUYER_PROFILES_JSON)
     transport_modes = load_data(TRANSPORT_MODES_JSON)
     today_date = datetime.now().strftime('%Y-%m-%d')
     
-    # Filter valid profiles and sort by name
-    valid_buyer_profiles = [p for p in buyer_profiles if p.get('profile_id') and p.get('buyer_name')]
-    valid_buyer_profiles.sort(key=lambda p: p.get('buyer_name', '').lower())
+    # First valid profiles by name; the buyer box searches the rest on the server
+    valid_buyer_profiles = profile_store.sorted_profiles()[:EMBEDDED_PROFILES]
     
     # Normalize and deduplicate transport modes
     transport_cores = []
@@ -413,8 +585,11 @@ def index():
             transport_cores.append(core)
     transport_cores.sort()
     
-    suggestion = suggest_next_invoice_number()
-    recent_invoices = get_generated_invoices()[:50]  # Increased for modal
+    # Only suggested here: the form reserves a number on its first edit (so
+    # reloads, edits of loaded invoices and forgotten tabs hold none) and
+    # releases it if the page is closed without generating
+    suggestion = invoice_numbers.suggest()
+    recent_invoices, recent_cursor = get_generated_invoices(limit=50)  # first page of the modal
     
     # Check if loading a specific invoice
     load_filename = request.args.get('load', '')
@@ -422,9 +597,10 @@ def index():
     if load_filename:
         filepath = os.path.join(OUTPUT_DIR, load_filename)
         if os.path.exists(filepath):
-            preload_invoice = extract_invoice_data(filepath)
+            preload_invoice = load_invoice(filepath)
             if preload_invoice:
                 preload_invoice['filename'] = load_filename
+                preload_invoice['buyer_profile'] = match_buyer_profile(preload_invoice)
     
     return render_template('index.html', 
                           buyer_profiles=valid_buyer_profiles, 
@@ -432,6 +608,8 @@ def index():
                           today_date=today_date, 
                           suggested_invoice_number=suggestion,
                           recent_invoices=recent_invoices,
+                          recent_cursor=recent_cursor,
+                          recent_total=len(invoice_listing),
                           preload_invoice=preload_invoice)
 
 
@@ -446,6 +624,7 @@ def generate_invoice():
             return redirect(url_for('index'))
         
         raw_invoice_number = request.form.get('invoice_number', '').strip()
+        reserved_invoice_number = request.form.get('reserved_invoice_number', '').strip()
         invoice_date_str = request.form.get('invoice_date', '')
         
         # Parse date
@@ -471,10 +650,12 @@ def generate_invoice():
         
         # Process multiple items
         items = []
+        form_items = []  # exactly as entered, for the JSON sidecar
         item_descriptions = request.form.getlist('item_description[]')
         item_bags = request.form.getlist('item_bags[]')
         item_quantities = request.form.getlist('item_quantity[]')
         item_rates = request.form.getlist('item_rate[]')
+        item_gst_rates = request.form.getlist('item_gst_rate[]')
         
         if item_descriptions:
             for i in range(len(item_descriptions)):
@@ -482,6 +663,8 @@ def generate_invoice():
                 bags = item_bags[i].strip() if i < len(item_bags) else ''
                 qty = float(item_quantities[i]) if i < len(item_quantities) and item_quantities[i] else 0
                 rt = float(item_rates[i]) if i < len(item_rates) and item_rates[i] else 0
+                # Blank GST % uses tax_rules.DEFAULT_GST_RATE
+                gst = float(item_gst_rates[i]) if i < len(item_gst_rates) and item_gst_rates[i].strip() else None
                 
                 if desc or qty or rt:
                     full_desc = desc
@@ -496,7 +679,15 @@ def generate_invoice():
                     items.append({
                         'description': full_desc,
                         'quantity': qty,
-                        'rate': rt
+                        'rate': rt,
+                        'gst_rate': gst
+                    })
+                    form_items.append({
+                        'description': desc,
+                        'bags': bags,
+                        'quantity': qty,
+                        'rate': rt,
+                        'gst_rate': gst
                     })
         else:
             # Backward compatibility - single item
@@ -519,14 +710,19 @@ def generate_invoice():
                 'quantity': quantity,
                 'rate': rate
             })
+            form_items.append({
+                'description': base_desc,
+                'bags': bags,
+                'quantity': quantity,
+                'rate': rate
+            })
         
         if not items:
             flash("Please add at least one item.", "error")
             return redirect(url_for('index'))
         
         # Buyer profile lookup
-        buyer_profiles = load_data(BUYER_PROFILES_JSON)
-        selected_profile = next((p for p in buyer_profiles if p.get('profile_id') == buyer_profile_id), None)
+        selected_profile = profile_store.get(buyer_profile_id)
         if not selected_profile:
             flash("Selected buyer profile not found.", "error")
             return redirect(url_for('index'))
@@ -561,17 +757,39 @@ def generate_invoice():
             flash("No Excel template found. Place a template .xlsx inside the 'GST Invoices' folder.", "error")
             return redirect(url_for('index'))
         
+        # Refuse to overwrite another invoice that already has this number
+        try:
+            invoice_numbers.claim(raw_invoice_number, excel_output_filename,
+                                  default_suffix=_financial_year_suffix(dt_object))
+        except DuplicateInvoiceNumber as e:
+            # The form reserves a fresh number on its next edit
+            invoice_numbers.release(reserved_invoice_number)
+            flash(f"{e}. The next free number is {invoice_numbers.suggest(_financial_year_suffix(dt_object))}.", "error")
+            return redirect(url_for('index'))
+        if reserved_invoice_number and reserved_invoice_number != raw_invoice_number:
+            invoice_numbers.release(reserved_invoice_number)
+        
         # Generate Excel
-        copy_excel_with_formatting(TEMPLATE_EXCEL_FILE, excel_destination_filepath, config_data)
+        write_invoice_workbook(TEMPLATE_EXCEL_FILE, excel_destination_filepath, config_data)
+        write_invoice_sidecar(excel_destination_filepath, {
+            'invoice_number': raw_invoice_number,
+            'invoice_date': dt_object.strftime('%Y-%m-%d'),
+            'buyer_profile_id': buyer_profile_id,
+            'buyer_details': config_data['buyer_details'],
+            'transport_mode': extract_transport_core(transport_mode),
+            'tax_type': final_tax_type,
+            'items': form_items
+        })
+        invoice_index.update(excel_output_filename)
         
         # PDF conversion
         pdf_output_filename = f"{excel_filename_base}.pdf"
         pdf_destination_filepath = os.path.join(PDF_OUTPUT_DIR, pdf_output_filename)
         
-        if WIN32COM_AVAILABLE and convert_excel_to_pdf(excel_destination_filepath, pdf_destination_filepath):
+        if ACTIVE_PDF_BACKEND and make_invoice_pdf(excel_destination_filepath, pdf_destination_filepath, config_data):
             flash(f"Invoice {excel_output_filename} generated with PDF!", "success")
             return redirect(url_for('success_pdf', filename=pdf_output_filename))
-        elif WIN32COM_AVAILABLE:
+        elif ACTIVE_PDF_BACKEND:
             flash(f"Invoice {excel_output_filename} generated, but PDF conversion failed.", "warning")
             return redirect(url_for('success', filename=excel_output_filename))
         else:
@@ -588,7 +806,11 @@ def generate_invoice():
 
 @app.route('/calculate_preview', methods=['POST'])
 def calculate_preview_route():
-    """Calculate invoice totals for live preview."""
+    """Calculate invoice totals for live preview.
+
+    The invoice form computes these in the browser now (tax_rules.js); the
+    endpoint stays for other clients and returns the same strings.
+    """
     data = request.json
     try:
         items = data.get('items', [])
@@ -598,51 +820,12 @@ def calculate_preview_route():
             items = [{'quantity': quantity, 'rate': rate}]
         
         tax_type = data.get('tax_type', 'IGST')
+        items = [{'quantity': float(item.get('quantity', 0)), 'rate': float(item.get('rate', 0)),
+                  'gst_rate': item.get('gst_rate')}
+                 for item in items]
         
-        # Calculate totals
-        item_amounts = []
-        subtotal = 0
-        for item in items:
-            qty = float(item.get('quantity', 0))
-            rt = float(item.get('rate', 0))
-            amount = qty * rt
-            item_amounts.append(amount)
-            subtotal += amount
-        
-        # Tax calculations
-        igst_amount = 0
-        cgst_amount = 0
-        sgst_amount = 0
-        
-        if tax_type == "IGST":
-            igst_amount = subtotal * 0.05
-        elif tax_type == "CGST_SGST":
-            cgst_amount = subtotal * 0.025
-            sgst_amount = subtotal * 0.025
-        
-        total_before_round = subtotal + igst_amount + cgst_amount + sgst_amount
-        rounded_total = round(total_before_round)
-        round_off = rounded_total - total_before_round
-        
-        # Amount in words
-        if rounded_total > 0:
-            amount_words = num2words(int(rounded_total), lang='en_IN')
-            amount_words = amount_words.replace('-', ' ').replace(',', '').title() + " Only"
-        else:
-            amount_words = "Zero Only"
-        
-        return jsonify({
-            "item_amounts": [f"{a:.2f}" for a in item_amounts],
-            "item_amount": f"{item_amounts[0]:.2f}" if item_amounts else "0.00",
-            "subtotal": f"{subtotal:.2f}",
-            "igst_amount": f"{igst_amount:.2f}",
-            "cgst_amount": f"{cgst_amount:.2f}",
-            "sgst_amount": f"{sgst_amount:.2f}",
-            "total_before_round_off": f"{total_before_round:.2f}",
-            "round_off_value": f"{round_off:.2f}",
-            "rounded_total": f"{rounded_total:.2f}",
-            "amount_in_words": amount_words
-        })
+        # Same figures the invoice form computes in the browser (tax_rules.js)
+        return jsonify(preview_values(items, tax_type))
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -655,8 +838,9 @@ def api_load_invoice(filename):
     if not os.path.exists(filepath):
         return jsonify({"error": "Invoice file not found"}), 404
     
-    data = extract_invoice_data(filepath)
+    data = load_invoice(filepath)
     if data:
+        data['buyer_profile'] = match_buyer_profile(data)
         return jsonify(data)
     else:
         return jsonify({"error": "Failed to extract invoice data"}), 500
@@ -664,46 +848,155 @@ def api_load_invoice(filename):
 
 @app.route('/api/invoices')
 def api_list_invoices():
-    """List all generated invoices."""
-    return jsonify(get_generated_invoices())
+    """List generated invoices a page at a time.
+
+    ``sort`` is date, number, buyer or total, ``order`` asc or desc; pass the
+    returned ``next_cursor`` as ``cursor`` for the following page.  Pass a
+    returned ``version`` as ``since`` to get only the invoices changed or
+    deleted after it (``full`` is set if that version is unknown or too old).
+    """
+    sort, order = request.args.get('sort', 'date'), request.args.get('order', 'desc')
+    cursor = request.args.get('cursor') or None
+    limit = min(max(request.args.get('limit', 50, type=int) or 50, 1), 500)
+    with invoice_changes.lock():
+        entries = invoice_index.refresh()
+        version = invoice_changes.sync()
+    # A malformed request gets its 400, never a 304
+    try:
+        _invoice_view(invoice_listing).check_page(sort, order, cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    cached = _not_modified(invoice_changes, version)
+    if cached is not None:
+        return cached
+    
+    since = request.args.get('since')
+    delta = invoice_changes.since(since) if since else None
+    if delta is not None:
+        changed, deleted = delta
+        invoices = []
+        for fname in changed:
+            entry = entries.get(fname)
+            if entry is None:
+                deleted.append(fname)
+                continue
+            invoices.append(dict(invoice_summary(fname, entry), filepath=os.path.join(OUTPUT_DIR, fname)))
+        return _versioned(jsonify({"version": version, "since": since, "changed": invoices,
+                                   "deleted": deleted, "total": len(entries)}), invoice_changes, version)
+    
+    try:
+        invoices, next_cursor = get_generated_invoices(sort, order, limit, cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    body = {"invoices": invoices, "next_cursor": next_cursor, "total": len(invoice_listing), "version": version}
+    if since:
+        body['full'] = True
+    return _versioned(jsonify(body), invoice_changes, version)
+
+
+@app.route('/api/invoices/search')
+def api_search_invoices():
+    """Search invoices by number, buyer, GSTIN, item, transport or date words."""
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 50, type=int) or 50, 1), 500)
+    offset = max(request.args.get('offset', 0, type=int) or 0, 0)
+    total, filenames = _invoice_view(search_index).search(query, limit=limit, offset=offset)
+    entries = invoice_index.refresh()
+    results = []
+    for fname in filenames:
+        entry = entries.get(fname)
+        if entry is None:
+            continue
+        invoice_info = invoice_summary(fname, entry)
+        invoice_info['filepath'] = os.path.join(OUTPUT_DIR, fname)
+        results.append(invoice_info)
+    return jsonify({"query": query, "total": total, "offset": offset, "results": results})
 
 
 @app.route('/api/next_invoice_number')
 def api_next_invoice_number():
-    """Get the next suggested invoice number."""
-    return jsonify({"next_invoice_number": suggest_next_invoice_number()})
+    """Get the next suggested invoice number (without reserving it)."""
+    with number_changes.lock():
+        number_changes.observe(invoice_numbers.signature())
+        version = number_changes.sync()
+    cached = _not_modified(number_changes, version)
+    if cached is not None:
+        return cached
+    return _versioned(jsonify({"next_invoice_number": invoice_numbers.suggest(), "version": version}), number_changes, version)
+
+
+@app.route('/api/invoice_numbers/reserve', methods=['POST'])
+def api_reserve_invoice_number():
+    """Reserve the next invoice number for an open form."""
+    return jsonify({"invoice_number": invoice_numbers.reserve()})
+
+
+@app.route('/api/invoice_numbers/release', methods=['POST'])
+def api_release_invoice_number():
+    """Give back a reserved number that was not used."""
+    number = (request.get_json(silent=True) or {}).get('invoice_number') or request.form.get('invoice_number', '')
+    return jsonify({"released": invoice_numbers.release(number)})
 
 
 @app.route('/api/profiles')
 def api_list_profiles():
-    """Get all buyer profiles as JSON."""
-    profiles = load_data(BUYER_PROFILES_JSON)
-    valid = [p for p in profiles if p.get('profile_id') and p.get('buyer_name')]
-    valid.sort(key=lambda p: p.get('buyer_name', '').lower())
-    return jsonify(valid)
+    """Get all buyer profiles as JSON.
+
+    With ``since`` (the X-Collection-Version of an earlier response) only
+    the profiles changed or deleted after it are sent.
+    """
+    with profile_changes.lock():
+        profile_store.refresh()
+        version = profile_changes.sync()
+    cached = _not_modified(profile_changes, version)
+    if cached is not None:
+        return cached
+    
+    since = request.args.get('since')
+    if not since:
+        return _versioned(jsonify(profile_store.sorted_profiles()), profile_changes, version)
+    delta = profile_changes.since(since)
+    if delta is None:
+        body = {"version": version, "since": since, "full": True,
+                "changed": profile_store.sorted_profiles(), "deleted": []}
+    else:
+        changed, deleted = delta
+        profiles = []
+        for profile_id in changed:
+            profile = profile_store.get(profile_id)
+            if profile is None:
+                deleted.append(profile_id)
+            else:
+                profiles.append(profile)
+        body = {"version": version, "since": since, "changed": profiles, "deleted": deleted}
+    return _versioned(jsonify(body), profile_changes, version)
 
 
 # ===================== PROFILE MANAGEMENT =====================
 
+@app.route('/api/profiles/search')
+def api_search_profiles():
+    """Buyer typeahead: profiles ranked by fuzzy match on name, details and GSTIN."""
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 20, type=int) or 20, 1), 100)
+    return jsonify({"query": query, "results": search_profiles(query, limit)})
+
+
 @app.route('/list_profiles')
 def list_profiles():
     """List all buyer profiles."""
-    buyer_profiles = load_data(BUYER_PROFILES_JSON)
-    valid_profiles = [p for p in buyer_profiles if p.get('profile_id') and p.get('buyer_name')]
-    valid_profiles.sort(key=lambda p: p.get('buyer_name', '').lower())
-    return render_template('list_profiles.html', profiles=valid_profiles)
+    return render_template('list_profiles.html', profiles=profile_store.sorted_profiles())
 
 
 @app.route('/manage_profile', methods=['GET', 'POST'])
 @app.route('/manage_profile/<profile_id>', methods=['GET', 'POST'])
 def manage_profile(profile_id=None):
     """Create or edit a buyer profile."""
-    buyer_profiles = load_data(BUYER_PROFILES_JSON)
     profile_to_edit = None
     is_new_profile = False
     
     if profile_id:
-        profile_to_edit = next((p for p in buyer_profiles if p.get('profile_id') == profile_id), None)
+        profile_to_edit = profile_store.get(profile_id)
         if not profile_to_edit:
             flash(f"Profile not found.", "error")
             return redirect(url_for('list_profiles'))
@@ -734,7 +1027,8 @@ def manage_profile(profile_id=None):
                 'profile_id': profile_id or ''
             }
             return render_template('profile_form.html', profile=profile_data, 
-                                 is_new_profile=is_new_profile, profile_id=profile_id)
+                                 is_new_profile=is_new_profile, profile_id=profile_id,
+                                 profile_version=request.form.get('profile_version', ''))
         
         if is_new_profile:
             # Generate profile ID
@@ -745,7 +1039,7 @@ def manage_profile(profile_id=None):
                 new_profile_id = f"{safe_name}_{uuid.uuid4().hex[:8]}"
             
             # Check for duplicates
-            if any(p.get('profile_id') == new_profile_id for p in buyer_profiles):
+            if profile_store.exists(new_profile_id):
                 flash(f"A profile with this ID already exists.", "error")
                 profile_data = {
                     'buyer_name': buyer_name,
@@ -764,50 +1058,87 @@ def manage_profile(profile_id=None):
                 "gstin": gstin,
                 "default_tax_type": default_tax_type
             }
-            buyer_profiles.append(new_profile)
-            flash(f"Profile '{buyer_name}' created successfully!", "success")
-        else:
-            profile_to_update = next((p for p in buyer_profiles if p.get('profile_id') == profile_id), None)
-            if profile_to_update:
-                profile_to_update['buyer_name'] = buyer_name
-                profile_to_update['buyer_details'] = buyer_details
-                profile_to_update['gstin'] = gstin
-                profile_to_update['default_tax_type'] = default_tax_type
-                flash(f"Profile '{buyer_name}' updated successfully!", "success")
+            try:
+                saved = profile_store.add(new_profile)
+            except ProfileConflict:
+                # Created by another user between the check above and now
+                flash(f"A profile with this ID already exists.", "error")
+                profile_data = {
+                    'buyer_name': buyer_name,
+                    'buyer_details_textarea': buyer_details_str,
+                    'gstin': gstin,
+                    'default_tax_type': default_tax_type,
+                    'profile_id': ''
+                }
+                return render_template('profile_form.html', profile=profile_data, 
+                                     is_new_profile=True, profile_id=None), 409
+            if saved:
+                flash(f"Profile '{buyer_name}' created successfully!", "success")
             else:
+                flash("Error saving profile.", "error")
+        else:
+            if not profile_store.exists(profile_id):
                 flash("Error: Profile not found for update.", "error")
                 return redirect(url_for('list_profiles'))
+            try:
+                saved = profile_store.update(profile_id, {
+                    'buyer_name': buyer_name,
+                    'buyer_details': buyer_details,
+                    'gstin': gstin,
+                    'default_tax_type': default_tax_type
+                }, expected_version=request.form.get('profile_version'))
+            except ProfileConflict as conflict:
+                # Someone else saved this profile after the form was opened:
+                # keep the user's input and let them save again deliberately.
+                current = conflict.current or {}
+                flash(f"This profile was changed by someone else while you were editing it "
+                      f"(now '{current.get('buyer_name', '')}', GSTIN '{current.get('gstin', '')}'). "
+                      f"Your changes were not saved; review them and save again to overwrite.", "error")
+                profile_data = {
+                    'buyer_name': buyer_name,
+                    'buyer_details_textarea': buyer_details_str,
+                    'gstin': gstin,
+                    'default_tax_type': default_tax_type,
+                    'profile_id': profile_id
+                }
+                return render_template('profile_form.html', profile=profile_data, 
+                                     is_new_profile=False, profile_id=profile_id,
+                                     profile_version=profile_version(current)), 409
+            if saved:
+                flash(f"Profile '{buyer_name}' updated successfully!", "success")
+            else:
+                flash("Error saving profile.", "error")
         
-        if save_data(BUYER_PROFILES_JSON, buyer_profiles):
-            return redirect(url_for('list_profiles'))
-        else:
-            flash("Error saving profile.", "error")
-            return redirect(url_for('list_profiles'))
+        return redirect(url_for('list_profiles'))
     
     # GET request
+    version = profile_version(profile_to_edit) if not is_new_profile else ''
     if profile_to_edit and isinstance(profile_to_edit.get('buyer_details'), list):
         profile_to_edit['buyer_details_textarea'] = '\n'.join(profile_to_edit['buyer_details'])
     elif profile_to_edit:
         profile_to_edit['buyer_details_textarea'] = ''
     
     return render_template('profile_form.html', profile=profile_to_edit, 
-                          is_new_profile=is_new_profile, profile_id=profile_id)
+                          is_new_profile=is_new_profile, profile_id=profile_id,
+                          profile_version=version)
 
 
 @app.route('/delete_profile/<profile_id>', methods=['POST'])
 def delete_profile(profile_id):
     """Delete a buyer profile."""
-    buyer_profiles = load_data(BUYER_PROFILES_JSON)
-    
-    profile_to_delete = next((p for p in buyer_profiles if p.get('profile_id') == profile_id), None)
+    profile_to_delete = profile_store.get(profile_id)
     if not profile_to_delete:
         flash("Profile not found.", "error")
         return redirect(url_for('list_profiles'))
     
     buyer_name = profile_to_delete.get('buyer_name', 'Unknown')
-    buyer_profiles = [p for p in buyer_profiles if p.get('profile_id') != profile_id]
     
-    if save_data(BUYER_PROFILES_JSON, buyer_profiles):
+    try:
+        deleted = profile_store.delete(profile_id, expected_version=request.form.get('profile_version'))
+    except ProfileConflict:
+        flash(f"Profile '{buyer_name}' was changed by someone else; reload and try again.", "error")
+        return redirect(url_for('list_profiles'))
+    if deleted:
         flash(f"Profile '{buyer_name}' deleted.", "success")
     else:
         flash("Error deleting profile.", "error")
@@ -815,45 +1146,23 @@ def delete_profile(profile_id):
     return redirect(url_for('list_profiles'))
 
 
-@app.route('/cleanup_profiles', methods=['POST'])
+@app.route('/cleanup_profiles', methods=['GET', 'POST'])
 def cleanup_profiles():
-    """Remove duplicate and invalid profiles."""
-    buyer_profiles = load_data(BUYER_PROFILES_JSON)
-    original_count = len(buyer_profiles)
-    
-    # Remove invalid profiles
-    valid_profiles = [p for p in buyer_profiles if p.get('profile_id') and p.get('buyer_name')]
-    
-    # Remove duplicates based on profile_id
-    seen_ids = set()
-    unique_profiles = []
-    for p in valid_profiles:
-        pid = p.get('profile_id')
-        if pid not in seen_ids:
-            seen_ids.add(pid)
-            unique_profiles.append(p)
-    
-    # Remove near-duplicates based on buyer name
-    final_profiles = []
-    seen_names = {}
-    for p in unique_profiles:
-        name_lower = p.get('buyer_name', '').lower().strip()
-        if name_lower not in seen_names:
-            seen_names[name_lower] = p
-            final_profiles.append(p)
-        else:
-            existing = seen_names[name_lower]
-            existing_details = len(existing.get('buyer_details', []))
-            new_details = len(p.get('buyer_details', []))
-            if new_details > existing_details or (p.get('gstin') and not existing.get('gstin')):
-                final_profiles.remove(existing)
-                final_profiles.append(p)
-                seen_names[name_lower] = p
-    
-    final_profiles.sort(key=lambda x: x.get('buyer_name', '').lower())
-    
-    if save_data(BUYER_PROFILES_JSON, final_profiles):
-        removed = original_count - len(final_profiles)
+    """Preview (GET) or apply (POST) removal of duplicate and invalid profiles."""
+    buyer_profiles = profile_store.all()
+    plan = plan_cleanup(buyer_profiles)
+    
+    if request.method == 'GET':
+        return render_template('list_profiles.html', profiles=profile_store.sorted_profiles(),
+                               cleanup_plan=plan_summary(plan))
+    
+    if request.form.get('plan_token') != plan.token:
+        flash("Profiles changed since the cleanup preview. Please review it again.", "error")
+        return redirect(url_for('cleanup_profiles'))
+    
+    final_profiles = apply_plan(plan, set(request.form.getlist('merge')))
+    if profile_store.replace_all(final_profiles):
+        removed = len(buyer_profiles) - len(final_profiles)
         flash(f"Cleanup complete. Removed {removed} duplicate/invalid profiles.", "success")
     else:
         flash("Error during cleanup.", "error")
@@ -861,6 +1170,125 @@ def cleanup_profiles():
     return redirect(url_for('list_profiles'))
 
 
+@app.route('/api/profiles/duplicates')
+def api_profile_duplicates():
+    """Dry run of the profile cleanup: proposed merges and removals as JSON."""
+    return jsonify(plan_summary(plan_cleanup(profile_store.all())))
+
+
+# ===================== GST REPORTS =====================
+
+_FY_RE = re.compile(r'^\d{4}-\d{2}$')
+
+
+def _report_period() -> Tuple[str, str]:
+    """``fy`` and ``month`` query args, defaulting to the current financial year.
+
+    Raises ValueError for a malformed year or a month outside it.
+    """
+    fy = request.args.get('fy') or financial_year(datetime.now().strftime('%Y-%m'))
+    month = request.args.get('month', '')
+    if not _FY_RE.match(fy) or int(fy[5:]) != (int(fy[:4]) + 1) % 100:
+        raise ValueError(f"Invalid financial year {fy!r}; use e.g. 2025-26")
+    if month and (not _FY_RE.match(month) or not 1 <= int(month[5:]) <= 12
+                  or financial_year(month) != fy):
+        raise ValueError(f"Invalid month {month!r} for financial year {fy}")
+    return fy, month
+
+
+@app.route('/reports')
+def reports():
+    """GST summary of a financial year: monthly totals, buyers and tax types."""
+    rollups = _invoice_view(gst_reports)
+    try:
+        fy, month = _report_period()
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for('reports'))
+    years = rollups.financial_years()
+    if fy not in years:
+        years = sorted(years + [fy], reverse=True)
+    return render_template('reports.html', fy=fy, month=month, financial_years=years,
+                           monthly=rollups.monthly(fy), buyers=rollups.by_buyer(fy, month),
+                           tax_types=rollups.by_tax_type(fy, month))
+
+
+@app.route('/api/reports/monthly')
+def api_report_monthly():
+    """Monthly GST totals of a financial year (``fy``, e.g. 2025-26)."""
+    try:
+        fy, _ = _report_period()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(_invoice_view(gst_reports).monthly(fy))
+
+
+@app.route('/api/reports/buyers')
+def api_report_buyers():
+    """GST totals per buyer for a financial year, or one ``month`` (YYYY-MM) of it."""
+    try:
+        fy, month = _report_period()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(_invoice_view(gst_reports).by_buyer(fy, month))
+
+
+@app.route('/api/reports/tax_types')
+def api_report_tax_types():
+    """GST totals per tax type for a financial year, or one ``month`` of it."""
+    try:
+        fy, month = _report_period()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(_invoice_view(gst_reports).by_tax_type(fy, month))
+
+
+@app.route('/reports/rebuild', methods=['POST'])
+def rebuild_reports():
+    """Re-read every workbook (e.g. after editing invoices in Excel) and recompute the reports."""
+    entries = invoice_index.rebuild()
+    gst_reports.rebuild([invoice_summary(f, e) for f, e in entries.items()])
+    flash(f"Reports rebuilt from {len(entries)} invoices.", "success")
+    return redirect(url_for('reports', fy=request.form.get('fy') or None))
+
+
+@app.route('/export/register')
+def export_register():
+    """Invoice register as CSV (streamed) or Excel, optionally by date range and buyer.
+
+    ``format`` is csv or xlsx, ``from`` / ``to`` are YYYY-MM-DD dates and
+    ``buyer`` a GSTIN or part of the buyer name.
+    """
+    fmt = request.args.get('format', 'csv').lower()
+    try:
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown format {fmt!r}; use csv or xlsx")
+        date_from = check_date(request.args.get('from'), 'from')
+        date_to = check_date(request.args.get('to'), 'to')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    summaries = _invoice_view(invoice_listing).iterate('date', (date_from or '',))
+    rows = register_rows(summaries, date_from, date_to, request.args.get('buyer'))
+    filename = f"Invoice_Register_{date_from or 'start'}_to_{date_to or datetime.now().strftime('%Y-%m-%d')}.{fmt}"
+    
+    if fmt == 'csv':
+        response = Response(stream_with_context(csv_chunks(rows)), mimetype='text/csv')
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    
+    # write_only workbooks stream rows to disk; the finished file is sent from
+    # there and deleted when the response is closed
+    spool = tempfile.TemporaryFile(suffix='.xlsx')
+    try:
+        write_xlsx(rows, spool)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return send_file(spool, as_attachment=True, download_name=filename,
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+
 # ===================== FILE DOWNLOAD ROUTES =====================
 
 @app.route('/success')
@@ -893,6 +1321,59 @@ def download_pdf_file(filename):
     return send_from_directory(PDF_OUTPUT_DIR, filename, as_attachment=True)
 
 
+BUNDLE_KINDS = ('xlsx', 'pdf')
+
+
+def _bundle_members(filenames, kinds):
+    """(name in ZIP, path) of each invoice's workbook and/or PDF."""
+    for filename in filenames:
+        if 'xlsx' in kinds:
+            yield filename, os.path.join(OUTPUT_DIR, filename)
+        if 'pdf' in kinds:
+            pdf_filename = f"{os.path.splitext(filename)[0]}.pdf"
+            yield pdf_filename, os.path.join(PDF_OUTPUT_DIR, pdf_filename)
+
+
+@app.route('/download_bundle', methods=['GET', 'POST'])
+def download_bundle():
+    """Download several invoices as one ZIP, streamed while it is built.
+
+    Select them with repeated ``file`` (workbook filenames), or with ``from``
+    / ``to`` dates (YYYY-MM-DD) and ``buyer`` (GSTIN or part of the name);
+    ``include`` is xlsx, pdf or xlsx,pdf (default).
+    """
+    kinds = [k for k in request.values.get('include', 'xlsx,pdf').lower().split(',') if k]
+    files = list(dict.fromkeys(request.values.getlist('file')))
+    try:
+        if not kinds or any(k not in BUNDLE_KINDS for k in kinds):
+            raise ValueError("include must be xlsx, pdf or xlsx,pdf")
+        date_from = check_date(request.values.get('from'), 'from')
+        date_to = check_date(request.values.get('to'), 'to')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    if files:
+        entries = invoice_index.refresh()
+        unknown = [f for f in files if f not in entries]
+        if unknown:
+            return jsonify({"error": f"Unknown invoice files: {', '.join(unknown)}"}), 404
+        selected = iter(files)
+        bundle_name = f"Invoices_{len(files)}_selected.zip"
+    else:
+        summaries = _invoice_view(invoice_listing).iterate('date', (date_from or '',))
+        selected = (s['filename'] for s in matching_invoices(summaries, date_from, date_to,
+                                                              request.values.get('buyer')))
+        bundle_name = f"Invoices_{date_from or 'start'}_to_{date_to or datetime.now().strftime('%Y-%m-%d')}.zip"
+    
+    first = next(selected, None)
+    if first is None:
+        return jsonify({"error": "No invoices match the selection"}), 404
+    members = _bundle_members(itertools.chain([first], selected), kinds)
+    response = Response(stream_with_context(stream_zip(members)), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="{bundle_name}"'
+    return response
+
+
 # ===================== MAIN =====================
 
 if __name__ == '__main__':
@@ -908,7 +1389,8 @@ if __name__ == '__main__':
     
     print(f"✓ Output folder: {OUTPUT_DIR}")
     print(f"✓ PDF folder: {PDF_OUTPUT_DIR}")
-    print(f"✓ PDF conversion: {'Available' if WIN32COM_AVAILABLE else 'Not available'}")
+    print(f"✓ PDF backend: {ACTIVE_PDF_BACKEND or 'Disabled'}"
+          + (f" ({PDF_WORKERS} worker(s))" if ACTIVE_PDF_BACKEND else ""))
     print("=" * 50)
     print("Starting server at http://127.0.0.1:5000")
     print("=" * 50)
@@ -0,0 +1,150 @@
+"""Inter-process file locks and atomic file writes.
+
+Needed once the app runs under more than one WSGI worker process: every
+read-modify-write of a data file happens while holding ``FileLock`` on
+``<file>.lock``, and files are replaced atomically (write a unique temp file
+in the same folder, then ``os.replace``) so readers never see a half-written
+file.  Only the standard library is used (``fcntl`` on Linux/Mac, ``msvcrt``
+on Windows).
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class _Holder:
+    """Process-local state of one lock file (shared by all FileLock objects)."""
+
+    def __init__(self):
+        self.rlock = threading.RLock()
+        self.depth = 0
+        self.fd: Optional[int] = None
+
+
+_holders: Dict[str, _Holder] = {}
+_holders_lock = threading.Lock()
+
+
+def _lock_fd(fd: int) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock_fd(fd: int) -> None:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+
+class FileLock:
+    """Exclusive lock shared by all processes and threads using the same path.
+
+    Usage::
+
+        with FileLock(path + '.lock'):
+            ...read, modify, write...
+
+    Re-entrant within a thread (nested ``with`` blocks on the same path do
+    not deadlock); other threads and other processes wait.  Waits up to
+    ``timeout`` seconds and then raises ``TimeoutError``.
+    """
+
+    def __init__(self, lock_path: str, timeout: float = 30.0, poll: float = 0.01):
+        self.lock_path = os.path.abspath(lock_path)
+        self.timeout = timeout
+        self.poll = poll
+        with _holders_lock:
+            self._holder = _holders.setdefault(self.lock_path, _Holder())
+
+    def acquire(self) -> None:
+        holder = self._holder
+        deadline = time.monotonic() + self.timeout
+        if not holder.rlock.acquire(timeout=self.timeout):
+            raise TimeoutError(f"Timed out waiting for lock {self.lock_path}")
+        if holder.depth == 0:
+            try:
+                os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+                fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                while not _lock_fd(fd):
+                    if time.monotonic() >= deadline:
+                        os.close(fd)
+                        raise TimeoutError(f"Timed out waiting for lock {self.lock_path}")
+                    time.sleep(self.poll)
+            except BaseException:
+                holder.rlock.release()
+                raise
+            holder.fd = fd
+        holder.depth += 1
+
+    def release(self) -> None:
+        holder = self._holder
+        holder.depth -= 1
+        if holder.depth == 0:
+            fd, holder.fd = holder.fd, None
+            _unlock_fd(fd)
+        holder.rlock.release()
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+def lock_for(path: str, timeout: float = 30.0) -> FileLock:
+    """The lock guarding read-modify-write of ``path``."""
+    return FileLock(f"{path}.lock", timeout=timeout)
+
+
+def _temp_path(path: str) -> str:
+    # Unique per process and thread so concurrent writers never share a temp file
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def atomic_write_bytes(path: str, data: bytes) -> None:
+    """Replace ``path`` with ``data`` in one step (all-or-nothing)."""
+    tmp_path = _temp_path(path)
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: str, data: Any, **dump_kwargs) -> None:
+    """Serialise ``data`` as JSON and atomically replace ``path`` with it."""
+    dump_kwargs.setdefault('ensure_ascii', False)
+    atomic_write_bytes(path, json.dumps(data, **dump_kwargs).encode('utf-8'))
+
+
+__all__ = ["FileLock", "lock_for", "atomic_write_bytes", "atomic_write_json"]
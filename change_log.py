@@ -0,0 +1,241 @@
+"""Collection versions for conditional GETs and ``?since=`` deltas.
+
+Every open invoice form polls ``/api/invoices``, ``/api/profiles`` and
+``/api/next_invoice_number``, and each poll used to rebuild and resend the
+whole payload.  A ``ChangeLog`` gives a collection a version that goes up by
+one on every change and remembers the version at which each record last
+changed (or was deleted).  The APIs use it to:
+
+* send the version as a strong ETag and answer ``If-None-Match`` with an
+  empty 304 before building any payload, and
+* answer ``?since=<version>`` with just the records changed or deleted
+  after that version, found by walking the log from its newest end.
+
+The log is a JSON-lines file shared by all worker processes, so any worker
+understands a version handed out by another.  Each process only notes which
+records it saw change, with a token of their content (``record``); ``sync``
+appends those notes to the file under its inter-process lock and bumps the
+version only for records whose token differs from the one already logged.
+A change seen by every worker therefore counts once.  Every process keeps
+the log in memory and reads only the lines appended since its last look, so
+a change costs a few appended lines however large the collection is; the
+file is rewritten without superseded lines once they outnumber the live
+ones.
+
+Versions read ``<log id>.<counter>``; the id is chosen when the log file is
+created, so a version from before the log was reset is not understood and
+the client gets the full collection instead, as it does for versions older
+than the oldest remembered deletion.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from atomic_io import FileLock, atomic_write_bytes, lock_for
+
+# Deletions remembered per collection; older ones are forgotten and clients
+# asking for changes since before them get the full collection
+MAX_TOMBSTONES = 5000
+
+# Superseded lines tolerated (beyond one per live record) before the file is rewritten
+COMPACT_SLACK = 1000
+
+
+def content_token(value) -> str:
+    """Short hash of a JSON-serialisable value, to tell whether a record changed."""
+    canonical = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def _line(item) -> bytes:
+    return json.dumps(item, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class ChangeLog:
+    """Shared, monotonic version of one collection and the version each record last changed at.
+
+    File layout: a header line ``{"id", "floor", "version"}``, then one line
+    ``[version, key, token]`` per change (token null for a deletion).
+    """
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self._lock = threading.RLock()
+        # key -> content token (None if deleted) seen by this process, not yet synced
+        self._pending: Dict[str, Optional[str]] = {}
+        self._reset()
+
+    # ---------- persistence ----------
+
+    def _reset(self) -> None:
+        self._id: Optional[str] = None
+        self._floor = 0
+        self._version = 0
+        # key -> (version, token), oldest change first
+        self._changes: 'OrderedDict[str, Tuple[int, Optional[str]]]' = OrderedDict()
+        self._tombstones = 0
+        self._lines = 0
+        self._inode: Optional[int] = None
+        self._offset = 0
+
+    def _apply(self, item) -> None:
+        if self._id is None:
+            self._id = str(item['id'])
+            self._floor = int(item.get('floor', 0))
+            self._version = int(item.get('version', 0))
+            return
+        version, key, token = item
+        previous = self._changes.pop(key, None)
+        if previous is not None and previous[1] is None:
+            self._tombstones -= 1
+        self._changes[key] = (version, token)
+        if token is None:
+            self._tombstones += 1
+        self._version = max(self._version, version)
+        self._lines += 1
+
+    def _read(self) -> bool:
+        """Catch up with the lines appended to the file; False if there is no usable log."""
+        try:
+            with open(self.path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                if st.st_ino != self._inode or st.st_size < self._offset:
+                    # New or rewritten file: read it from the start
+                    self._reset()
+                    self._inode = st.st_ino
+                if st.st_size == self._offset:
+                    return self._id is not None
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            self._reset()
+            return False
+        # Whole lines only; a line still being appended is read next time
+        end = data.rfind(b'\n') + 1
+        try:
+            for line in data[:end].splitlines():
+                if line.strip():
+                    self._apply(json.loads(line))
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"WARNING: Change log {self.path} unreadable, starting a new one: {e}")
+            self._reset()
+            return False
+        self._offset += end
+        return self._id is not None
+
+    def _rewrite(self, log_id: str, floor: int, version: int,
+                 changes: 'OrderedDict[str, Tuple[int, Optional[str]]]') -> None:
+        lines = [_line({'id': log_id, 'floor': floor, 'version': version})]
+        lines.extend(_line([at, key, token]) for key, (at, token) in changes.items())
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        atomic_write_bytes(self.path, b''.join(lines))
+        self._read()
+
+    def _append(self, records: List[list]) -> None:
+        with open(self.path, 'r+b') as f:
+            # Drop a torn line left by a writer that crashed mid-append
+            f.seek(self._offset)
+            f.truncate()
+            f.write(b''.join(_line(record) for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+        self._read()
+
+    def _compact(self) -> None:
+        """Rewrite the file with one line per record, forgetting the oldest deletions."""
+        changes = OrderedDict(self._changes)
+        floor, tombstones = self._floor, self._tombstones
+        for key, (changed_at, token) in list(changes.items()):
+            if tombstones <= MAX_TOMBSTONES:
+                break
+            if token is None:
+                del changes[key]
+                floor = max(floor, changed_at)
+                tombstones -= 1
+        self._rewrite(self._id, floor, self._version, changes)
+
+    def lock(self) -> FileLock:
+        """Inter-process lock of the log.
+
+        Hold it around refreshing the collection and calling ``sync`` so no
+        other worker bumps the version in between, e.g.::
+
+            with changes.lock():
+                data = refresh()
+                version = changes.sync()
+        """
+        return lock_for(self.path)
+
+    # ---------- recording ----------
+
+    def record(self, key: str, token: Optional[str]) -> None:
+        """Note that ``key`` now has content ``token`` (None: deleted); see ``sync``."""
+        with self._lock:
+            self._pending[key] = token
+
+    def observe(self, signature: Hashable) -> None:
+        """Note the signature of a collection without per-record changes.
+
+        For e.g. the next invoice number, where a shared file signature tells
+        whether anything changed; the version goes up when it differs from
+        the one logged.
+        """
+        self.record(self.name, content_token(signature))
+
+    def sync(self) -> str:
+        """Append this process's notes to the log; returns the current version."""
+        with self._lock:
+            if not self._pending and self._read():
+                return f"{self._id}.{self._version}"
+        # File lock first: listeners call record() while a caller holds it
+        with self.lock(), self._lock:
+            if not self._read():
+                self._rewrite(uuid.uuid4().hex[:8], 0, 0, OrderedDict())
+            fresh = {key: token for key, token in self._pending.items()
+                     if key not in self._changes or self._changes[key][1] != token}
+            self._pending.clear()
+            if fresh:
+                version = self._version + 1
+                self._append([[version, key, token] for key, token in fresh.items()])
+                if (self._lines > 2 * len(self._changes) + COMPACT_SLACK
+                        or self._tombstones > MAX_TOMBSTONES):
+                    self._compact()
+            return f"{self._id}.{self._version}"
+
+    # ---------- reading ----------
+
+    def etag(self, version: str) -> str:
+        """Strong entity tag (unquoted) of a version."""
+        return f"{self.name}-{version}"
+
+    def since(self, version: str) -> Optional[Tuple[List[str], List[str]]]:
+        """(changed keys, deleted keys) after ``version``, newest first.
+
+        None if the version was not issued by this log or is too old to tell.
+        """
+        with self._lock:
+            if not self._read():
+                return None
+            log_id, _, counter = str(version or '').partition('.')
+            if log_id != self._id or not counter.isdigit():
+                return None
+            start = int(counter)
+            if start > self._version or start < self._floor:
+                return None
+            changed, deleted = [], []
+            for key in reversed(self._changes):
+                changed_at, token = self._changes[key]
+                if changed_at <= start:
+                    break
+                (deleted if token is None else changed).append(key)
+        return changed, deleted
+
+
+__all__ = ["ChangeLog", "content_token", "MAX_TOMBSTONES"]
@@ -16,6 +16,15 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 BUYER_PROFILES_JSON = os.path.join(BASE_DIR, "buyer_profiles.json")
 TRANSPORT_MODES_JSON = os.path.join(BASE_DIR, "transport_modes.json")
 
+# Cached invoice metadata (rebuilt automatically if deleted)
+INVOICE_INDEX_JSON = os.path.join(BASE_DIR, "invoice_index.json")
+
+# Files already processed by the bulk importer (extract_invoice_data.py)
+IMPORT_MANIFEST_JSON = os.path.join(BASE_DIR, "import_manifest.json")
+
+# Invoice number counters per financial year (see invoice_numbers.py)
+INVOICE_NUMBERS_JSON = os.path.join(BASE_DIR, "invoice_numbers.json")
+
 # Output folders
 OUTPUT_DIR = os.path.join(BASE_DIR, "Generated_Invoices")
 PDF_OUTPUT_DIR = os.path.join(BASE_DIR, "Generated_Invoices_PDF")
@@ -57,6 +66,43 @@ def _discover_template_file() -> Optional[str]:
 
 TEMPLATE_EXCEL_FILE = _discover_template_file()
 
+# Invoice generation engine:
+#   "openpyxl" - rebuild the workbook from the template with openpyxl (default)
+#   "zip"      - patch the template .xlsx in place at the XML level, keeping
+#                images, print areas and other parts openpyxl would drop
+INVOICE_ENGINE = os.environ.get("INVOICE_ENGINE", "openpyxl").strip().lower()
+
+# PDF backend:
+#   "auto"    - Excel COM automation when available (Windows + Excel), else builtin
+#   "excel"   - export through Excel (requires pywin32 and Microsoft Excel)
+#   "builtin" - pure-Python renderer (pdf_render.py), works on any OS
+#   "none"    - do not produce PDFs
+PDF_BACKEND = os.environ.get("PDF_BACKEND", "auto").strip().lower()
+
+# PDF converter pool (pdf_service.py): number of warm converter workers,
+# maximum queued jobs and seconds a job may wait + run before it is failed
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", "1"))
+PDF_QUEUE_SIZE = int(os.environ.get("PDF_QUEUE_SIZE", "16"))
+PDF_TIMEOUT = float(os.environ.get("PDF_TIMEOUT", "60"))
+
+# Storage backend for profiles, transport modes and the invoice register:
+#   "json"   - buyer_profiles.json / transport_modes.json (default)
+#   "sqlite" - embedded SQLite database (sqlite_store.py); the JSON files are
+#              imported once on first start
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "json").strip().lower()
+SQLITE_DB = os.environ.get("SQLITE_DB", os.path.join(BASE_DIR, "invoice_data.db"))
+
+# Change journal of the JSON data files (journal.py): a snapshot is written
+# every JOURNAL_COMPACT_EVERY changes, history older than
+# JOURNAL_RETENTION_DAYS is pruned
+JOURNAL_DIR = os.path.join(BASE_DIR, "_journal")
+JOURNAL_COMPACT_EVERY = int(os.environ.get("JOURNAL_COMPACT_EVERY", "200"))
+JOURNAL_RETENTION_DAYS = float(os.environ.get("JOURNAL_RETENTION_DAYS", "90"))
+
+# Shared change logs behind the collection versions of /api/invoices,
+# /api/profiles and /api/next_invoice_number (change_log.py)
+CHANGE_LOG_DIR = os.path.join(BASE_DIR, "_changes")
+
 def ensure_dirs():
     """Create output directories if they do not exist."""
     os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -66,9 +112,23 @@ __all__ = [
     "BASE_DIR",
     "BUYER_PROFILES_JSON",
     "TRANSPORT_MODES_JSON",
+    "INVOICE_INDEX_JSON",
+    "IMPORT_MANIFEST_JSON",
+    "INVOICE_NUMBERS_JSON",
     "OUTPUT_DIR",
     "PDF_OUTPUT_DIR",
     "TEMPLATE_DIR",
     "TEMPLATE_EXCEL_FILE",
+    "INVOICE_ENGINE",
+    "PDF_BACKEND",
+    "PDF_WORKERS",
+    "PDF_QUEUE_SIZE",
+    "PDF_TIMEOUT",
+    "STORAGE_BACKEND",
+    "SQLITE_DB",
+    "JOURNAL_DIR",
+    "JOURNAL_COMPACT_EVERY",
+    "JOURNAL_RETENTION_DAYS",
+    "CHANGE_LOG_DIR",
     "ensure_dirs",
 ]
@@ -0,0 +1,278 @@
+import os
+import threading
+from copy import copy
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import openpyxl
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.styles.numbers import BUILTIN_FORMATS_MAX_SIZE, BUILTIN_FORMATS_REVERSE
+from openpyxl.utils.indexed_list import IndexedList
+
+from amount_words import amount_in_words
+from tax_rules import TAX_COMPONENTS, TAX_RULES, compute_totals, rate_label
+
+# Rows in the template that hold line items (A18:I27)
+FIRST_ITEM_ROW = 18
+MAX_ITEM_ROWS = 10
+
+
+class StyleRegistry:
+    """Interns template styles into one shared table of style IDs.
+
+    The tables are laid out exactly as a fresh openpyxl Workbook would build
+    them, so a generated workbook can be seeded with copies of these tables
+    and each cell gets its style by ID (a StyleArray of indices) instead of
+    copying and re-hashing Font/Border/Fill/... objects cell by cell.
+    """
+
+    def __init__(self):
+        wb = openpyxl.Workbook()
+        self.fonts = IndexedList(wb._fonts)
+        self.fills = IndexedList(wb._fills)
+        self.borders = IndexedList(wb._borders)
+        self.number_formats = IndexedList(wb._number_formats)
+        self.protections = IndexedList(wb._protections)
+        self.alignments = IndexedList(wb._alignments)
+        self.cell_styles = IndexedList(wb._cell_styles)
+
+    def intern(self, cell):
+        """Return the shared style ID for a template cell's style."""
+        number_format = cell.number_format
+        if number_format in BUILTIN_FORMATS_REVERSE:
+            num_fmt_id = BUILTIN_FORMATS_REVERSE[number_format]
+        else:
+            num_fmt_id = self.number_formats.add(number_format) + BUILTIN_FORMATS_MAX_SIZE
+        style = StyleArray()
+        style.fontId = self.fonts.add(copy(cell.font))
+        style.fillId = self.fills.add(copy(cell.fill))
+        style.borderId = self.borders.add(copy(cell.border))
+        style.numFmtId = num_fmt_id
+        style.protectionId = self.protections.add(copy(cell.protection))
+        style.alignmentId = self.alignments.add(copy(cell.alignment))
+        return self.cell_styles.add(style)
+
+    def seed(self, dest_wb):
+        """Install this registry's style tables into a new workbook."""
+        dest_wb._fonts = IndexedList(self.fonts)
+        dest_wb._fills = IndexedList(self.fills)
+        dest_wb._borders = IndexedList(self.borders)
+        dest_wb._number_formats = IndexedList(self.number_formats)
+        dest_wb._protections = IndexedList(self.protections)
+        dest_wb._alignments = IndexedList(self.alignments)
+        dest_wb._cell_styles = IndexedList(self.cell_styles)
+
+
+class CompiledSheet(NamedTuple):
+    """Immutable snapshot of one template worksheet."""
+    title: str
+    page_setup: object
+    page_margins: object
+    # (row, column, value, style_id) - style_id indexes StyleRegistry.cell_styles
+    # and is None for unstyled cells.
+    cells: Tuple[tuple, ...]
+    # (key, width, hidden, outline_level, collapsed)
+    column_dimensions: Tuple[tuple, ...]
+    # (index, height, hidden, outline_level, collapsed)
+    row_dimensions: Tuple[tuple, ...]
+    merged_ranges: Tuple[str, ...]
+
+
+class CompiledTemplate(NamedTuple):
+    path: str
+    mtime: float
+    sheets: Tuple[CompiledSheet, ...]
+    styles: StyleRegistry
+
+
+_template_cache: Dict[str, CompiledTemplate] = {}
+_template_cache_lock = threading.Lock()
+
+
+def _compile_template(source_filepath, mtime):
+    """Parse the template once into a CompiledTemplate."""
+    source_wb = openpyxl.load_workbook(source_filepath)
+    styles = StyleRegistry()
+    sheets = []
+    for source_sheet in source_wb.worksheets:
+        cells = []
+        for row in source_sheet.iter_rows():
+            for source_cell in row:
+                style_id = styles.intern(source_cell) if source_cell.has_style else None
+                if source_cell.value is None and style_id is None:
+                    continue
+                cells.append((source_cell.row, source_cell.column, source_cell.value, style_id))
+
+        column_dimensions = tuple(
+            (key, dim.width, dim.hidden, dim.outline_level, dim.collapsed)
+            for key, dim in source_sheet.column_dimensions.items()
+        )
+        row_dimensions = tuple(
+            (idx, dim.height, dim.hidden, dim.outline_level, dim.collapsed)
+            for idx, dim in source_sheet.row_dimensions.items()
+        )
+        sheets.append(CompiledSheet(
+            title=source_sheet.title,
+            page_setup=copy(source_sheet.page_setup),
+            page_margins=copy(source_sheet.page_margins),
+            cells=tuple(cells),
+            column_dimensions=column_dimensions,
+            row_dimensions=row_dimensions,
+            merged_ranges=tuple(str(r) for r in source_sheet.merged_cells.ranges),
+        ))
+    source_wb.close()
+    return CompiledTemplate(path=source_filepath, mtime=mtime, sheets=tuple(sheets),
+                            styles=styles)
+
+
+def get_compiled_template(source_filepath) -> Optional[CompiledTemplate]:
+    """Return the compiled template, re-parsing only when the file's mtime changes."""
+    try:
+        mtime = os.path.getmtime(source_filepath)
+    except OSError:
+        return None
+    with _template_cache_lock:
+        cached = _template_cache.get(source_filepath)
+        if cached is not None and cached.mtime == mtime:
+            return cached
+        compiled = _compile_template(source_filepath, mtime)
+        _template_cache[source_filepath] = compiled
+        return compiled
+
+
+def clear_template_cache():
+    with _template_cache_lock:
+        _template_cache.clear()
+
+
+def _render_sheet(dest_sheet, compiled_sheet, styles):
+    """Replay a compiled sheet (values, styles, dimensions, merges) into dest_sheet.
+
+    The destination workbook must already be seeded with ``styles``.
+    """
+    dest_sheet.page_setup = copy(compiled_sheet.page_setup)
+    dest_sheet.page_margins = copy(compiled_sheet.page_margins)
+
+    cell_styles = styles.cell_styles
+    for row, column, value, style_id in compiled_sheet.cells:
+        dest_cell = dest_sheet.cell(row=row, column=column, value=value)
+        if style_id is not None:
+            # Each cell needs its own StyleArray: openpyxl mutates it in place
+            dest_cell._style = copy(cell_styles[style_id])
+
+    for key, width, hidden, outline_level, collapsed in compiled_sheet.column_dimensions:
+        dest_dim = dest_sheet.column_dimensions[key]
+        dest_dim.width = width
+        dest_dim.hidden = hidden
+        dest_dim.outline_level = outline_level
+        dest_dim.collapsed = collapsed
+
+    for idx, height, hidden, outline_level, collapsed in compiled_sheet.row_dimensions:
+        dest_dim = dest_sheet.row_dimensions[idx]
+        dest_dim.height = height
+        dest_dim.hidden = hidden
+        dest_dim.outline_level = outline_level
+        dest_dim.collapsed = collapsed
+
+    for merged_range in compiled_sheet.merged_ranges:
+        dest_sheet.merge_cells(merged_range)
+
+
+def invoice_cell_values(config):
+    """Return {cell: value} for the variable invoice cells.
+
+    Covers E2, H2, A8:A15, E10, the item rows, C30:E32, I29-I35 and A37.
+    Shared by every generation engine so they all write identical values.
+    """
+    values = {}
+    # Update Invoice Number and Date from config if provided
+    if config.get("invoice_number"):
+        values['E2'] = config.get("invoice_number")
+    if config.get("invoice_date"):
+        values['H2'] = config.get("invoice_date")
+
+    # Buyer Details (A8:A15)
+    buyer_details = config.get("buyer_details", [])
+    for i, detail in enumerate(buyer_details[:8]):
+        values[f'A{8+i}'] = detail
+
+    # Mode of Transport (E10)
+    values['E10'] = config.get("mode_of_transport", "")
+
+    # Item rows (A18:I27) - falls back to the single item_details entry
+    items = config.get("items") or ([config["item_details"]] if config.get("item_details") else [])
+    items = items[:MAX_ITEM_ROWS]
+    totals = compute_totals(items, config.get("tax_type", "IGST"))  # Default to IGST
+    for offset, (item, amount) in enumerate(zip(items, totals.item_amounts)):
+        row = FIRST_ITEM_ROW + offset
+        values[f'A{row}'] = item.get("description", "")
+        values[f'F{row}'] = item.get("quantity", 0)
+        values[f'G{row}'] = item.get("rate", 0)
+        values[f'I{row}'] = float(amount)
+
+    # Subtotal in I29
+    values['I29'] = float(totals.subtotal)
+
+    # Tax rows (C30:I32) - rates from tax_rules.TAX_RULES and the items' GST rates
+    if config.get("tax_type", "IGST") in TAX_RULES:
+        for row, component in enumerate(TAX_COMPONENTS, start=30):
+            values[f'C{row}'] = component['label']
+            values[f'E{row}'] = rate_label(totals.tax_rates[component['key']])
+            values[f'I{row}'] = float(totals.taxes[component['key']])
+
+    values['I34'] = float(totals.round_off)      # Round off
+    values['I35'] = int(totals.rounded_total)    # Final TOTAL
+
+    values['A37'] = "AMOUNT : " + amount_in_words(totals.rounded_total)
+    return values
+
+
+def is_amount_cell(ref):
+    """Amount cells (column I, rows 18-35) are written with two decimals."""
+    return ref[0] == 'I' and FIRST_ITEM_ROW <= int(ref[1:]) <= 35
+
+
+def fill_invoice_cells(dest_sheet, config):
+    """Write the variable invoice cells into an openpyxl worksheet."""
+    for ref, value in invoice_cell_values(config).items():
+        dest_sheet[ref] = value
+        if is_amount_cell(ref):
+            dest_sheet[ref].number_format = '0.00'
+
+
+def copy_excel_with_formatting(source_filepath, destination_filepath, config):
+    """
+    Creates an invoice workbook from the Excel template with formatting preserved.
+
+    The template is parsed once into an immutable CompiledTemplate (cached and
+    invalidated by the template's mtime); each invoice replays that snapshot
+    and then fills in only the variable cells from config.
+
+    Args:
+        source_filepath (str): Path to the source Excel template.
+        destination_filepath (str): Path to save the generated Excel file.
+        config (dict): Dictionary containing the data to update in the Excel file.
+    """
+    compiled = get_compiled_template(source_filepath)
+    if compiled is None:
+        print(f"Error: Source file not found at {source_filepath}")
+        return
+
+    # Create a new workbook for the destination
+    dest_wb = openpyxl.Workbook()
+    # Remove the default sheet created with a new workbook
+    if dest_wb.sheetnames:
+        dest_wb.remove(dest_wb.active)
+    compiled.styles.seed(dest_wb)
+
+    for compiled_sheet in compiled.sheets:
+        dest_sheet = dest_wb.create_sheet(title=compiled_sheet.title)
+        _render_sheet(dest_sheet, compiled_sheet, compiled.styles)
+        fill_invoice_cells(dest_sheet, config)
+
+    # Save the destination workbook
+    try:
+        dest_wb.save(destination_filepath)
+        print(f"File copied successfully to {destination_filepath}")
+    except Exception as e:
+        print(f"Error saving destination file in copy1.py: {e}")
+        raise  # Re-raise the exception to be caught by app.py
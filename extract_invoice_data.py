@@ -1,14 +1,31 @@
+"""Bulk importer: build buyer profiles and transport modes from old invoices.
+
+Usage:
+    python extract_invoice_data.py [DIR ...] [--recursive] [--workers N]
+
+Workbooks are parsed in parallel over a process pool.  A manifest of
+processed file hashes (import_manifest.json) makes re-runs incremental: only
+new or changed workbooks are read.  Results are merged into the existing
+buyer profiles and transport modes instead of replacing them, through the
+app's own storage layer (``load_data`` / ``save_data``), so imports land in
+the SQLite tables when ``STORAGE_BACKEND=sqlite`` and are journaled.
+"""
 import os
 import json
-import openpyxl
 import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from atomic_io import atomic_write_json, lock_for
+from xlsx_reader import read_cells
+from transport import extract_transport_core, normalize_transport_mode
+from config import BUYER_PROFILES_JSON, TRANSPORT_MODES_JSON, IMPORT_MANIFEST_JSON
 
+# Default folders scanned when no directories are given on the command line
 INVOICES_DIRS = [ # Changed to a list of directories
     "C:\\Users\\KIIT0001\\Documents\\Bills\\Shakambhari Enterprises\\GST Invoices",
     "C:\\Users\\KIIT0001\\Documents\\Bills\\Shakambhari Enterprises\\GST Invoices\\Old GST Invoices"
 ]
-BUYER_PROFILES_JSON = "c:\\Users\\KIIT0001\\Documents\\Bills\\Shakambhari Enterprises\\buyer_profiles.json"
-TRANSPORT_MODES_JSON = "c:\\Users\\KIIT0001\\Documents\\Bills\\Shakambhari Enterprises\\transport_modes.json"
 
 def extract_buyer_name_from_details(details_list):
     if not details_list:
@@ -74,94 +91,237 @@ def get_profile_id(gstin, buyer_details_tuple):
     hasher.update(str(buyer_details_tuple).encode('utf-8'))
     return f"hash_{hasher.hexdigest()}"
 
-def main():
-    buyer_profiles_dict = {}
-    transport_modes_set = set()
+def detect_tax_type(cells):
+    """Work out IGST vs CGST_SGST from the tax rows (I30/I31, E30/E31, C30/C31)."""
+    igst_val_cell = cells['I30']
+    cgst_val_cell = cells['I31']
+
+    # Check numeric values first
+    igst_amount = float(igst_val_cell) if isinstance(igst_val_cell, (int, float)) else 0.0
+    cgst_amount = float(cgst_val_cell) if isinstance(cgst_val_cell, (int, float)) else 0.0
+
+    # Check percentage labels in column E
+    e30_val = str(cells['E30'] or "").strip()
+    e31_val = str(cells['E31'] or "").strip()
+
+    if igst_amount > 0 and e30_val not in ["0.00%", "0%"]:
+        return "IGST"
+    if cgst_amount > 0 and e31_val not in ["0.00%", "0%"]:
+        return "CGST_SGST"
+    # Fallback to labels in C if amounts are zero or percentages are ambiguous
+    c30_label = str(cells['C30'] or "").upper()
+    c31_label = str(cells['C31'] or "").upper()
+    if "I.G.S.T" in c30_label and e30_val not in ["0.00%", "0%"]:
+        return "IGST"
+    if "C.G.S.T" in c31_label and e31_val not in ["0.00%", "0%"]:
+        return "CGST_SGST"
+    return "UNKNOWN"
+
+
+def file_hash(filepath):
+    hasher = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def parse_invoice_file(filepath):
+    """Parse one workbook (runs in a worker process).
+
+    Returns a dict with the file hash and the extracted profile/transport, or
+    with an 'error' key if the workbook could not be read.
+    """
+    result = {"path": filepath, "hash": None}
+    try:
+        result["hash"] = file_hash(filepath)
+        cells = read_cells(filepath)
+
+        current_buyer_details = []
+        for i in range(8, 16):  # A8 to A15
+            cell_value = cells[f'A{i}']
+            current_buyer_details.append(str(cell_value).strip() if cell_value is not None else "")
+        # Filter out trailing empty strings from buyer_details for cleaner storage
+        while current_buyer_details and not current_buyer_details[-1]:
+            current_buyer_details.pop()
+
+        extracted_gstin = extract_gstin_from_details(current_buyer_details)
+        result["profile"] = {
+            "profile_id": get_profile_id(extracted_gstin, tuple(current_buyer_details)), # Store the ID used (GSTIN or hash)
+            "buyer_name": extract_buyer_name_from_details(current_buyer_details),
+            "buyer_details": current_buyer_details,
+            "gstin": extracted_gstin if extracted_gstin else "",
+            "default_tax_type": detect_tax_type(cells)
+        }
+        result["transport_mode"] = str(cells['E10']).strip() if cells['E10'] is not None else ""
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def load_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except json.JSONDecodeError as e:
+        print(f"Warning: could not parse {path} ({e}); starting from empty data")
+        return default
+
+
+def write_json(path, data, indent=4):
+    atomic_write_json(path, data, indent=indent)
+
 
-    for invoices_dir in INVOICES_DIRS: # Iterate through each directory
+def find_workbooks(directories, recursive=False):
+    """Yield (path, stat) for every candidate .xlsx in the given directories."""
+    for invoices_dir in directories:
         print(f"Scanning directory: {invoices_dir}")
-        if not os.path.exists(invoices_dir):
+        if not os.path.isdir(invoices_dir):
             print(f"Warning: Directory not found - {invoices_dir}")
             continue
+        for root, dirs, files in os.walk(invoices_dir):
+            for filename in files:
+                if filename.endswith(".xlsx") and not filename.startswith("~"):
+                    filepath = os.path.join(root, filename)
+                    try:
+                        yield filepath, os.stat(filepath)
+                    except OSError:
+                        continue
+            if not recursive:
+                break
+
+
+def merge_profiles(existing_profiles, new_profiles):
+    """Merge imported profiles into existing ones without losing edits.
+
+    New profile ids are added.  For ids that already exist, only blank fields
+    are filled in; names, details and tax types edited in the app are kept.
+    Returns (merged list, added count, updated count).
+    """
+    merged = list(existing_profiles)
+    by_id = {p.get('profile_id'): p for p in merged if p.get('profile_id')}
+    added = updated = 0
+    for profile in new_profiles:
+        current = by_id.get(profile["profile_id"])
+        if current is None:
+            merged.append(profile)
+            by_id[profile["profile_id"]] = profile
+            added += 1
+            continue
+        changed = False
+        for key, value in profile.items():
+            if value and (not current.get(key) or current.get(key) == "UNKNOWN"):
+                current[key] = value
+                changed = True
+        updated += changed
+    merged.sort(key=lambda p: p.get('buyer_name', '').lower())
+    return merged, added, updated
+
+
+def merge_transport_modes(existing_modes, new_modes):
+    """Add new transport modes (canonical format), de-duplicated by core value."""
+    merged = list(existing_modes)
+    seen = {extract_transport_core(m).lower() for m in merged}
+    added = 0
+    for mode in new_modes:
+        core = extract_transport_core(mode)
+        if core and core.lower() not in seen:
+            seen.add(core.lower())
+            merged.append(normalize_transport_mode(mode))
+            added += 1
+    return merged, added
+
+
+def run_import(directories, recursive=False, workers=None,
+               profiles_path=BUYER_PROFILES_JSON, transport_path=TRANSPORT_MODES_JSON,
+               manifest_path=IMPORT_MANIFEST_JSON, load=None, save=None):
+    """Import new or changed workbooks and merge what they contain.
+
+    ``load(path)`` / ``save(path, data)`` read and write the profile and
+    transport lists; they default to plain JSON files (main() passes the
+    app's storage layer).
+    """
+    load = load or (lambda path: load_json(path, []))
+    save = save or write_json
+    manifest = load_json(manifest_path, {})
+    known_hashes = manifest.setdefault("hashes", {})
+    stat_cache = manifest.setdefault("files", {})
+
+    # Skip files whose (mtime, size) already maps to a processed hash
+    pending = []
+    skipped = 0
+    for filepath, st in find_workbooks(directories, recursive):
+        cached = stat_cache.get(filepath)
+        if cached and cached[0] == st.st_mtime and cached[1] == st.st_size and cached[2] in known_hashes:
+            skipped += 1
+            continue
+        pending.append((filepath, st))
+    print(f"{len(pending)} new or changed workbooks, {skipped} already imported")
+
+    # Parse in parallel; oldest first so the newest invoice wins for a new buyer
+    pending.sort(key=lambda item: item[1].st_mtime)
+    paths = [filepath for filepath, _ in pending]
+    if workers == 1 or len(paths) < 2:
+        results = [parse_invoice_file(p) for p in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(parse_invoice_file, paths, chunksize=16))
+
+    new_profiles = {}
+    new_modes = []
+    errors = 0
+    now = datetime.now().isoformat(timespec='seconds')
+    for (filepath, st), result in zip(pending, results):
+        if "error" in result:
+            errors += 1
+            print(f"Error processing file {filepath}: {result['error']}")
+            continue
+        stat_cache[filepath] = [st.st_mtime, st.st_size, result["hash"]]
+        if result["hash"] in known_hashes:
+            continue  # same content already imported from another path
+        known_hashes[result["hash"]] = {"path": filepath, "imported_at": now}
+        profile = result["profile"]
+        new_profiles[profile["profile_id"]] = profile
+        if result["transport_mode"]:
+            new_modes.append(result["transport_mode"])
+
+    # Merge under the same locks the running app uses, so no edit is lost
+    with lock_for(profiles_path):
+        profiles, added, updated = merge_profiles(load(profiles_path), new_profiles.values())
+        if (added or updated) and save(profiles_path, profiles) is False:
+            raise IOError(f"Could not save buyer profiles to {profiles_path}")
+    with lock_for(transport_path):
+        modes, modes_added = merge_transport_modes(load(transport_path), new_modes)
+        if modes_added and save(transport_path, modes) is False:
+            raise IOError(f"Could not save transport modes to {transport_path}")
+    write_json(manifest_path, manifest, indent=None)
+
+    print(f"\nBuyer profiles: {added} added, {updated} updated, {len(profiles)} total -> {profiles_path}")
+    print(f"Transport modes: {modes_added} added, {len(modes)} total -> {transport_path}")
+    if errors:
+        print(f"{errors} workbooks could not be read (they will be retried next run)")
+    return {"added": added, "updated": updated, "modes_added": modes_added,
+            "skipped": skipped, "errors": errors}
+
 
-        for filename in os.listdir(invoices_dir):
-            if filename.endswith(".xlsx") and not filename.startswith("~"):
-                filepath = os.path.join(invoices_dir, filename)
-                print(f"Processing file: {filepath}")
-                try:
-                    workbook = openpyxl.load_workbook(filepath, data_only=True)
-                    sheet = workbook.active
-
-                    current_buyer_details = []
-                    for i in range(8, 16):  # A8 to A15
-                        cell_value = sheet[f'A{i}'].value
-                        current_buyer_details.append(str(cell_value).strip() if cell_value is not None else "")
-                    # Filter out trailing empty strings from buyer_details for cleaner storage
-                    while current_buyer_details and not current_buyer_details[-1]:
-                        current_buyer_details.pop()
-
-                    current_mode_of_transport = str(sheet['E10'].value).strip() if sheet['E10'].value is not None else ""
-                    if current_mode_of_transport:
-                        transport_modes_set.add(current_mode_of_transport)
-
-                    current_tax_type = "UNKNOWN"
-                    igst_val_cell = sheet['I30'].value
-                    cgst_val_cell = sheet['I31'].value
-                    
-                    # Check numeric values first
-                    igst_amount = float(igst_val_cell) if isinstance(igst_val_cell, (int, float)) else 0.0
-                    cgst_amount = float(cgst_val_cell) if isinstance(cgst_val_cell, (int, float)) else 0.0
-
-                    # Check percentage labels in column E
-                    e30_val = str(sheet['E30'].value or "").strip()
-                    e31_val = str(sheet['E31'].value or "").strip()
-
-                    if igst_amount > 0 and e30_val not in ["0.00%", "0%"]:
-                        current_tax_type = "IGST"
-                    elif cgst_amount > 0 and e31_val not in ["0.00%", "0%"]:
-                        current_tax_type = "CGST_SGST"
-                    else: # Fallback to labels in C if amounts are zero or percentages are ambiguous
-                        c30_label = str(sheet['C30'].value or "").upper()
-                        c31_label = str(sheet['C31'].value or "").upper()
-                        if "I.G.S.T" in c30_label and e30_val not in ["0.00%", "0%"]:
-                            current_tax_type = "IGST"
-                        elif "C.G.S.T" in c31_label and e31_val not in ["0.00%", "0%"]:
-                            current_tax_type = "CGST_SGST"
-                    
-                    extracted_gstin = extract_gstin_from_details(current_buyer_details)
-                    extracted_buyer_name = extract_buyer_name_from_details(current_buyer_details)
-
-                    profile_id = get_profile_id(extracted_gstin, tuple(current_buyer_details))
-
-                    # Add or update buyer profile
-                    # If profile exists, current data (especially tax type) from this file will overwrite
-                    # This ensures the latest file processed for a given GSTIN sets its default_tax_type
-                    buyer_profiles_dict[profile_id] = {
-                        "profile_id": profile_id, # Store the ID used (GSTIN or hash)
-                        "buyer_name": extracted_buyer_name,
-                        "buyer_details": current_buyer_details,
-                        "gstin": extracted_gstin if extracted_gstin else "",
-                        "default_tax_type": current_tax_type
-                    }
-                    print(f"  Processed profile for: {extracted_buyer_name} (ID: {profile_id}, Tax: {current_tax_type})")
-
-                except Exception as e:
-                    print(f"Error processing file {filepath}: {e}")
-
-    # Convert dictionary to list for JSON output
-    final_buyer_profiles = sorted(list(buyer_profiles_dict.values()), key=lambda p: p['buyer_name'])
-    final_transport_modes = sorted(list(transport_modes_set))
-    # Filter out empty transport modes
-    final_transport_modes = [mode for mode in final_transport_modes if mode]
-
-
-    with open(BUYER_PROFILES_JSON, 'w') as f:
-        json.dump(final_buyer_profiles, f, indent=4)
-    print(f"\\nSuccessfully extracted {len(final_buyer_profiles)} buyer profiles to {BUYER_PROFILES_JSON}")
-
-    with open(TRANSPORT_MODES_JSON, 'w') as f:
-        json.dump(final_transport_modes, f, indent=4)
-    print(f"Successfully extracted {len(final_transport_modes)} unique transport modes to {TRANSPORT_MODES_JSON}")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import buyer profiles and transport modes from invoice workbooks.")
+    parser.add_argument("directories", nargs="*", default=INVOICES_DIRS,
+                        help="folders containing invoice .xlsx files")
+    parser.add_argument("-r", "--recursive", action="store_true", help="also scan subfolders")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="worker processes (default: CPU count, 1 = no pool)")
+    parser.add_argument("--profiles", default=BUYER_PROFILES_JSON, help="buyer profiles JSON to merge into")
+    parser.add_argument("--transport", default=TRANSPORT_MODES_JSON, help="transport modes JSON to merge into")
+    parser.add_argument("--manifest", default=IMPORT_MANIFEST_JSON, help="manifest of already-imported files")
+    args = parser.parse_args(argv)
+    # Same storage as the running app (JSON files or SQLite tables, journaled)
+    from app import load_data, save_data
+    run_import(args.directories, recursive=args.recursive, workers=args.workers,
+               profiles_path=args.profiles, transport_path=args.transport,
+               manifest_path=args.manifest, load=load_data, save=save_data)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,216 @@
+"""Persistent metadata index for generated invoice workbooks.
+
+Opening every ``Invoice_*.xlsx`` with openpyxl on each page load does not
+scale once the output folder holds a few thousand invoices.  This module keeps
+a small JSON index next to the other data files, keyed by filename and
+validated by file mtime + size, so listing only has to re-parse workbooks that
+are new or have changed since the last scan.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from atomic_io import atomic_write_json
+
+INDEX_VERSION = 4
+
+# Invoice_<number>_<yyyy>_<yy>_<buyer>.xlsx as written by generate_invoice
+_FILENAME_RE = re.compile(r'Invoice_([^_]+)_\d{4}_\d{2}_(.*)\.xlsx$')
+
+
+class InvoiceIndex:
+    """Filename -> metadata cache reconciled incrementally against a folder.
+
+    ``parser`` is called with the full path of a workbook and must return a
+    JSON‑serialisable dict of metadata.  It is only invoked for files whose
+    (mtime, size) signature differs from what is stored in the index.
+
+    ``listener``, if given, is called as ``listener(filename, entry)`` for
+    every added or changed entry and ``listener(filename, None)`` for every
+    removed one (used to mirror the register into SQLite).
+    """
+
+    def __init__(self, index_path: str, invoices_dir: str,
+                 parser: Callable[[str], Dict],
+                 listener: Optional[Callable[[str, Optional[Dict]], None]] = None):
+        self.index_path = index_path
+        self.invoices_dir = invoices_dir
+        self.parser = parser
+        self.listener = listener
+        self._lock = threading.RLock()
+        self._entries: Optional[Dict[str, Dict]] = None
+        self._folder_mtime: Optional[int] = None
+
+    # ---------- persistence ----------
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._entries is not None:
+            return self._entries
+        entries: Dict[str, Dict] = {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+            if isinstance(raw, dict) and raw.get('version') == INDEX_VERSION:
+                entries = raw.get('entries', {}) or {}
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"WARNING: Invoice index unreadable, rebuilding: {e}")
+        self._entries = entries
+        return entries
+
+    def _save(self) -> None:
+        try:
+            atomic_write_json(self.index_path, {'version': INDEX_VERSION, 'entries': self._entries},
+                              separators=(',', ':'))
+        except OSError as e:
+            print(f"WARNING: Could not save invoice index {self.index_path}: {e}")
+
+    # ---------- helpers ----------
+
+    @staticmethod
+    def is_invoice_file(fname: str) -> bool:
+        return fname.startswith('Invoice_') and fname.endswith('.xlsx')
+
+    def _parse_entry(self, filepath: str, st: os.stat_result) -> Dict:
+        try:
+            meta = self.parser(filepath) or {}
+        except Exception as e:
+            print(f"WARNING: Could not read invoice metadata from {filepath}: {e}")
+            meta = {}
+        return {'mtime': st.st_mtime, 'size': st.st_size, 'meta': meta}
+
+    def _notify(self, filename: str, entry: Optional[Dict]) -> None:
+        if self.listener is None:
+            return
+        try:
+            self.listener(filename, entry)
+        except Exception as e:
+            print(f"WARNING: Invoice index listener failed for {filename}: {e}")
+
+    # ---------- public API ----------
+
+    def reconcile(self) -> Dict[str, Dict]:
+        """Bring the index in line with the folder, re-parsing only changed files.
+
+        Returns the (filename -> entry) mapping.  The index file is only
+        rewritten when something was added, changed or removed.
+        """
+        with self._lock:
+            entries = self._load()
+            dirty = False
+            seen = set()
+            try:
+                self._folder_mtime = os.stat(self.invoices_dir).st_mtime_ns
+            except OSError:
+                self._folder_mtime = None
+            try:
+                with os.scandir(self.invoices_dir) as it:
+                    for de in it:
+                        if not self.is_invoice_file(de.name):
+                            continue
+                        try:
+                            st = de.stat()
+                        except OSError:
+                            continue
+                        seen.add(de.name)
+                        cached = entries.get(de.name)
+                        if (cached and cached.get('mtime') == st.st_mtime
+                                and cached.get('size') == st.st_size):
+                            continue
+                        entries[de.name] = self._parse_entry(de.path, st)
+                        self._notify(de.name, entries[de.name])
+                        dirty = True
+            except FileNotFoundError:
+                pass
+            for stale in [name for name in entries if name not in seen]:
+                del entries[stale]
+                self._notify(stale, None)
+                dirty = True
+            if dirty:
+                self._save()
+            return entries
+
+    def rebuild(self) -> Dict[str, Dict]:
+        """Re-parse every workbook (e.g. after fixing invoices by hand in Excel)."""
+        with self._lock:
+            entries = self._load()
+            for entry in entries.values():
+                entry['mtime'] = None  # force a re-parse on reconcile
+            return self.reconcile()
+
+    def refresh(self) -> Dict[str, Dict]:
+        """Like reconcile(), but skips the folder scan while the folder itself
+        is unchanged (no invoice added, removed or replaced since the last scan).
+        """
+        with self._lock:
+            try:
+                folder_mtime = os.stat(self.invoices_dir).st_mtime_ns
+            except OSError:
+                folder_mtime = None
+            if folder_mtime is not None and folder_mtime == self._folder_mtime:
+                return self._load()
+            return self.reconcile()
+
+    def update(self, filename: str) -> Optional[Dict]:
+        """Re-index a single file (call right after writing it)."""
+        filepath = os.path.join(self.invoices_dir, filename)
+        with self._lock:
+            entries = self._load()
+            try:
+                st = os.stat(filepath)
+            except OSError:
+                if entries.pop(filename, None) is not None:
+                    self._notify(filename, None)
+                    self._save()
+                return None
+            entries[filename] = self._parse_entry(filepath, st)
+            self._notify(filename, entries[filename])
+            self._save()
+            return entries[filename]
+
+    def remove(self, filename: str) -> None:
+        with self._lock:
+            if self._load().pop(filename, None) is not None:
+                self._notify(filename, None)
+                self._save()
+
+    def items(self) -> List[tuple]:
+        """Reconciled ``(filename, entry)`` pairs, newest filename first."""
+        entries = self.refresh()
+        return sorted(entries.items(), key=lambda kv: kv[0], reverse=True)
+
+
+def invoice_summary(filename: str, entry: Dict) -> Dict:
+    """Listing row for one index entry (number and buyer come from the filename)."""
+    modified = datetime.fromtimestamp(entry['mtime'])
+    m = _FILENAME_RE.match(filename)
+    if m:
+        invoice_num, buyer_name = m.group(1), m.group(2)
+    else:
+        parts = filename.replace('.xlsx', '').split('_')
+        invoice_num = parts[1] if len(parts) > 1 else ''
+        buyer_name = ' '.join(parts[3:]) if len(parts) > 3 else ''
+    summary = {
+        'filename': filename,
+        'invoice_number': invoice_num,
+        'buyer_name': buyer_name.replace('_', ' '),
+        'modified_date': modified.strftime('%Y-%m-%d %H:%M'),
+        'invoice_date': modified.strftime('%Y-%m-%d'),
+        'mtime': entry['mtime'],
+        'size': entry.get('size'),
+        'total_amount': '',
+        'items_count': 0,
+        'tax_type': '',
+        'transport_mode': ''
+    }
+    summary.update({k: v for k, v in (entry.get('meta') or {}).items() if v or k not in summary})
+    return summary
+
+
+__all__ = ["InvoiceIndex", "INDEX_VERSION", "invoice_summary"]
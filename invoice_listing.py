@@ -0,0 +1,185 @@
+"""Sorted, cursor-paginated invoice listing.
+
+``/api/invoices`` used to build the summary of every invoice and return them
+all in one response, and the main page built the same full list only to keep
+the first 50.  This module keeps, for each sort key, the invoices in sorted
+order (a list of sort keys, kept sorted with ``bisect``), so a page is a
+binary search to the cursor followed by ``limit`` steps, whatever the number
+of invoices.
+
+The cursor is the sort key of the last invoice of the previous page (sort
+keys end with the filename, so they are unique), encoded as an opaque string.
+Invoices added or removed between two requests therefore never shift the
+following pages.  Like the search index, the listing is kept up to date
+through ``InvoiceIndex``'s listener and built on first use.
+"""
+from __future__ import annotations
+
+import base64
+import bisect
+import json
+import re
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Invoice_<number>_<yyyy>_<yy>_<buyer>.xlsx; the year orders numbers across years
+_FILENAME_YEAR_RE = re.compile(r'Invoice_[^_]+_(\d{4})_(\d{2})_')
+
+
+def _total(summary: Dict) -> float:
+    try:
+        return float(str(summary.get('total_amount') or '').replace(',', ''))
+    except ValueError:
+        return -1.0
+
+
+def _number_key(summary: Dict) -> tuple:
+    m = _FILENAME_YEAR_RE.match(summary['filename'])
+    number = str(summary.get('invoice_number') or '')
+    digits = re.match(r'\d+', number)
+    return (m.group(1) if m else '', int(digits.group(0)) if digits else -1, number)
+
+
+# Sort key -> function of an invoice summary.  The filename is appended to
+# every key, so keys are unique and cursors are stable.
+SORT_KEYS = {
+    'date': lambda s: (str(s.get('invoice_date') or ''), float(s.get('mtime') or 0)),
+    'number': _number_key,
+    'buyer': lambda s: (str(s.get('buyer_name') or '').lower(),),
+    'total': lambda s: (_total(s),),
+}
+
+DEFAULT_SORT = 'date'
+
+
+class InvalidCursor(ValueError):
+    """The cursor is malformed or belongs to a different sort order."""
+
+
+def encode_cursor(sort: str, order: str, key: tuple) -> str:
+    raw = json.dumps([sort, order, list(key)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, cursor_order, key = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}") from None
+    if (cursor_sort, cursor_order) != (sort, order) or not isinstance(key, list):
+        raise InvalidCursor("Cursor belongs to a different sort order")
+    return tuple(key)
+
+
+class InvoiceListing:
+    """Invoice summaries in every sort order of ``SORT_KEYS``."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._summaries: Dict[str, Dict] = {}
+        self._keys: Dict[str, Dict[str, tuple]] = {sort: {} for sort in SORT_KEYS}
+        self._orders: Dict[str, List[tuple]] = {sort: [] for sort in SORT_KEYS}
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._summaries)
+
+    # ---------- maintenance ----------
+
+    def update(self, filename: str, summary: Optional[Dict]) -> None:
+        """Add, replace or (``summary=None``) remove one invoice."""
+        with self._lock:
+            self._summaries.pop(filename, None)
+            for sort, keys in self._keys.items():
+                old = keys.pop(filename, None)
+                if old is not None:
+                    order = self._orders[sort]
+                    i = bisect.bisect_left(order, old)
+                    if i < len(order) and order[i] == old:
+                        del order[i]
+            if summary is None:
+                return
+            self._summaries[filename] = summary
+            for sort, key_fn in SORT_KEYS.items():
+                key = key_fn(summary) + (filename,)
+                self._keys[sort][filename] = key
+                bisect.insort(self._orders[sort], key)
+
+    def rebuild(self, summaries: Iterable[Dict]) -> None:
+        """Replace the listing with the given invoice summaries."""
+        with self._lock:
+            self._summaries = {s['filename']: s for s in summaries}
+            for sort, key_fn in SORT_KEYS.items():
+                keys = {f: key_fn(s) + (f,) for f, s in self._summaries.items()}
+                self._keys[sort] = keys
+                self._orders[sort] = sorted(keys.values())
+            self.ready = True
+
+    # ---------- queries ----------
+
+    def check_page(self, sort: str, order: str, cursor: Optional[str] = None) -> Optional[tuple]:
+        """Validate ``page`` arguments without building a page; returns the cursor's key.
+
+        Raises ValueError / InvalidCursor like ``page``.
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort {sort!r}; use one of {', '.join(SORT_KEYS)}")
+        if order not in ('asc', 'desc'):
+            raise ValueError(f"Unknown order {order!r}; use 'asc' or 'desc'")
+        if not cursor:
+            return None
+        after = decode_cursor(cursor, sort, order)
+        with self._lock:
+            keys = self._orders[sort]
+            try:
+                bisect.bisect_left(keys, after, 0, min(len(keys), 1))  # compares with one key
+            except TypeError:
+                raise InvalidCursor("Cursor does not match the sort key") from None
+        return after
+
+    def page(self, sort: str = DEFAULT_SORT, order: str = 'desc', limit: int = 50,
+             cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """One page of summaries and the cursor of the next page (None at the end).
+
+        Raises ValueError for an unknown sort or order and InvalidCursor for
+        a bad cursor.
+        """
+        after = self.check_page(sort, order, cursor)
+        with self._lock:
+            keys = self._orders[sort]
+            try:
+                if order == 'asc':
+                    start = bisect.bisect_right(keys, after) if after else 0
+                    page = keys[start:start + limit]
+                    more = start + limit < len(keys)
+                else:
+                    end = bisect.bisect_left(keys, after) if after else len(keys)
+                    page = keys[max(end - limit, 0):end][::-1]
+                    more = end - limit > 0
+            except TypeError:
+                raise InvalidCursor("Cursor does not match the sort key") from None
+            items = [self._summaries[key[-1]] for key in page]
+        next_cursor = encode_cursor(sort, order, page[-1]) if page and more else None
+        return items, next_cursor
+
+    def iterate(self, sort: str = DEFAULT_SORT, start: tuple = (), batch: int = 500) -> Iterator[Dict]:
+        """Summaries in ascending ``sort`` order from the first key >= ``start``.
+
+        Fetched ``batch`` at a time, so exports never copy the whole listing
+        and the lock is not held while the caller works on a batch.
+        """
+        after, first = start, True
+        while True:
+            with self._lock:
+                keys = self._orders[sort]
+                i = bisect.bisect_left(keys, after) if first else bisect.bisect_right(keys, after)
+                page = keys[i:i + batch]
+                items = [self._summaries[key[-1]] for key in page]
+            yield from items
+            if len(page) < batch:
+                return
+            after, first = page[-1], False
+
+
+__all__ = ["InvoiceListing", "InvalidCursor", "SORT_KEYS", "DEFAULT_SORT"]
@@ -0,0 +1,278 @@
+"""Persistent invoice number allocator, one sequence per financial year.
+
+The next number used to be found by listing ``OUTPUT_DIR`` and regex-scanning
+every filename on each page load, and two people generating at the same time
+got the same suggestion and could overwrite each other's invoice.  The
+allocator keeps, per financial year suffix (e.g. ``/2025-26``):
+
+* ``next``      - the next never-issued sequence number
+* ``free``      - released or expired reservations, handed out again first so
+                  the sequence has no gaps
+* ``reserved``  - numbers handed to an open invoice form, with a timestamp
+* ``used``      - sequence number -> invoice filename, for duplicate detection
+* ``claimed``   - when numbers were claimed in the last ``CLAIM_TTL``, so a
+                  number stays taken while its workbook is still being written
+
+in a small JSON file updated under an inter-process lock, so reserving,
+releasing and claiming are O(1) and atomic across worker processes.  It is
+seeded once from the files already in ``OUTPUT_DIR``.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from atomic_io import atomic_write_json, lock_for
+
+STATE_VERSION = 1
+
+# Reservations not claimed or released within this time go back to the pool
+RESERVATION_TTL = timedelta(hours=12)
+
+# A claimed number whose invoice file is missing stays taken this long (the
+# workbook is written after the claim); after that it may be reused
+CLAIM_TTL = timedelta(minutes=10)
+
+_NUMBER_RE = re.compile(r'^\s*0*(\d+)\s*(?:/\s*(\d{4})\s*-\s*(\d{2}))?\s*$')
+_FILENAME_RE = re.compile(r'^Invoice_0*(\d+)_(?:(\d{4})_(\d{2})_)?')
+
+
+def _financial_year_suffix(today: datetime = None) -> str:
+    """Get the financial year suffix like /2025-26."""
+    today = today or datetime.now()
+    year = today.year
+    if today.month >= 4:
+        start = year
+        end = year + 1
+    else:
+        start = year - 1
+        end = year
+    return f"/{start}-{str(end)[-2:]}"
+
+
+def format_invoice_number(seq: int, suffix: str) -> str:
+    return f"{seq:03d}{suffix}"
+
+
+def parse_invoice_number(text: str, default_suffix: str) -> Optional[Tuple[int, str]]:
+    """'012/2025-26' -> (12, '/2025-26'); a bare '12' uses default_suffix.
+
+    Returns None for free-form numbers the allocator does not manage.
+    """
+    m = _NUMBER_RE.match(text or '')
+    if not m:
+        return None
+    suffix = f"/{m.group(2)}-{m.group(3)}" if m.group(2) else default_suffix
+    return int(m.group(1)), suffix
+
+
+class DuplicateInvoiceNumber(Exception):
+    """The invoice number is already used by another invoice file."""
+
+    def __init__(self, number: str, filename: str):
+        super().__init__(f"Invoice number {number} is already used by {filename}")
+        self.number = number
+        self.filename = filename
+
+
+class InvoiceNumberAllocator:
+    """Reserve / release / claim invoice numbers per financial year."""
+
+    def __init__(self, state_path: str, invoices_dir: str):
+        self.state_path = state_path
+        self.invoices_dir = invoices_dir
+        self._lock = threading.Lock()
+
+    # ---------- persistence ----------
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if isinstance(state, dict) and state.get('version') == STATE_VERSION:
+                return state
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"WARNING: Invoice number state unreadable, reseeding: {e}")
+        return self._seed()
+
+    def _write(self, state: Dict) -> None:
+        atomic_write_json(self.state_path, state, separators=(',', ':'))
+
+    def _seed(self) -> Dict:
+        """Build the initial state from the invoice files already on disk."""
+        years: Dict[str, Dict] = {}
+        try:
+            with os.scandir(self.invoices_dir) as it:
+                for de in it:
+                    m = _FILENAME_RE.match(de.name)
+                    if not m or not de.name.endswith('.xlsx'):
+                        continue
+                    if m.group(2):
+                        suffix = f"/{m.group(2)}-{m.group(3)}"
+                    else:
+                        suffix = _financial_year_suffix(datetime.fromtimestamp(de.stat().st_mtime))
+                    year = years.setdefault(suffix, _new_year())
+                    year['used'].setdefault(m.group(1), de.name)
+        except FileNotFoundError:
+            pass
+        for year in years.values():
+            year['next'] = max(int(seq) for seq in year['used']) + 1
+        state = {'version': STATE_VERSION, 'years': years}
+        print(f"Invoice numbers seeded from {sum(len(y['used']) for y in years.values())} existing invoices")
+        return state
+
+    def _year(self, state: Dict, suffix: str) -> Dict:
+        year = state['years'].setdefault(suffix, _new_year())
+        year.setdefault('claimed', {})
+        now = datetime.now()
+        # Expired reservations return to the pool
+        cutoff = (now - RESERVATION_TTL).isoformat(timespec='seconds')
+        for seq, at in list(year['reserved'].items()):
+            if at < cutoff:
+                del year['reserved'][seq]
+                _free(year, int(seq))
+        cutoff = (now - CLAIM_TTL).isoformat(timespec='seconds')
+        for seq, at in list(year['claimed'].items()):
+            if at < cutoff:
+                del year['claimed'][seq]
+        return year
+
+    def _update(self, fn):
+        """Run fn(state) under the process and file locks and save the result."""
+        with self._lock, lock_for(self.state_path):
+            state = self._read()
+            result = fn(state)
+            self._write(state)
+            return result
+
+    def _snapshot(self) -> Dict:
+        """Current state for read-only use (seeds and saves it on first use)."""
+        if not os.path.exists(self.state_path):
+            return self._update(lambda state: state)
+        with self._lock:
+            return self._read()
+
+    def signature(self, suffix: Optional[str] = None) -> tuple:
+        """Changes whenever suggest() may answer differently (state file or financial year)."""
+        suffix = suffix or _financial_year_suffix()
+        try:
+            st = os.stat(self.state_path)
+        except FileNotFoundError:
+            return (suffix, None, None)
+        return (suffix, st.st_mtime_ns, st.st_size)
+
+    # ---------- public API ----------
+
+    def suggest(self, suffix: Optional[str] = None) -> str:
+        """Next number that reserve() would hand out (nothing is reserved)."""
+        suffix = suffix or _financial_year_suffix()
+        # Expire reservations on the copy too, so this matches what reserve() gives
+        year = self._year(self._snapshot(), suffix)
+        return format_invoice_number(_peek(year), suffix)
+
+    def reserve(self, suffix: Optional[str] = None) -> str:
+        """Hand out the next number for the year and mark it reserved."""
+        suffix = suffix or _financial_year_suffix()
+
+        def take(state):
+            year = self._year(state, suffix)
+            seq = _peek(year)
+            if year['free'] and year['free'][0] == seq:
+                year['free'].pop(0)
+            else:
+                year['next'] = seq + 1
+            year['reserved'][str(seq)] = datetime.now().isoformat(timespec='seconds')
+            return format_invoice_number(seq, suffix)
+
+        return self._update(take)
+
+    def release(self, number: str) -> bool:
+        """Give an unused reservation back.  Returns False if it was not reserved."""
+        parsed = parse_invoice_number(number, _financial_year_suffix())
+        if parsed is None:
+            return False
+        seq, suffix = parsed
+
+        def give_back(state):
+            year = self._year(state, suffix)
+            if year['reserved'].pop(str(seq), None) is None or str(seq) in year['used']:
+                return False
+            _free(year, seq)
+            return True
+
+        return self._update(give_back)
+
+    def claim(self, number: str, filename: str, default_suffix: Optional[str] = None) -> None:
+        """Record that ``filename`` uses ``number``.
+
+        Raises DuplicateInvoiceNumber if another file already uses it, or
+        claimed it within ``CLAIM_TTL`` and may still be writing it.
+        Re-generating the same file (e.g. after editing) is allowed, and so is
+        reusing the number of an invoice file that no longer exists.
+        Free-form numbers the allocator cannot parse are not tracked.
+        """
+        parsed = parse_invoice_number(number, default_suffix or _financial_year_suffix())
+        if parsed is None:
+            return
+        seq, suffix = parsed
+
+        def mark_used(state):
+            year = self._year(state, suffix)
+            owner = year['used'].get(str(seq))
+            if owner and owner != filename and (
+                    str(seq) in year['claimed']
+                    or os.path.exists(os.path.join(self.invoices_dir, owner))):
+                raise DuplicateInvoiceNumber(format_invoice_number(seq, suffix), owner)
+            year['used'][str(seq)] = filename
+            year['claimed'][str(seq)] = datetime.now().isoformat(timespec='seconds')
+            year['reserved'].pop(str(seq), None)
+            if seq in year['free']:
+                year['free'].remove(seq)
+            if seq >= year['next']:
+                # Numbers skipped by a manually typed higher number can be reused
+                year['free'] = sorted(set(year['free']) | set(
+                    s for s in range(year['next'], seq)
+                    if str(s) not in year['reserved'] and str(s) not in year['used']))
+                year['next'] = seq + 1
+
+        self._update(mark_used)
+
+    def owner(self, number: str, default_suffix: Optional[str] = None) -> Optional[str]:
+        """Filename already using ``number``, if any."""
+        parsed = parse_invoice_number(number, default_suffix or _financial_year_suffix())
+        if parsed is None:
+            return None
+        seq, suffix = parsed
+        year = self._snapshot()['years'].get(suffix) or _new_year()
+        return year['used'].get(str(seq))
+
+
+def _new_year() -> Dict:
+    return {'next': 1, 'free': [], 'reserved': {}, 'used': {}, 'claimed': {}}
+
+
+def _peek(year: Dict) -> int:
+    return year['free'][0] if year['free'] else year['next']
+
+
+def _free(year: Dict, seq: int) -> None:
+    if seq == year['next'] - 1:
+        year['next'] = seq
+        # Trailing free numbers collapse back into the counter
+        while year['free'] and year['free'][-1] == year['next'] - 1:
+            year['next'] = year['free'].pop()
+    elif seq not in year['free']:
+        year['free'].append(seq)
+        year['free'].sort()
+
+
+__all__ = [
+    "InvoiceNumberAllocator", "DuplicateInvoiceNumber", "format_invoice_number",
+    "parse_invoice_number", "_financial_year_suffix",
+]
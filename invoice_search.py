@@ -0,0 +1,257 @@
+"""In-memory inverted index for searching generated invoices.
+
+The "Load old invoice" modal used to filter the 50 invoices embedded in the
+page, so anything older could not be found.  This index maps every word of an
+invoice's number, buyer name, GSTIN, item descriptions, transport mode and
+date to the invoices containing it, so a query only touches the postings of
+its own words:
+
+* every query word must match (AND); the last one may be a prefix, so
+  results appear while typing ("shr" finds "Shree Traders");
+* matches are ranked by the field they hit (invoice number and GSTIN before
+  buyer name before items / transport / date), exact words before
+  prefixes, then newest first.
+
+It is kept up to date through ``InvoiceIndex``'s listener, one invoice at a
+time, and rebuilt from the persistent index on first use.
+"""
+from __future__ import annotations
+
+import bisect
+import heapq
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Weight of a match in each field of invoice_summary()
+FIELD_WEIGHTS = {
+    'invoice_number': 8.0,
+    'gstin': 6.0,
+    'buyer_name': 4.0,
+    'item_descriptions': 1.5,
+    'transport_mode': 1.0,
+    'invoice_date': 1.0,
+}
+
+# A prefix match counts this much of an exact one
+PREFIX_FACTOR = 0.5
+
+# Rough number of distinct words per invoice, for choosing a query strategy
+_WORDS_PER_INVOICE = 20
+
+_TOKEN_RE = re.compile(r'[0-9a-z]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words and numbers of a text."""
+    return _TOKEN_RE.findall(str(text or '').lower())
+
+
+def _strip_zeros(token: str) -> str:
+    # '012' and '12' are the same invoice number
+    return (token.lstrip('0') or '0') if token.isdigit() else token
+
+
+def document_tokens(summary: Dict) -> Dict[str, float]:
+    """token -> weight of the best field it appears in."""
+    tokens: Dict[str, float] = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        value = summary.get(field)
+        if isinstance(value, (list, tuple)):
+            value = ' '.join(str(v) for v in value)
+        for word in tokenize(value):
+            for token in {word, _strip_zeros(word)}:
+                if tokens.get(token, 0) < weight:
+                    tokens[token] = weight
+    return tokens
+
+
+class InvoiceSearchIndex:
+    """token -> {filename: weight} postings plus a sorted vocabulary for prefixes."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._docs: Dict[str, Dict[str, float]] = {}
+        self._mtimes: Dict[str, float] = {}
+        self._vocab: List[str] = []
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # ---------- maintenance ----------
+
+    def _remove(self, filename: str) -> None:
+        for token in self._docs.pop(filename, {}):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(filename, None)
+            if not postings:
+                del self._postings[token]
+                i = bisect.bisect_left(self._vocab, token)
+                if i < len(self._vocab) and self._vocab[i] == token:
+                    del self._vocab[i]
+        self._mtimes.pop(filename, None)
+
+    def update(self, filename: str, summary: Optional[Dict]) -> None:
+        """(Re-)index one invoice; ``summary=None`` removes it."""
+        with self._lock:
+            self._remove(filename)
+            if summary is None:
+                return
+            tokens = document_tokens(summary)
+            self._docs[filename] = tokens
+            self._mtimes[filename] = summary.get('mtime') or 0
+            for token, weight in tokens.items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    bisect.insort(self._vocab, token)
+                postings[filename] = weight
+
+    def rebuild(self, summaries: Iterable[Dict]) -> None:
+        """Replace the whole index with the given invoice summaries."""
+        with self._lock:
+            self._postings, self._docs, self._mtimes, self._vocab = {}, {}, {}, []
+            for summary in summaries:
+                tokens = document_tokens(summary)
+                filename = summary['filename']
+                self._docs[filename] = tokens
+                self._mtimes[filename] = summary.get('mtime') or 0
+                for token, weight in tokens.items():
+                    self._postings.setdefault(token, {})[filename] = weight
+            self._vocab = sorted(self._postings)
+            self.ready = True
+
+    # ---------- queries ----------
+
+    def _matches(self, token: str, prefix: bool) -> Dict[str, float]:
+        """filename -> best score for one query word."""
+        exact = self._postings.get(token, {})
+        if not prefix:
+            return exact
+        scores = dict(exact)
+        i = bisect.bisect_right(self._vocab, token)
+        while i < len(self._vocab) and self._vocab[i].startswith(token):
+            for filename, weight in self._postings[self._vocab[i]].items():
+                score = weight * PREFIX_FACTOR
+                if scores.get(filename, 0) < score:
+                    scores[filename] = score
+            i += 1
+        return scores
+
+    def _prefix_postings(self, token: str, budget: int) -> Optional[int]:
+        """Total postings of the words starting with ``token``, or None if over ``budget``."""
+        total = 0
+        i = bisect.bisect_left(self._vocab, token)
+        while i < len(self._vocab) and self._vocab[i].startswith(token):
+            total += len(self._postings[self._vocab[i]])
+            if total > budget:
+                return None
+            i += 1
+        return total
+
+    def _score(self, filename: str, token: str, prefix: bool) -> float:
+        """Score of one query word in one invoice (0 if it does not match)."""
+        tokens = self._docs[filename]
+        score = tokens.get(token, 0)
+        if prefix:
+            for word, weight in tokens.items():
+                if weight * PREFIX_FACTOR > score and word.startswith(token):
+                    score = weight * PREFIX_FACTOR
+        return score
+
+    def search(self, query: str, limit: int = 50, offset: int = 0) -> Tuple[int, List[str]]:
+        """(number of matches, filenames of the requested page, best first)."""
+        words = [_strip_zeros(word) for word in tokenize(query)]
+        if not words:
+            return 0, []
+        with self._lock:
+            # Rarest exact word first keeps the candidate set small; the
+            # prefix word comes last
+            last = len(words) - 1
+            ordered = sorted(range(last), key=lambda i: len(self._postings.get(words[i], ())))
+            ordered.append(last)
+            scores = self._matches(words[ordered[0]], prefix=(ordered[0] == last))
+            for i in ordered[1:]:
+                word, prefix = words[i], i == last
+                # Look the word up in each candidate's own words when that is
+                # cheaper than walking the word's postings
+                budget = len(scores) * _WORDS_PER_INVOICE if prefix else len(scores)
+                if prefix:
+                    walk = self._prefix_postings(word, budget) is not None
+                else:
+                    walk = len(self._postings.get(word, ())) <= budget
+                if walk:
+                    matches = self._matches(word, prefix)
+                    scores = {f: s + matches[f] for f, s in scores.items() if f in matches}
+                else:
+                    matched = {}
+                    for f, s in scores.items():
+                        score = self._score(f, word, prefix)
+                        if score:
+                            matched[f] = s + score
+                    scores = matched
+                if not scores:
+                    return 0, []
+            page = self._rank(scores, offset + limit)
+        return len(scores), page[offset:]
+
+    def _rank(self, scores: Dict[str, float], count: int) -> List[str]:
+        """The ``count`` best filenames: highest score, then newest."""
+        # Scores take few distinct values, so rank by score bucket and only
+        # order the buckets that reach into the page by date
+        buckets: Dict[float, List[str]] = {}
+        for filename, score in scores.items():
+            buckets.setdefault(score, []).append(filename)
+        ranked: List[str] = []
+        for score in sorted(buckets, reverse=True):
+            need = count - len(ranked)
+            if need <= 0:
+                break
+            ranked.extend(heapq.nlargest(need, buckets[score], key=self._mtimes.__getitem__))
+        return ranked
+
+__all__ = ["InvoiceSearchIndex", "FIELD_WEIGHTS", "tokenize", "document_tokens"]
+
+
+if __name__ == '__main__':
+    # Manual check: python invoice_search.py [number of invoices]
+    import random
+    import sys
+    import time
+
+    rng = random.Random(2025)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    names = ['Shree', 'Ganesh', 'Traders', 'Balaji', 'Steel', 'Agro', 'Foods', 'Laxmi', 'Krishna',
+             'Enterprises', 'Mahavir', 'Textiles', 'Sai', 'Industries', 'Patel', 'Brothers']
+    goods = ['Rice', 'Wheat', 'Sugar', 'Jaggery', 'Dal', 'Oil', 'Bags', 'Flour', 'Salt', 'Tea']
+    summaries = [{
+        'filename': f"Invoice_{n:03d}_2025_26_{n}.xlsx",
+        'invoice_number': f"{n:03d}",
+        'buyer_name': ' '.join(rng.sample(names, 3)),
+        'gstin': f"{rng.randint(1, 37):02d}ABCDE{rng.randint(1000, 9999)}F1Z{rng.randint(1, 9)}",
+        'item_descriptions': [f"{rng.choice(goods)} {rng.randint(1, 50)} kg" for _ in range(rng.randint(1, 5))],
+        'transport_mode': rng.choice(['By Road', 'By Truck', 'Tempo']),
+        'invoice_date': f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        'mtime': n,
+    } for n in range(1, count + 1)]
+
+    index = InvoiceSearchIndex()
+    start = time.perf_counter()
+    index.rebuild(summaries)
+    print(f"{count} invoices indexed in {time.perf_counter() - start:.2f}s")
+
+    queries = ['shree', 'shr', 'balaji steel', '1234', 'rice 25', 'tempo', '2025-03', '07abcde', 'sai ind']
+    for query in queries:
+        start = time.perf_counter()
+        for _ in range(20):
+            total, page = index.search(query)
+        print(f"{query!r:>16}: {total:>6} matches, {(time.perf_counter() - start) / 20 * 1000:.2f} ms")
+
+    start = time.perf_counter()
+    for summary in summaries[:1000]:
+        index.update(summary['filename'], dict(summary, buyer_name='Renamed Buyer'))
+    print(f"1000 updates: {(time.perf_counter() - start) * 1000:.1f} ms")
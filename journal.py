@@ -0,0 +1,349 @@
+"""Append-only change journal for the JSON data files.
+
+``save_data`` used to copy the whole JSON file into ``_backups/`` on every
+save, so backup volume grew with file size x number of edits and was never
+pruned.  Instead, every save now appends one small record per changed entry
+(a profile upserted or deleted, a transport mode added or removed) to a
+journal segment.  Every ``compact_every`` records the current state is written
+as a snapshot and a new segment starts (and also once the current segment is
+older than the retention period, so a quiet journal rolls over too); segments
+that are entirely older than the retention period are deleted, on compaction
+and when the app starts (``prune``).
+
+Layout, per data file (e.g. ``_journal/buyer_profiles.json/``)::
+
+    snapshot-<stamp>.json   full state at <stamp>
+    journal-<stamp>.log     JSON lines recorded after that snapshot
+
+Any point in time inside the retention period can be restored by loading the
+newest snapshot before it and replaying its journal up to that moment::
+
+    python journal.py history buyer_profiles.json
+    python journal.py restore buyer_profiles.json --at "2025-06-01 18:30"
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from atomic_io import atomic_write_json, lock_for
+
+_STAMP_FORMAT = "%Y%m%dT%H%M%S%f"
+_TS_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+def _ts(moment: datetime) -> str:
+    # Fixed width so timestamps compare correctly as strings
+    return moment.strftime(_TS_FORMAT)
+
+
+def _canonical(state: Any) -> str:
+    return json.dumps(state, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+
+
+def state_hash(state: Any) -> str:
+    return hashlib.sha1(_canonical(state).encode('utf-8')).hexdigest()
+
+
+def _entry_key(entry: Any) -> Optional[str]:
+    """Identity of a list entry: profile_id for profiles, the text for modes."""
+    if isinstance(entry, dict):
+        return entry.get('profile_id') or None
+    if isinstance(entry, str):
+        return entry
+    return None
+
+
+def apply_change(state: Any, record: Dict) -> Any:
+    """Apply one journal record to a state and return the new state."""
+    op = record['op']
+    if op == 'replace':
+        return record['value']
+    key = record['key']
+    if op == 'delete':
+        return [e for e in state if _entry_key(e) != key]
+    if op == 'upsert':
+        for i, entry in enumerate(state):
+            if _entry_key(entry) == key:
+                return state[:i] + [record['value']] + state[i + 1:]
+        return state + [record['value']]
+    raise ValueError(f"Unknown journal op {op!r}")
+
+
+def diff_changes(old: Any, new: Any) -> List[Dict]:
+    """Smallest list of upsert/delete records turning old into new.
+
+    Falls back to a single 'replace' record when entries have no unique key
+    or the order changed (e.g. after sorting), so replay is always exact.
+    """
+    replace = [{'op': 'replace', 'value': new}]
+    if not isinstance(old, list) or not isinstance(new, list):
+        return replace
+    old_keys = [_entry_key(e) for e in old]
+    new_keys = [_entry_key(e) for e in new]
+    for keys in (old_keys, new_keys):
+        if None in keys or len(set(keys)) != len(keys):
+            return replace
+
+    old_by_key = dict(zip(old_keys, old))
+    new_key_set = set(new_keys)
+    changes = [{'op': 'delete', 'key': k} for k in old_keys if k not in new_key_set]
+    for key, entry in zip(new_keys, new):
+        if key not in old_by_key or old_by_key[key] != entry:
+            changes.append({'op': 'upsert', 'key': key, 'value': entry})
+
+    state = old
+    for change in changes:
+        state = apply_change(state, change)
+    return changes if state == new else replace
+
+
+class ChangeJournal:
+    """Journal + snapshots for any number of named JSON data files."""
+
+    def __init__(self, journal_dir: str, compact_every: int = 200, retention_days: float = 90):
+        self.journal_dir = journal_dir
+        self.compact_every = max(1, compact_every)
+        self.retention = timedelta(days=retention_days)
+        self._lock = threading.Lock()
+        # name -> (current stamp, records in current segment, hash of latest
+        #          state, size of the current segment's log)
+        self._heads: Dict[str, Tuple[str, int, str, int]] = {}
+
+    # ---------- files ----------
+
+    def _dir(self, name: str) -> str:
+        return os.path.join(self.journal_dir, name)
+
+    def stamps(self, name: str) -> List[str]:
+        """Snapshot stamps of a data file, oldest first."""
+        try:
+            files = os.listdir(self._dir(name))
+        except FileNotFoundError:
+            return []
+        return sorted(f[len('snapshot-'):-len('.json')] for f in files
+                      if f.startswith('snapshot-') and f.endswith('.json'))
+
+    def _snapshot_path(self, name: str, stamp: str) -> str:
+        return os.path.join(self._dir(name), f"snapshot-{stamp}.json")
+
+    def _log_path(self, name: str, stamp: str) -> str:
+        return os.path.join(self._dir(name), f"journal-{stamp}.log")
+
+    def _read_snapshot(self, name: str, stamp: str) -> Dict:
+        with open(self._snapshot_path(name, stamp), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _read_log(self, name: str, stamp: str) -> List[Dict]:
+        records = []
+        try:
+            with open(self._log_path(name, stamp), 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Torn last line after a crash; everything before it is valid
+                        break
+        except FileNotFoundError:
+            pass
+        return records
+
+    def _write_snapshot(self, name: str, state: Any) -> str:
+        os.makedirs(self._dir(name), exist_ok=True)
+        now = datetime.now()
+        stamp = now.strftime(_STAMP_FORMAT)
+        existing = self.stamps(name)
+        if existing and stamp <= existing[-1]:
+            stamp = (datetime.strptime(existing[-1], _STAMP_FORMAT)
+                     + timedelta(microseconds=1)).strftime(_STAMP_FORMAT)
+        digest = state_hash(state)
+        atomic_write_json(self._snapshot_path(name, stamp), {'ts': _ts(now), 'sha': digest, 'data': state})
+        self._heads[name] = (stamp, 0, digest, 0)
+        return stamp
+
+    def _log_size(self, name: str, stamp: str) -> int:
+        try:
+            return os.path.getsize(self._log_path(name, stamp))
+        except OSError:
+            return 0
+
+    def _head(self, name: str) -> Optional[Tuple[str, int, str, int]]:
+        # Other worker processes append to the same journal, so the cached
+        # head is only trusted while the newest segment and its size match.
+        stamps = self.stamps(name)
+        if not stamps:
+            self._heads.pop(name, None)
+            return None
+        stamp = stamps[-1]
+        size = self._log_size(name, stamp)
+        cached = self._heads.get(name)
+        if cached is None or cached[0] != stamp or cached[3] != size:
+            records = self._read_log(name, stamp)
+            hashes = [r['sha'] for r in records if 'sha' in r]
+            digest = hashes[-1] if hashes else self._read_snapshot(name, stamp).get('sha', '')
+            self._heads[name] = (stamp, len(records), digest, size)
+        return self._heads[name]
+
+    def _append(self, name: str, records: List[Dict]) -> None:
+        stamp, count, digest, _ = self._head(name)
+        with open(self._log_path(name, stamp), 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        last_sha = next((r['sha'] for r in reversed(records) if 'sha' in r), digest)
+        self._heads[name] = (stamp, count + len(records), last_sha, size)
+
+    # ---------- public API ----------
+
+    def record(self, name: str, old: Any, new: Any) -> int:
+        """Journal the change from old to new (call after the file was written,
+        while still holding the data file's lock).
+
+        Returns the number of records appended.  If the file was changed
+        behind the journal's back (e.g. by the bulk importer), a 'replace'
+        record with the state found on disk is written first.
+        """
+        with self._lock:
+            head = self._head(name)
+            if head is None:
+                self._write_snapshot(name, old)
+                head = self._heads[name]
+            now = _ts(datetime.now())
+            records = []
+            if head[2] != state_hash(old):
+                records.append({'ts': now, 'op': 'replace', 'value': old, 'external': True})
+            records.extend(dict(change, ts=now) for change in diff_changes(old, new))
+            if not records:
+                return 0
+            records[-1]['sha'] = state_hash(new)
+            self._append(name, records)
+            stamp, count = self._heads[name][:2]
+            if count >= self.compact_every or stamp <= self._cutoff():
+                self._write_snapshot(name, new)
+                self._prune(name)
+            return len(records)
+
+    def compact(self, name: str, state: Any) -> str:
+        """Start a new segment from a snapshot of the given current state."""
+        with self._lock:
+            stamp = self._write_snapshot(name, state)
+            self._prune(name)
+            return stamp
+
+    def prune(self) -> None:
+        """Apply the retention to every journaled data file (e.g. on startup)."""
+        try:
+            names = [n for n in os.listdir(self.journal_dir) if os.path.isdir(self._dir(n))]
+        except FileNotFoundError:
+            return
+        with self._lock:
+            for name in names:
+                self._prune(name)
+
+    def _cutoff(self) -> str:
+        return (datetime.now() - self.retention).strftime(_STAMP_FORMAT)
+
+    def _prune(self, name: str) -> None:
+        """Drop segments whose successor snapshot is older than the retention."""
+        cutoff = self._cutoff()
+        stamps = self.stamps(name)
+        for stamp, successor in zip(stamps, stamps[1:]):
+            if successor > cutoff:
+                break
+            for path in (self._snapshot_path(name, stamp), self._log_path(name, stamp)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def state_at(self, name: str, at: datetime) -> Optional[Any]:
+        """Replay the journal to the state as it was at ``at`` (None if unknown)."""
+        limit = at.strftime(_STAMP_FORMAT)
+        candidates = [s for s in self.stamps(name) if s <= limit]
+        if not candidates:
+            return None
+        stamp = candidates[-1]
+        state = self._read_snapshot(name, stamp)['data']
+        at_ts = _ts(at)
+        for record in self._read_log(name, stamp):
+            if record['ts'] > at_ts:
+                break
+            state = apply_change(state, record)
+        return state
+
+    def restore(self, name: str, at: datetime, save: Callable[[Any], bool]) -> Optional[Any]:
+        """Write the state of ``name`` at ``at`` back through ``save``.
+
+        ``save`` is normally ``app.save_data`` for the data file, which writes
+        the JSON file or the SQLite tables and journals the restore itself.
+        Returns the restored state (None if there is no history at ``at``);
+        raises IOError if ``save`` fails.
+        """
+        restored = self.state_at(name, at)
+        if restored is not None and not save(restored):
+            raise IOError(f"Could not save the restored {name}")
+        return restored
+
+    def history(self, name: str) -> List[Dict]:
+        """Summary of every snapshot and record still retained, oldest first."""
+        rows = []
+        for stamp in self.stamps(name):
+            snapshot = self._read_snapshot(name, stamp)
+            rows.append({'ts': snapshot['ts'], 'op': 'snapshot', 'key': f"{len(snapshot['data'])} entries"})
+            for record in self._read_log(name, stamp):
+                rows.append({'ts': record['ts'], 'op': record['op'], 'key': record.get('key', '')})
+        return rows
+
+
+__all__ = ["ChangeJournal", "apply_change", "diff_changes", "state_hash"]
+
+
+if __name__ == '__main__':
+    # python journal.py history|compact|restore <data file> [--at TIME] [--output PATH]
+    import argparse
+    from config import BASE_DIR, JOURNAL_COMPACT_EVERY, JOURNAL_DIR, JOURNAL_RETENTION_DAYS
+
+    parser = argparse.ArgumentParser(description="Inspect, compact or restore journaled data files.")
+    parser.add_argument("command", choices=["history", "compact", "restore"])
+    parser.add_argument("name", help="data file name, e.g. buyer_profiles.json")
+    parser.add_argument("--at", help="restore point, e.g. '2025-06-01 18:30' (default: latest)")
+    parser.add_argument("--output", help="write the restored data here instead of the data file")
+    args = parser.parse_args()
+
+    journal = ChangeJournal(JOURNAL_DIR, JOURNAL_COMPACT_EVERY, JOURNAL_RETENTION_DAYS)
+    data_path = os.path.join(BASE_DIR, args.name)
+
+    if args.command == "history":
+        for row in journal.history(args.name):
+            print(f"{row['ts']}  {row['op']:<8} {row['key']}")
+    elif args.command == "compact":
+        # Through the app's storage layer, so STORAGE_BACKEND=sqlite reads the tables
+        from app import load_data
+        with lock_for(data_path):
+            print(f"Snapshot {journal.compact(args.name, load_data(data_path))} written.")
+    else:
+        at = datetime.fromisoformat(args.at) if args.at else datetime.now()
+        if args.output:
+            restored = journal.state_at(args.name, at)
+            if restored is not None:
+                atomic_write_json(args.output, restored, indent=4)
+        else:
+            # Through the app's storage layer, so STORAGE_BACKEND=sqlite
+            # restores the tables, and the restore itself is journaled
+            from app import save_data
+            try:
+                restored = journal.restore(args.name, at, lambda data: save_data(data_path, data))
+            except IOError as e:
+                raise SystemExit(str(e))
+        if restored is None:
+            raise SystemExit(f"No journal history for {args.name} at {at}.")
+        print(f"Restored {args.name} as of {at} ({len(restored)} entries) -> {args.output or data_path}")
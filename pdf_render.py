@@ -0,0 +1,270 @@
+"""Pure-Python PDF rendering of invoices (no Excel, no extra dependencies).
+
+Lays the invoice out directly as a one-page A4 PDF using the PDF base-14
+Helvetica fonts, following the structure of
+``templates/invoice_pdf_template.html``: header, buyer block, transport, item
+table, tax totals, amount in words, footer.  Figures come from
+``copy1.invoice_cell_values`` so the PDF always matches the Excel invoice, and
+the seller header/footer text is taken from the static cells of the compiled
+Excel template when one is available.
+
+Select it with ``PDF_BACKEND=builtin`` (see config.py); it is also used
+automatically when Excel COM automation is not available.
+"""
+from __future__ import annotations
+
+import os
+import zlib
+from typing import Dict, List, Optional
+
+from copy1 import FIRST_ITEM_ROW, MAX_ITEM_ROWS, get_compiled_template, invoice_cell_values
+
+PAGE_WIDTH = 595.28   # A4 in points
+PAGE_HEIGHT = 841.89
+MARGIN = 36
+
+# Advance widths (1/1000 em) for WinAnsi characters 32..126 of the base-14 fonts
+_HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+_HELVETICA_BOLD_WIDTHS = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]
+_FONTS = {'F1': ('Helvetica', _HELVETICA_WIDTHS), 'F2': ('Helvetica-Bold', _HELVETICA_BOLD_WIDTHS)}
+
+
+def text_width(text: str, size: float, bold: bool = False) -> float:
+    widths = _HELVETICA_BOLD_WIDTHS if bold else _HELVETICA_WIDTHS
+    total = 0
+    for ch in text:
+        code = ord(ch)
+        total += widths[code - 32] if 32 <= code <= 126 else 556
+    return total * size / 1000.0
+
+
+def _pdf_string(text: str) -> str:
+    raw = text.encode('cp1252', errors='replace').decode('latin-1')
+    return '(' + raw.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ')'
+
+
+class PdfPage:
+    """Minimal single-page PDF canvas (text, lines, rectangles)."""
+
+    def __init__(self, width: float = PAGE_WIDTH, height: float = PAGE_HEIGHT):
+        self.width = width
+        self.height = height
+        self.ops: List[str] = []
+
+    def text(self, x: float, y: float, text: str, size: float = 10,
+             bold: bool = False, align: str = 'left') -> None:
+        """Draw text with its baseline at y (measured from the top of the page)."""
+        if not text:
+            return
+        if align == 'right':
+            x -= text_width(text, size, bold)
+        elif align == 'center':
+            x -= text_width(text, size, bold) / 2
+        font = 'F2' if bold else 'F1'
+        self.ops.append(f"BT /{font} {size:g} Tf {x:.2f} {self.height - y:.2f} Td {_pdf_string(text)} Tj ET")
+
+    def line(self, x1: float, y1: float, x2: float, y2: float, width: float = 0.5) -> None:
+        self.ops.append(f"{width:g} w {x1:.2f} {self.height - y1:.2f} m {x2:.2f} {self.height - y2:.2f} l S")
+
+    def rect(self, x: float, y: float, w: float, h: float, fill_gray: Optional[float] = None) -> None:
+        box = f"{x:.2f} {self.height - y - h:.2f} {w:.2f} {h:.2f} re"
+        if fill_gray is None:
+            self.ops.append(f"0.5 w {box} S")
+        else:
+            self.ops.append(f"{fill_gray:g} g {box} f 0 g 0.5 w {box} S")
+
+    def wrap(self, text: str, max_width: float, size: float = 10, bold: bool = False) -> List[str]:
+        """Greedy word wrap to max_width points."""
+        lines: List[str] = []
+        current = ''
+        for word in str(text).split():
+            candidate = f"{current} {word}" if current else word
+            if current and text_width(candidate, size, bold) > max_width:
+                lines.append(current)
+                current = word
+            else:
+                current = candidate
+        if current:
+            lines.append(current)
+        return lines or ['']
+
+    def to_bytes(self) -> bytes:
+        content = zlib.compress('\n'.join(self.ops).encode('latin-1'))
+        objects = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+            (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.width:.2f} {self.height:.2f}] "
+             f"/Resources << /Font << /F1 5 0 R /F2 6 0 R >> >> /Contents 4 0 R >>").encode('ascii'),
+            f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode('ascii') + content + b"\nendstream",
+        ]
+        for name, _ in _FONTS.values():
+            objects.append(f"<< /Type /Font /Subtype /Type1 /BaseFont /{name} "
+                           f"/Encoding /WinAnsiEncoding >>".encode('ascii'))
+
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for num, body in enumerate(objects, start=1):
+            offsets.append(len(out))
+            out += f"{num} 0 obj\n".encode('ascii') + body + b"\nendobj\n"
+        xref = len(out)
+        out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('ascii')
+        for offset in offsets:
+            out += f"{offset:010d} 00000 n \n".encode('ascii')
+        out += (f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+                f"startxref\n{xref}\n%%EOF\n").encode('ascii')
+        return bytes(out)
+
+
+def template_static_text(template_path: Optional[str]) -> Dict[str, List[str]]:
+    """Seller header (rows 1-7) and footer (rows 38+) text from the Excel template."""
+    header: List[str] = []
+    footer: List[str] = []
+    compiled = get_compiled_template(template_path) if template_path else None
+    if compiled and compiled.sheets:
+        variable = {'E2', 'H2'}
+        by_row: Dict[int, List[str]] = {}
+        for row, column, value, _ in compiled.sheets[0].cells:
+            if value is None or (row <= 7 and f"{chr(64 + column)}{row}" in variable):
+                continue
+            text = str(value).strip()
+            if text and not text.startswith('='):
+                by_row.setdefault(row, []).append(text)
+        header = ['  '.join(by_row[r]) for r in sorted(by_row) if r <= 7]
+        footer = ['  '.join(by_row[r]) for r in sorted(by_row) if r >= 38]
+    return {'header': header, 'footer': footer}
+
+
+def _money(value) -> str:
+    return f"{float(value or 0):,.2f}"
+
+
+def _quantity(value) -> str:
+    return f"{float(value or 0):.3f}".rstrip('0').rstrip('.')
+
+
+def build_invoice_page(config: Dict, template_path: Optional[str] = None) -> PdfPage:
+    values = invoice_cell_values(config)
+    static = template_static_text(template_path)
+    page = PdfPage()
+    left, right = MARGIN, PAGE_WIDTH - MARGIN
+    y = MARGIN + 18
+
+    # Header: seller name/details from the template, invoice number and date
+    header = static['header'] or ['Shakambhari Enterprises']
+    page.text(left, y, header[0], size=18, bold=True)
+    page.text(right, y - 4, values.get('E2', '') or 'INVOICE', size=11, bold=True, align='right')
+    page.text(right, y + 10, values.get('H2', ''), size=10, align='right')
+    y += 16
+    for line in header[1:]:
+        for wrapped in page.wrap(line, right - left - 160, size=9):
+            page.text(left, y, wrapped, size=9)
+            y += 11
+    y += 6
+    page.line(left, y, right, y, width=1)
+    y += 16
+
+    # Buyer block (A8:A15) and transport (E10)
+    buyer_top = y
+    buyer_lines = [values[f'A{r}'] for r in range(8, 16) if values.get(f'A{r}')]
+    if not buyer_lines:
+        buyer_lines = [str(d) for d in config.get('buyer_details', [])]
+    for i, line in enumerate(buyer_lines):
+        page.text(left, y, str(line), size=10, bold=(i == 1))
+        y += 13
+    transport = values.get('E10', '')
+    if transport:
+        page.text(left + 300, buyer_top, transport, size=10)
+    y += 10
+
+    # Item table
+    cols = [left, left + 30, left + 330, left + 400, left + 460, right]
+    headings = ['S.No', 'Description of Goods', 'Quantity', 'Rate', 'Amount']
+    row_h = 18
+    page.rect(left, y, right - left, row_h, fill_gray=0.9)
+    for i, heading in enumerate(headings):
+        if i >= 2:
+            page.text(cols[i + 1] - 4, y + 12.5, heading, size=9, bold=True, align='right')
+        else:
+            page.text(cols[i] + 4, y + 12.5, heading, size=9, bold=True)
+    y += row_h
+    table_top = y
+    for offset in range(MAX_ITEM_ROWS):
+        row = FIRST_ITEM_ROW + offset
+        if f'A{row}' not in values:
+            break
+        desc_lines = page.wrap(values[f'A{row}'], cols[2] - cols[1] - 8, size=9)
+        height = max(row_h, 6 + 11 * len(desc_lines))
+        page.text(cols[0] + 4, y + 12.5, str(offset + 1), size=9)
+        for i, line in enumerate(desc_lines):
+            page.text(cols[1] + 4, y + 12.5 + 11 * i, line, size=9)
+        page.text(cols[3] - 4, y + 12.5, _quantity(values[f'F{row}']), size=9, align='right')
+        page.text(cols[4] - 4, y + 12.5, _money(values[f'G{row}']), size=9, align='right')
+        page.text(cols[5] - 4, y + 12.5, _money(values[f'I{row}']), size=9, align='right')
+        y += height
+    y = max(y, table_top + row_h * 3)
+    page.rect(left, table_top, right - left, y - table_top)
+    for x in cols[1:-1]:
+        page.line(x, table_top - row_h, x, y)
+
+    # Totals (I29-I35), mirroring the Excel tax rows
+    totals = [('Sub Total', values.get('I29'), False)]
+    for label_ref, rate_ref, amount_ref in (('C30', 'E30', 'I30'), ('C31', 'E31', 'I31'), ('C32', 'E32', 'I32')):
+        if label_ref in values and (values.get(amount_ref) or 0) != 0:
+            totals.append((f"{values[label_ref]} {values[rate_ref]}", values[amount_ref], False))
+    totals.append(('Round Off', values.get('I34'), False))
+    totals.append(('TOTAL', values.get('I35'), True))
+    y += 6
+    for label, amount, bold in totals:
+        y += 15
+        page.text(cols[4] - 8, y, label, size=10, bold=bold, align='right')
+        page.text(right - 4, y, _money(amount), size=10, bold=bold, align='right')
+    page.line(cols[4], y + 5, right, y + 5, width=1)
+    y += 24
+
+    # Amount in words (A37)
+    for line in page.wrap(values.get('A37', ''), right - left, size=10, bold=True):
+        page.text(left, y, line, size=10, bold=True)
+        y += 13
+
+    # Footer from the template, then a fixed note at the bottom
+    y += 12
+    for line in static['footer']:
+        for wrapped in page.wrap(line, right - left, size=9):
+            page.text(left, y, wrapped, size=9)
+            y += 11
+    page.text(PAGE_WIDTH / 2, PAGE_HEIGHT - MARGIN, 'This is a computer-generated invoice.',
+              size=8, align='center')
+    return page
+
+
+def render_invoice_pdf_bytes(config: Dict, template_path: Optional[str] = None) -> bytes:
+    """Render an invoice config (as passed to the Excel writers) to PDF bytes."""
+    return build_invoice_page(config, template_path).to_bytes()
+
+
+def render_invoice_pdf(config: Dict, pdf_filepath: str, template_path: Optional[str] = None) -> bool:
+    """Render an invoice straight to a PDF file. Returns True on success."""
+    try:
+        data = render_invoice_pdf_bytes(config, template_path)
+        os.makedirs(os.path.dirname(pdf_filepath) or '.', exist_ok=True)
+        with open(pdf_filepath, 'wb') as f:
+            f.write(data)
+        print(f"PDF created: {pdf_filepath}")
+        return True
+    except Exception as e:
+        print(f"Error rendering PDF: {e}")
+        return False
@@ -0,0 +1,369 @@
+"""PDF converter service: a pool of long-lived converter workers.
+
+Every conversion used to start Excel, open the workbook, export it and quit
+Excel again, synchronously inside the request.  ``PdfConverterService`` keeps a
+fixed number of worker threads, each owning one warm converter backend
+(one Excel instance for the Excel backend), fed from a bounded job queue:
+
+* bursts queue up behind the warm workers instead of each request paying the
+  converter startup cost;
+* when the queue is full, ``submit`` waits at most ``timeout`` seconds for a
+  free slot and then fails the job instead of piling up requests;
+* every job has a timeout; a job still queued past it is cancelled, and a
+  worker stuck on it is retired and replaced so the pool keeps its capacity.
+  The stuck backend is killed (for Excel, the process started by that
+  worker) so a hung converter does not linger;
+* a backend that raises (e.g. Excel crashed or the COM server went away) is
+  closed and started fresh, and the job is retried once on the new instance.
+
+Backends implement the small ``ConverterBackend`` interface, so tests can run
+the service against ``FakeConverter`` without Excel.
+"""
+from __future__ import annotations
+
+import os
+import queue
+import signal
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from pdf_render import render_invoice_pdf
+
+# Attempt to import win32com.client for PDF conversion
+try:
+    import pythoncom
+    import win32com.client
+    import win32process
+    WIN32COM_AVAILABLE = True
+except ImportError:
+    WIN32COM_AVAILABLE = False
+    print("WARNING: pywin32 library not found. Excel PDF export unavailable, using built-in PDF renderer.")
+
+
+class ConversionJob(NamedTuple):
+    excel_filepath: str
+    pdf_filepath: str
+    config: Dict
+
+
+class ConverterBackend(ABC):
+    """Interface for PDF converters run by the service.
+
+    One instance is owned by one worker thread for its whole life: ``start``
+    is called on that thread before the first job, ``convert`` once per job
+    and ``close`` when the worker stops or the backend is restarted.
+    ``kill`` is the exception: the service calls it from another thread when
+    a job is stuck past its timeout.
+    """
+
+    name = 'base'
+    # Process running the conversions, if the backend starts one
+    pid: Optional[int] = None
+
+    def start(self) -> None:
+        pass
+
+    @abstractmethod
+    def convert(self, job: ConversionJob) -> bool:
+        """Convert one job; True if the PDF was written."""
+
+    def close(self) -> None:
+        pass
+
+    def kill(self) -> None:
+        """Terminate the backend's process so a stuck ``convert`` returns."""
+        if self.pid is None:
+            return
+        try:
+            os.kill(self.pid, signal.SIGTERM)
+        except OSError as e:
+            print(f"WARNING: Could not terminate PDF converter process {self.pid}: {e}")
+
+
+class ExcelConverter(ConverterBackend):
+    """Exports the generated workbook through a warm Excel instance (Windows)."""
+
+    name = 'excel'
+
+    def __init__(self):
+        self.excel = None
+
+    def start(self) -> None:
+        pythoncom.CoInitialize()
+        self.excel = win32com.client.DispatchEx("Excel.Application")
+        self.excel.Visible = False
+        self.excel.DisplayAlerts = False
+        # DispatchEx starts a private EXCEL.EXE; remember it so a hung one can be killed
+        _, self.pid = win32process.GetWindowThreadProcessId(self.excel.Hwnd)
+
+    def convert(self, job: ConversionJob) -> bool:
+        if not os.path.exists(job.excel_filepath):
+            print(f"Error: Excel file not found at {job.excel_filepath}")
+            return False
+        workbook = self.excel.Workbooks.Open(os.path.abspath(job.excel_filepath))
+        try:
+            os.makedirs(os.path.dirname(job.pdf_filepath), exist_ok=True)
+            workbook.ExportAsFixedFormat(
+                0, os.path.abspath(job.pdf_filepath),
+                Quality=0,
+                IncludeDocProperties=True,
+                IgnorePrintAreas=False,
+                OpenAfterPublish=False
+            )
+        finally:
+            workbook.Close(SaveChanges=False)
+        print(f"PDF created: {job.pdf_filepath}")
+        return True
+
+    def close(self) -> None:
+        try:
+            if self.excel is not None:
+                self.excel.Quit()
+        except Exception as e:
+            print(f"WARNING: Could not quit Excel cleanly: {e}")
+        finally:
+            self.excel = None
+            self.pid = None
+            pythoncom.CoUninitialize()
+
+
+class BuiltinConverter(ConverterBackend):
+    """Renders the PDF in-process from the invoice data (pdf_render.py)."""
+
+    name = 'builtin'
+
+    def __init__(self, template_path: Optional[str] = None):
+        self.template_path = template_path
+
+    def convert(self, job: ConversionJob) -> bool:
+        return render_invoice_pdf(job.config, job.pdf_filepath, self.template_path)
+
+
+class FakeConverter(ConverterBackend):
+    """Test double: writes a tiny placeholder PDF and records every job.
+
+    ``delay`` simulates a slow converter, ``fail`` makes ``convert`` return
+    False and ``crash_every`` makes every n-th call raise.  ``kill`` ends a
+    pending delay with an error, like a converter process that was killed.
+    """
+
+    name = 'fake'
+
+    def __init__(self, delay: float = 0.0, fail: bool = False, crash_every: int = 0):
+        self.delay = delay
+        self.fail = fail
+        self.crash_every = crash_every
+        self.calls = 0
+        self.jobs: List[ConversionJob] = []
+        self.started = 0
+        self.closed = 0
+        self.killed = 0
+        self._killed = threading.Event()
+
+    def start(self) -> None:
+        self.started += 1
+        self._killed.clear()
+
+    def convert(self, job: ConversionJob) -> bool:
+        self.calls += 1
+        if self.crash_every and self.calls % self.crash_every == 0:
+            raise RuntimeError("fake converter crashed")
+        if self.delay and self._killed.wait(self.delay):
+            raise RuntimeError("fake converter killed")
+        self.jobs.append(job)
+        if self.fail:
+            return False
+        os.makedirs(os.path.dirname(job.pdf_filepath) or '.', exist_ok=True)
+        with open(job.pdf_filepath, 'wb') as f:
+            f.write(b"%PDF-1.4\n%%EOF\n")
+        return True
+
+    def close(self) -> None:
+        self.closed += 1
+
+    def kill(self) -> None:
+        self.killed += 1
+        self._killed.set()
+
+
+class _Worker:
+    def __init__(self, service: 'PdfConverterService', number: int):
+        self.service = service
+        self.retired = False
+        self.current: Optional[Future] = None
+        self.backend: Optional[ConverterBackend] = None
+        self.thread = threading.Thread(target=self._run, name=f"pdf-worker-{number}", daemon=True)
+
+    def _run(self) -> None:
+        service = self.service
+        try:
+            while not self.retired:
+                item = service._jobs.get()
+                if item is None:  # shutdown sentinel
+                    break
+                job, future = item
+                # Set before the future runs so a timeout never misses this worker
+                self.current = future
+                if not future.set_running_or_notify_cancel():
+                    self.current = None
+                    continue
+                result = False
+                for attempt in (1, 2):
+                    try:
+                        if self.backend is None:
+                            self.backend = service.backend_factory()
+                            self.backend.start()
+                        result = self.backend.convert(job)
+                        break
+                    except Exception as e:
+                        print(f"Error converting to PDF ({self.thread.name}, attempt {attempt}): {e}")
+                        self.backend = service._discard(self.backend)
+                        if self.retired:  # killed after a timeout, a replacement is running
+                            break
+                        with service._lock:
+                            service.stats['restarts'] += 1
+                self.current = None
+                if not future.done():
+                    future.set_result(bool(result))
+        finally:
+            self.backend = service._discard(self.backend)
+
+
+class PdfConverterService:
+    """Fixed pool of converter workers fed from a bounded queue."""
+
+    def __init__(self, backend_factory: Callable[[], ConverterBackend], workers: int = 1,
+                 queue_size: int = 16, timeout: float = 60.0):
+        self.backend_factory = backend_factory
+        self.size = max(1, workers)
+        self.timeout = timeout
+        self._jobs: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._spawned = 0
+        self._closed = False
+        self.stats = {'submitted': 0, 'converted': 0, 'failed': 0, 'timeouts': 0,
+                      'rejected': 0, 'restarts': 0}
+
+    def _discard(self, backend: Optional[ConverterBackend]) -> None:
+        if backend is not None:
+            try:
+                backend.close()
+            except Exception as e:
+                print(f"WARNING: Error closing PDF converter: {e}")
+        return None
+
+    def _ensure_workers(self) -> None:
+        with self._lock:
+            self._workers = [w for w in self._workers if not w.retired and w.thread.is_alive()]
+            while len(self._workers) < self.size:
+                self._spawned += 1
+                worker = _Worker(self, self._spawned)
+                self._workers.append(worker)
+                worker.thread.start()
+
+    def _abandon(self, future: Future) -> None:
+        """Give up on a job past its timeout.
+
+        A job still in the queue is cancelled.  Otherwise the worker stuck on
+        it is retired, its backend killed (e.g. the hung Excel process) and a
+        replacement worker started.
+        """
+        if future.cancel():
+            return
+        with self._lock:
+            stuck = [w for w in self._workers if w.current is future]
+            for worker in stuck:
+                worker.retired = True
+        for worker in stuck:
+            backend = worker.backend
+            if backend is not None:
+                try:
+                    backend.kill()
+                except Exception as e:
+                    print(f"WARNING: Could not kill stuck PDF converter: {e}")
+        self._ensure_workers()
+
+    def submit(self, excel_filepath: str, pdf_filepath: str, config: Dict) -> Future:
+        """Queue a conversion; the future resolves to True/False."""
+        if self._closed:
+            raise RuntimeError("PDF converter service is shut down")
+        self._ensure_workers()
+        future: Future = Future()
+        try:
+            self._jobs.put((ConversionJob(excel_filepath, pdf_filepath, config), future),
+                           timeout=self.timeout)
+        except queue.Full:
+            with self._lock:
+                self.stats['rejected'] += 1
+            future.set_result(False)
+            print(f"WARNING: PDF queue full, skipping conversion of {excel_filepath}")
+            return future
+        with self._lock:
+            self.stats['submitted'] += 1
+        return future
+
+    def convert(self, excel_filepath: str, pdf_filepath: str, config: Dict,
+                timeout: Optional[float] = None) -> bool:
+        """Submit a conversion and wait for it (queueing time included)."""
+        future = self.submit(excel_filepath, pdf_filepath, config)
+        try:
+            ok = future.result(timeout=self.timeout if timeout is None else timeout)
+        except Exception:
+            self._abandon(future)
+            with self._lock:
+                self.stats['timeouts'] += 1
+            print(f"Error converting to PDF: timed out after {self.timeout if timeout is None else timeout}s")
+            return False
+        with self._lock:
+            self.stats['converted' if ok else 'failed'] += 1
+        return ok
+
+    def queued(self) -> int:
+        return self._jobs.qsize()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop all workers (closing their backends, e.g. quitting Excel)."""
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers)
+        for _ in workers:
+            try:
+                self._jobs.put(None, timeout=self.timeout)
+            except queue.Full:
+                break
+        if wait:
+            for worker in workers:
+                worker.thread.join(self.timeout)
+
+
+if __name__ == '__main__':
+    # Manual check of queueing, timeouts and crash recovery with the fake backend
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def out(i):
+            return os.path.join(tmp, f"{i}.pdf")
+
+        fake = FakeConverter(delay=0.05)
+        service = PdfConverterService(lambda: fake, workers=2, queue_size=4, timeout=5)
+        t0 = time.perf_counter()
+        futures = [service.submit('in.xlsx', out(i), {}) for i in range(10)]
+        results = [f.result() for f in futures]
+        print(f"burst of 10 on 2 workers: {sum(results)} ok in {time.perf_counter() - t0:.2f}s, "
+              f"backend started {fake.started}x")
+        service.shutdown()
+
+        crashy = FakeConverter(crash_every=3)
+        service = PdfConverterService(lambda: crashy, workers=1, timeout=5)
+        results = [service.convert('in.xlsx', out(i), {}) for i in range(6)]
+        print(f"crash every 3rd call: {results}, restarts {service.stats['restarts']}")
+        service.shutdown()
+
+        slow = PdfConverterService(lambda: FakeConverter(delay=1.0), workers=1, timeout=0.2)
+        print(f"job past its timeout: {slow.convert('in.xlsx', out('slow'), {})}, "
+              f"then {slow.convert('in.xlsx', out('next'), {}, timeout=3)}")
+        slow.shutdown(wait=False)
@@ -0,0 +1,313 @@
+"""Find duplicate buyer profiles and plan their merge.
+
+``cleanup_profiles`` used to treat two profiles as duplicates only when their
+lower-cased names were identical, and removed the loser from the result list
+inside the loop (O(n²)).  It missed the same GSTIN typed with different case
+or spacing and names like "M/s X Traders" vs "X Traders".  This module:
+
+1. normalizes GSTINs (upper case, no spaces or punctuation) and names (lower
+   case, no punctuation, "M/s" / "Messrs" dropped, "Private Limited" ->
+   "pvt ltd", "Shri" / "Sri" -> "shree", "&" -> "and");
+2. puts profiles into blocks that share a key: the GSTIN, the normalized
+   name, the name's sorted words, and MinHash bands of the name's trigrams
+   (so "Laxmi Steel" meets "Laxmi Steels") - only profiles in the same block
+   are compared;
+3. scores each candidate pair: same GSTIN is the same business, different
+   GSTINs (or different numbers in the names) never are, otherwise the
+   trigram similarity of the names;
+4. joins pairs above ``MERGE_THRESHOLD`` into groups (never two different
+   GSTINs in one group) and keeps the most complete profile of each group.
+
+``plan_cleanup`` only reports what would change (the dry run shown before
+cleaning up); ``apply_plan`` gives the list to save, merging all groups or
+only the ones approved in the preview.  Run
+``python profile_dedup.py buyer_profiles.json`` to preview a file, or with
+``--benchmark N`` to time N synthetic profiles.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import zlib
+from typing import Dict, List, NamedTuple, Optional
+
+# Name similarity (trigram Jaccard) from which two profiles without
+# conflicting GSTINs are proposed as duplicates
+MERGE_THRESHOLD = 0.75
+
+# Blocks larger than this are only used for exact keys; a fuzzy block this
+# big means the key is too common to say anything
+MAX_FUZZY_BLOCK = 50
+
+# MinHash: BANDS bands of ROWS hashes each
+BANDS = 6
+ROWS = 3
+
+_PREFIX_RE = re.compile(r'^(?:(?:m\s*/\s*s\.?|messrs\.?|ms\.)\s+)+', re.IGNORECASE)
+_WORD_RE = re.compile(r'[0-9a-z]+')
+_NAME_SYNONYMS = {'private': 'pvt', 'limited': 'ltd', 'company': 'co', 'corporation': 'corp',
+                  'brothers': 'bros', 'shri': 'shree', 'sri': 'shree', 'shre': 'shree'}
+_SALTS = [zlib.crc32(f"minhash-{i}".encode()) for i in range(BANDS * ROWS)]
+
+
+def normalize_gstin(gstin) -> str:
+    """'22 aaaaa-0000a1z5' -> '22AAAAA0000A1Z5'."""
+    return re.sub(r'[^0-9A-Z]', '', str(gstin or '').upper())
+
+
+def normalize_name(name) -> str:
+    """'M/s. Shree Traders Private Limited' -> 'shree traders pvt ltd'."""
+    text = _PREFIX_RE.sub('', str(name or '').strip()).lower().replace('&', ' and ')
+    return ' '.join(_NAME_SYNONYMS.get(w, w) for w in _WORD_RE.findall(text))
+
+
+def _trigrams(name: str) -> frozenset:
+    padded = f"  {name} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _numbers(name: str) -> List[str]:
+    return re.findall(r'\d+', name)
+
+
+def name_similarity(a: frozenset, b: frozenset) -> float:
+    """Jaccard similarity of two trigram sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ProfileKey(NamedTuple):
+    gstin: str
+    name: str
+    grams: frozenset
+
+
+class DuplicateGroup(NamedTuple):
+    keep: Dict                 # surviving profile
+    remove: List[Dict]         # profiles merged into it
+    score: float               # weakest similarity that joined the group
+    reason: str                # 'gstin', 'name' or 'similar name'
+
+
+class DedupPlan(NamedTuple):
+    invalid: List[Dict]        # no profile_id or buyer_name
+    repeated_ids: List[Dict]   # later copies of an already seen profile_id
+    groups: List[DuplicateGroup]
+    final_profiles: List[Dict]
+    token: str                 # identifies the input, to apply exactly what was previewed
+
+    @property
+    def removed_count(self) -> int:
+        return len(self.invalid) + len(self.repeated_ids) + sum(len(g.remove) for g in self.groups)
+
+
+def _minhash_bands(grams: frozenset, cache: Dict[str, tuple]) -> List[tuple]:
+    hashes = []
+    for gram in grams:
+        h = cache.get(gram)
+        if h is None:
+            base = zlib.crc32(gram.encode('utf-8'))
+            h = cache[gram] = tuple((base ^ salt) * 2654435761 % 4294967311 for salt in _SALTS)
+        hashes.append(h)
+    signature = [min(column) for column in zip(*hashes)]
+    return [(band, tuple(signature[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+
+def _completeness(profile: Dict, position: int) -> tuple:
+    # Prefer a GSTIN, then more detail lines, then the earlier profile
+    return (bool(normalize_gstin(profile.get('gstin'))), len(profile.get('buyer_details') or []), -position)
+
+
+def _input_token(profiles: List[Dict]) -> str:
+    canonical = json.dumps(profiles, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def plan_cleanup(profiles: List[Dict], threshold: float = MERGE_THRESHOLD) -> DedupPlan:
+    """Work out which profiles a cleanup would remove, without changing anything."""
+    invalid, repeated_ids, unique = [], [], []
+    seen_ids = set()
+    for p in profiles:
+        if not (p.get('profile_id') and p.get('buyer_name')):
+            invalid.append(p)
+        elif p['profile_id'] in seen_ids:
+            repeated_ids.append(p)
+        else:
+            seen_ids.add(p['profile_id'])
+            unique.append(p)
+
+    keys = []
+    for p in unique:
+        name = normalize_name(p['buyer_name'])
+        keys.append(ProfileKey(normalize_gstin(p.get('gstin')), name, _trigrams(name)))
+
+    # Union-find over profile positions; each root remembers its GSTIN
+    parent = list(range(len(unique)))
+    root_gstin = [k.gstin for k in keys]
+    link_score: Dict[int, float] = {}
+    link_reason: Dict[int, str] = {}
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i: int, j: int, score: float, reason: str) -> None:
+        ri, rj = find(i), find(j)
+        if ri == rj:
+            return
+        if root_gstin[ri] and root_gstin[rj] and root_gstin[ri] != root_gstin[rj]:
+            return  # two different businesses
+        parent[rj] = ri
+        root_gstin[ri] = root_gstin[ri] or root_gstin[rj]
+        link_score[ri] = min(score, link_score.get(ri, 1.0), link_score.pop(rj, 1.0))
+        reasons = {reason, link_reason.get(ri, reason), link_reason.pop(rj, reason)}
+        link_reason[ri] = next(r for r in ('similar name', 'name', 'gstin') if r in reasons)
+
+    # Exact blocks: everything sharing a GSTIN, or a name with no conflicting GSTIN
+    by_gstin: Dict[str, List[int]] = {}
+    by_name: Dict[str, List[int]] = {}
+    for i, key in enumerate(keys):
+        if key.gstin:
+            by_gstin.setdefault(key.gstin, []).append(i)
+        if key.name:
+            by_name.setdefault(key.name, []).append(i)
+    for members in by_gstin.values():
+        for j in members[1:]:
+            union(members[0], j, 1.0, 'gstin')
+    for members in by_name.values():
+        for j in members[1:]:
+            union(members[0], j, 1.0, 'name')
+
+    # Fuzzy blocks: same words in another order, or a shared MinHash band
+    blocks: Dict[tuple, List[int]] = {}
+    cache: Dict[str, tuple] = {}
+    for i, key in enumerate(keys):
+        if not key.grams:
+            continue
+        blocks.setdefault(('words', ' '.join(sorted(key.name.split()))), []).append(i)
+        for band in _minhash_bands(key.grams, cache):
+            blocks.setdefault(band, []).append(i)
+    compared = set()
+    for members in blocks.values():
+        if len(members) < 2 or len(members) > MAX_FUZZY_BLOCK:
+            continue
+        for a in range(len(members)):
+            for b in range(a + 1, len(members)):
+                i, j = members[a], members[b]
+                if (i, j) in compared or find(i) == find(j):
+                    continue
+                compared.add((i, j))
+                if keys[i].gstin and keys[j].gstin and keys[i].gstin != keys[j].gstin:
+                    continue
+                if _numbers(keys[i].name) != _numbers(keys[j].name):
+                    continue  # "Shop No 12" is not "Shop No 13"
+                score = name_similarity(keys[i].grams, keys[j].grams)
+                if score >= threshold:
+                    union(i, j, round(score, 3), 'similar name')
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(len(unique)):
+        clusters.setdefault(find(i), []).append(i)
+    groups, final_profiles = [], []
+    for root, members in clusters.items():
+        keep = max(members, key=lambda i: _completeness(unique[i], i))
+        final_profiles.append(unique[keep])
+        if len(members) > 1:
+            groups.append(DuplicateGroup(
+                keep=unique[keep],
+                remove=[unique[i] for i in members if i != keep],
+                score=link_score.get(root, 1.0),
+                reason=link_reason.get(root, 'name'),
+            ))
+    final_profiles.sort(key=lambda p: p.get('buyer_name', '').lower())
+    groups.sort(key=lambda g: (g.score, g.keep.get('buyer_name', '').lower()))
+    return DedupPlan(invalid, repeated_ids, groups, final_profiles, _input_token(profiles))
+
+
+def apply_plan(plan: DedupPlan, approved: Optional[set] = None) -> List[Dict]:
+    """Profiles to save: invalid and repeated ids dropped, and the groups whose
+    kept ``profile_id`` is in ``approved`` (all groups if None) merged."""
+    if approved is None:
+        return list(plan.final_profiles)
+    final_profiles = list(plan.final_profiles)
+    for group in plan.groups:
+        if group.keep['profile_id'] not in approved:
+            final_profiles.extend(group.remove)
+    final_profiles.sort(key=lambda p: p.get('buyer_name', '').lower())
+    return final_profiles
+
+
+def plan_summary(plan: DedupPlan) -> Dict:
+    """JSON-friendly description of a plan (for the preview)."""
+    def brief(p: Dict) -> Dict:
+        return {'profile_id': p.get('profile_id'), 'buyer_name': p.get('buyer_name'),
+                'gstin': p.get('gstin', '')}
+    return {
+        'token': plan.token,
+        'removed_count': plan.removed_count,
+        'remaining_count': len(plan.final_profiles),
+        'invalid': [brief(p) for p in plan.invalid],
+        'repeated_ids': [brief(p) for p in plan.repeated_ids],
+        'groups': [{'keep': brief(g.keep), 'remove': [brief(p) for p in g.remove],
+                    'score': g.score, 'reason': g.reason} for g in plan.groups],
+    }
+
+
+__all__ = [
+    "plan_cleanup", "apply_plan", "plan_summary", "DedupPlan", "DuplicateGroup", "normalize_gstin",
+    "normalize_name", "name_similarity", "MERGE_THRESHOLD",
+]
+
+
+if __name__ == '__main__':
+    # Manual check: python profile_dedup.py buyer_profiles.json | --benchmark N
+    import random
+    import sys
+    import time
+
+    def synthetic(count: int) -> List[Dict]:
+        rng = random.Random(2025)
+        words = ['Shree', 'Ganesh', 'Traders', 'Balaji', 'Steel', 'Agro', 'Foods', 'Laxmi', 'Krishna',
+                 'Enterprises', 'Mahavir', 'Textiles', 'Sai', 'Industries', 'Patel', 'Brothers',
+                 'Durga', 'Hari', 'Om', 'Jai', 'Ambe', 'Bharat', 'Kisan', 'Annapurna']
+        profiles = []
+        for n in range(count):
+            if profiles and rng.random() < 0.1:
+                # A near-duplicate of an earlier profile
+                base = dict(rng.choice(profiles), profile_id=f"P{n}")
+                variant = rng.random()
+                if variant < 0.4:
+                    base['gstin'] = base['gstin'].lower()[:5] + ' ' + base['gstin'][5:]
+                elif variant < 0.7:
+                    base['buyer_name'] = 'M/s ' + base['buyer_name']
+                    base['gstin'] = ''
+                else:
+                    base['buyer_name'] = base['buyer_name'].replace('Shree', 'Shri').replace('Traders', 'Trader')
+                    base['gstin'] = ''
+                profiles.append(base)
+                continue
+            name = ' '.join(rng.sample(words, 3)) + f" {rng.randint(1, 999)}"
+            profiles.append({'profile_id': f"P{n}", 'buyer_name': name,
+                             'gstin': f"{rng.randint(1, 37):02d}ABCDE{n:05d}Z{n % 10}",
+                             'buyer_details': [name, 'Main Road'], 'default_tax_type': 'IGST'})
+        return profiles
+
+    if len(sys.argv) > 2 and sys.argv[1] == '--benchmark':
+        profiles = synthetic(int(sys.argv[2]))
+    elif len(sys.argv) > 1:
+        with open(sys.argv[1], 'r', encoding='utf-8') as f:
+            profiles = json.load(f)
+    else:
+        profiles = synthetic(20000)
+    start = time.perf_counter()
+    plan = plan_cleanup(profiles)
+    elapsed = time.perf_counter() - start
+    print(f"{len(profiles)} profiles planned in {elapsed:.2f}s: {len(plan.groups)} duplicate groups, "
+          f"{plan.removed_count} to remove, {len(plan.final_profiles)} kept")
+    for group in plan.groups[:15]:
+        print(f"  {group.score:.2f} {group.reason:<12} keep {group.keep['buyer_name']!r} ({group.keep.get('gstin')}) "
+              f"<- {[p['buyer_name'] for p in group.remove]}")
@@ -0,0 +1,175 @@
+"""Trigram index for the buyer typeahead.
+
+The invoice form used to embed every buyer profile in the page and filter
+them with ``includes()`` in JavaScript, which makes the page heavy once there
+are thousands of buyers and misses spelling variants ("Shri" vs "Shree").
+This index splits the buyer name, the buyer detail lines and the GSTIN of
+every profile into character trigrams (``'shree'`` -> ``'  s', ' sh', 'shr',
+'hre', 'ree', 'ee '``) and maps each trigram to the profiles containing it.
+A query is scored by the share of its own trigrams found in a profile (ties
+go to matches in the name or GSTIN), so misspellings still share most
+trigrams with the right buyer while only the postings of the query's
+trigrams are visited.
+
+It is kept up to date through ``ProfileStore``'s listener, one profile at a
+time, and built from the store on first use.
+"""
+from __future__ import annotations
+
+import heapq
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Weight of a trigram found in each field of a profile
+FIELD_WEIGHTS = {
+    'buyer_name': 3.0,
+    'gstin': 3.0,
+    'buyer_details': 1.0,
+}
+
+# Share of the query's trigrams a profile must contain to match
+MIN_SIMILARITY = 0.5
+
+_WORD_RE = re.compile(r'[0-9a-z]+')
+
+
+def trigrams(text: str, partial: bool = False) -> set:
+    """Trigrams of every word, padded like PostgreSQL's pg_trgm.
+
+    With ``partial=True`` the last word is taken as still being typed, so it
+    gets no end padding ('shr' matches 'shree').
+    """
+    grams = set()
+    words = _WORD_RE.findall(str(text or '').lower())
+    for i, word in enumerate(words):
+        padded = f"  {word}" if partial and i == len(words) - 1 else f"  {word} "
+        grams.update(padded[j:j + 3] for j in range(len(padded) - 2))
+    return grams
+
+
+def profile_trigrams(profile: Dict) -> Dict[str, float]:
+    """trigram -> weight of the best field it appears in."""
+    grams: Dict[str, float] = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        value = profile.get(field)
+        if isinstance(value, (list, tuple)):
+            value = ' '.join(str(v) for v in value)
+        for gram in trigrams(value):
+            if grams.get(gram, 0) < weight:
+                grams[gram] = weight
+    return grams
+
+
+class ProfileSearchIndex:
+    """trigram -> {profile_id: weight} postings over the valid buyer profiles."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._docs: Dict[str, Dict[str, float]] = {}
+        self._names: Dict[str, str] = {}
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # ---------- maintenance ----------
+
+    def _remove(self, profile_id: str) -> None:
+        for gram in self._docs.pop(profile_id, {}):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.pop(profile_id, None)
+                if not postings:
+                    del self._postings[gram]
+        self._names.pop(profile_id, None)
+
+    def _add(self, profile_id: str, profile: Dict) -> None:
+        grams = profile_trigrams(profile)
+        self._docs[profile_id] = grams
+        self._names[profile_id] = ' '.join(_WORD_RE.findall(str(profile.get('buyer_name') or '').lower()))
+        for gram, weight in grams.items():
+            self._postings.setdefault(gram, {})[profile_id] = weight
+
+    def update(self, profile_id: str, profile: Optional[Dict]) -> None:
+        """(Re-)index one profile; ``profile=None`` removes it."""
+        with self._lock:
+            self._remove(profile_id)
+            if profile is not None:
+                self._add(profile_id, profile)
+
+    def rebuild(self, profiles: Iterable[Dict]) -> None:
+        """Replace the whole index with the given profiles."""
+        with self._lock:
+            self._postings, self._docs, self._names = {}, {}, {}
+            for profile in profiles:
+                if profile.get('profile_id') not in self._docs:
+                    self._add(profile['profile_id'], profile)
+            self.ready = True
+
+    # ---------- queries ----------
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """Best ``(profile_id, similarity)`` pairs, similarity in 0..1.
+
+        The query's last word may be incomplete (typeahead).
+        """
+        partial = not query[-1:].isspace()
+        grams = trigrams(query, partial=partial)
+        if not grams:
+            return []
+        with self._lock:
+            matched: Dict[str, List[float]] = {}   # profile_id -> [count, weight]
+            for gram in grams:
+                for profile_id, weight in self._postings.get(gram, {}).items():
+                    m = matched.get(profile_id)
+                    if m is None:
+                        matched[profile_id] = [1, weight]
+                    else:
+                        m[0] += 1
+                        m[1] += weight
+            needle = ' '.join(_WORD_RE.findall(query.lower()))
+            ranked = []
+            for profile_id, (count, weight) in matched.items():
+                similarity = count / len(grams)
+                if similarity < MIN_SIMILARITY:
+                    continue
+                # Among equals: matches in heavier fields, then names containing
+                # the query as typed (from a word start), then by name
+                name = self._names[profile_id]
+                ranked.append((-similarity, -weight, f" {needle}" not in f" {name}", name, profile_id))
+            top = heapq.nsmallest(limit, ranked)
+        return [(r[4], round(-r[0], 3)) for r in top]
+
+__all__ = ["ProfileSearchIndex", "FIELD_WEIGHTS", "MIN_SIMILARITY", "trigrams"]
+
+
+if __name__ == '__main__':
+    # Manual check: python profile_search.py [number of profiles]
+    import random
+    import sys
+    import time
+
+    rng = random.Random(2025)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    words = ['Shree', 'Shri', 'Ganesh', 'Traders', 'Balaji', 'Steel', 'Agro', 'Foods', 'Laxmi',
+             'Krishna', 'Enterprises', 'Mahavir', 'Textiles', 'Sai', 'Industries', 'Patel']
+    cities = ['Raipur', 'Bilaspur', 'Durg', 'Nagpur', 'Bhilai', 'Korba']
+    profiles = []
+    for n in range(count):
+        name = ' '.join(rng.sample(words, 3))
+        gstin = f"22ABCDE{n:04d}F1Z{n % 10}"
+        profiles.append({'profile_id': f"P{n}", 'buyer_name': name, 'gstin': gstin,
+                         'buyer_details': [name, f"{rng.randint(1, 99)} Main Road", rng.choice(cities),
+                                           f"GSTIN : {gstin}"]})
+    index = ProfileSearchIndex()
+    start = time.perf_counter()
+    index.rebuild(profiles)
+    print(f"{count} profiles indexed in {time.perf_counter() - start:.2f}s")
+    for query in ['shri ganesh', 'shree', 'balagi stel', 'raipur', '22abcde0042', 'kr']:
+        start = time.perf_counter()
+        for _ in range(20):
+            results = index.search(query)
+        elapsed = (time.perf_counter() - start) / 20 * 1000
+        print(f"{query!r:>15}: {elapsed:.2f} ms, best {[profiles[int(pid[1:])]['buyer_name'] for pid, _ in results[:2]]}")
@@ -0,0 +1,216 @@
+"""Process-wide buyer profile repository.
+
+Every route used to re-read and re-parse ``buyer_profiles.json`` and then find
+profiles with a linear ``next(p for p in ... if p['profile_id'] == ...)`` scan,
+re-sorting by name on each call.  ``ProfileStore`` keeps the parsed profiles in
+memory with a dict index by ``profile_id`` and a pre-sorted name view, writes
+changes straight through to disk and reloads only when the file is changed by
+someone else (another worker process, the bulk importer), detected by its
+inode + mtime + size (or by a custom ``signature`` callable, e.g. the SQLite
+profiles version).
+
+Writes re-read the latest data and save it while holding ``lock`` (an
+inter-process file lock), so concurrent workers never lose each other's
+updates.  Edits can pass the ``profile_version`` the user started from; if
+the stored profile changed in the meantime ``ProfileConflict`` is raised
+instead of silently overwriting it.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Dict, List, Optional
+
+
+class ProfileConflict(Exception):
+    """The profile changed (or already exists) since the caller last read it."""
+
+    def __init__(self, message: str, current: Optional[Dict] = None):
+        super().__init__(message)
+        self.current = current
+
+
+def profile_version(profile: Optional[Dict]) -> str:
+    """Content hash used as the optimistic-concurrency token of a profile."""
+    if profile is None:
+        return ''
+    canonical = json.dumps(profile, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def is_valid_profile(profile: Dict) -> bool:
+    return bool(profile.get('profile_id') and profile.get('buyer_name'))
+
+
+def _name_key(profile: Dict) -> str:
+    return profile.get('buyer_name', '').lower()
+
+
+class ProfileStore:
+    """Cached buyer profiles with O(1) lookup by id and write-through saves.
+
+    ``load`` reads the list of profiles from ``path`` and ``save`` writes a
+    list back (returning True on success) - normally app.load_data/save_data.
+    ``lock`` returns a context manager held around every write.
+    ``listener``, if given, is called as ``listener(profile_id, profile)`` for
+    every valid profile added or changed (by this store or found changed on
+    disk) and ``listener(profile_id, None)`` for every one removed or no
+    longer valid (used to keep the buyer search index current).
+    Profiles handed out by ``get``/``all`` are copies; ``sorted_profiles``
+    returns the shared cached view, which callers must treat as read-only.
+    """
+
+    def __init__(self, path: str, load: Callable[[str], List],
+                 save: Callable[[str, List], bool],
+                 signature: Optional[Callable[[], object]] = None,
+                 lock: Optional[Callable[[], ContextManager]] = None,
+                 listener: Optional[Callable[[str, Optional[Dict]], None]] = None):
+        self.path = path
+        self._load_fn = load
+        self._save_fn = save
+        self._signature_fn = signature
+        self._process_lock = lock or nullcontext
+        self.listener = listener
+        self._lock = threading.RLock()
+        self._signature: Optional[object] = None
+        self._profiles: List[Dict] = []
+        self._by_id: Dict[str, Dict] = {}
+        self._sorted: Optional[List[Dict]] = None
+
+    # ---------- cache maintenance ----------
+
+    def _file_signature(self) -> Optional[object]:
+        if self._signature_fn is not None:
+            return self._signature_fn()
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _install(self, profiles: List[Dict]) -> None:
+        self._profiles = profiles
+        by_id: Dict[str, Dict] = {}
+        for profile in profiles:
+            pid = profile.get('profile_id')
+            if pid and pid not in by_id:  # first occurrence wins, like next()
+                by_id[pid] = profile
+        previous, self._by_id = self._by_id, by_id
+        self._sorted = None
+        if self.listener is not None:
+            self._notify(previous, by_id)
+
+    def _notify(self, previous: Dict[str, Dict], current: Dict[str, Dict]) -> None:
+        """Tell the listener which valid profiles differ between two installs."""
+        changes = [(pid, p if is_valid_profile(p) else None) for pid, p in current.items()
+                   if previous.get(pid) != p]
+        changes += [(pid, None) for pid in previous if pid not in current]
+        for pid, profile in changes:
+            try:
+                self.listener(pid, dict(profile) if profile is not None else None)
+            except Exception as e:
+                print(f"WARNING: Profile store listener failed for {pid}: {e}")
+
+    def _refresh(self) -> None:
+        signature = self._file_signature()
+        if signature is not None and signature == self._signature:
+            return
+        profiles = self._load_fn(self.path) if signature is not None else []
+        self._install([p for p in profiles if isinstance(p, dict)])
+        self._signature = signature
+
+    def _commit(self, profiles: List[Dict]) -> bool:
+        if not self._save_fn(self.path, profiles):
+            # Keep memory in line with whatever is on disk
+            self._signature = None
+            return False
+        self._install(profiles)
+        self._signature = self._file_signature()
+        return True
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._signature = None
+
+    def refresh(self) -> None:
+        """Pick up changes made by someone else (notifying the listener)."""
+        with self._lock:
+            self._refresh()
+
+    # ---------- reads ----------
+
+    def get(self, profile_id: Optional[str]) -> Optional[Dict]:
+        if not profile_id:
+            return None
+        with self._lock:
+            self._refresh()
+            profile = self._by_id.get(profile_id)
+            return dict(profile) if profile is not None else None
+
+    def exists(self, profile_id: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return profile_id in self._by_id
+
+    def all(self) -> List[Dict]:
+        """Every stored profile (including invalid ones) in file order."""
+        with self._lock:
+            self._refresh()
+            return [dict(p) for p in self._profiles]
+
+    def sorted_profiles(self) -> List[Dict]:
+        """Valid profiles sorted by buyer name (cached until the next change)."""
+        with self._lock:
+            self._refresh()
+            if self._sorted is None:
+                self._sorted = sorted((p for p in self._profiles if is_valid_profile(p)),
+                                      key=_name_key)
+            return self._sorted
+
+    # ---------- writes (write-through) ----------
+
+    def _check_version(self, profile_id: str, expected_version: Optional[str]) -> Optional[Dict]:
+        current = self._by_id.get(profile_id)
+        if expected_version and current is not None and profile_version(current) != expected_version:
+            raise ProfileConflict(f"Profile {profile_id} was changed by someone else", dict(current))
+        return current
+
+    def add(self, profile: Dict) -> bool:
+        """Append a new profile; ProfileConflict if the id is already taken."""
+        with self._lock, self._process_lock():
+            self._refresh()
+            existing = self._by_id.get(profile.get('profile_id'))
+            if existing is not None:
+                raise ProfileConflict(f"Profile {profile.get('profile_id')} already exists", dict(existing))
+            return self._commit(self._profiles + [dict(profile)])
+
+    def update(self, profile_id: str, fields: Dict, expected_version: Optional[str] = None) -> bool:
+        """Update fields of an existing profile; False if missing or not saved.
+
+        Raises ProfileConflict if ``expected_version`` no longer matches.
+        """
+        with self._lock, self._process_lock():
+            self._refresh()
+            current = self._check_version(profile_id, expected_version)
+            if current is None:
+                return False
+            updated = dict(current, **fields)
+            return self._commit([updated if p is current else p for p in self._profiles])
+
+    def delete(self, profile_id: str, expected_version: Optional[str] = None) -> bool:
+        """Remove every profile with this id; False if missing or not saved."""
+        with self._lock, self._process_lock():
+            self._refresh()
+            if self._check_version(profile_id, expected_version) is None:
+                return False
+            return self._commit([p for p in self._profiles if p.get('profile_id') != profile_id])
+
+    def replace_all(self, profiles: List[Dict]) -> bool:
+        with self._lock, self._process_lock():
+            return self._commit([dict(p) for p in profiles])
+
+
+__all__ = ["ProfileStore", "ProfileConflict", "is_valid_profile", "profile_version"]
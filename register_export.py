@@ -0,0 +1,186 @@
+"""Invoice register export: one row per invoice, as CSV or Excel.
+
+The accountant's register lists every invoice with its number, date, buyer,
+GSTIN, taxable value, tax split and total.  The rows come from the invoice
+index (never from the workbooks) in date order and are produced one at a
+time: the CSV is sent in chunks as it is written, and the Excel file is
+written with openpyxl's ``write_only`` mode, which streams rows to disk
+instead of keeping a cell object per value.  Memory use therefore does not
+grow with the number of invoices.
+
+Command line (reads the same index as the app)::
+
+    python register_export.py register.csv --from 2025-04-01 --to 2026-03-31
+    python register_export.py register.xlsx --buyer 22AAAAA0000A1Z5
+"""
+from __future__ import annotations
+
+import csv
+import io
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+# (summary field, column heading); amounts are the numeric fields
+REGISTER_COLUMNS = (
+    ('invoice_number', 'Invoice No'),
+    ('invoice_date', 'Invoice Date'),
+    ('buyer_name', 'Buyer'),
+    ('gstin', 'GSTIN'),
+    ('taxable_value', 'Taxable Value'),
+    ('igst', 'IGST'),
+    ('cgst', 'CGST'),
+    ('sgst', 'SGST'),
+    ('total_tax', 'Total Tax'),
+    ('grand_total', 'Invoice Total'),
+)
+AMOUNT_COLUMNS = frozenset(('taxable_value', 'igst', 'cgst', 'sgst', 'total_tax', 'grand_total'))
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+# Invoice_<number>_<yyyy>_<yy>_... -> '<number>/<yyyy>-<yy>'
+_FILENAME_YEAR_RE = re.compile(r'Invoice_[^_]+_(\d{4})_(\d{2})_')
+_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def _amount(value) -> float:
+    try:
+        return round(float(value or 0), 2)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def register_row(summary: Dict) -> List:
+    """Values of one invoice in ``REGISTER_COLUMNS`` order."""
+    number = str(summary.get('invoice_number') or '')
+    m = _FILENAME_YEAR_RE.match(summary.get('filename') or '')
+    if m and '/' not in number:
+        number = f"{number}/{m.group(1)}-{m.group(2)}"
+    values = dict(summary, invoice_number=number)
+    values['total_tax'] = round(sum(_amount(summary.get(k)) for k in ('igst', 'cgst', 'sgst')), 2)
+    return [_amount(values.get(field)) if field in AMOUNT_COLUMNS else str(values.get(field) or '')
+            for field, _ in REGISTER_COLUMNS]
+
+
+def matching_invoices(summaries: Iterable[Dict], date_from: Optional[str] = None,
+                      date_to: Optional[str] = None, buyer: Optional[str] = None) -> Iterator[Dict]:
+    """The summaries dated ``date_from``..``date_to`` (inclusive) of one buyer.
+
+    ``summaries`` must be in date order; the first one past ``date_to`` ends
+    the selection.  ``buyer`` is a GSTIN or part of the buyer name.
+    """
+    needle = (buyer or '').strip().lower()
+    for summary in summaries:
+        date = str(summary.get('invoice_date') or '')
+        if date_from and date < date_from:
+            continue
+        if date_to and date > date_to:
+            break
+        if needle and needle != str(summary.get('gstin') or '').lower() \
+                and needle not in str(summary.get('buyer_name') or '').lower():
+            continue
+        yield summary
+
+
+def register_rows(summaries: Iterable[Dict], date_from: Optional[str] = None,
+                  date_to: Optional[str] = None, buyer: Optional[str] = None) -> Iterator[List]:
+    """Register rows of the ``matching_invoices``."""
+    for summary in matching_invoices(summaries, date_from, date_to, buyer):
+        yield register_row(summary)
+
+
+def check_date(value: Optional[str], name: str) -> Optional[str]:
+    """Return a YYYY-MM-DD date unchanged (None if empty); raise ValueError otherwise."""
+    if not value:
+        return None
+    if not _DATE_RE.match(value):
+        raise ValueError(f"Invalid {name} date {value!r}; use YYYY-MM-DD")
+    return value
+
+
+def csv_chunks(rows: Iterable[List], rows_per_chunk: int = 500) -> Iterator[str]:
+    """CSV text (heading first), ``rows_per_chunk`` rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([heading for _, heading in REGISTER_COLUMNS])
+    pending = 1
+    for row in rows:
+        writer.writerow(f"{v:.2f}" if isinstance(v, float) else v for v in row)
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue()
+
+
+def write_xlsx(rows: Iterable[List], target) -> int:
+    """Write the register to ``target`` (a path or binary file); returns the row count."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Invoice Register')
+    bold = Font(bold=True)
+    heading = []
+    for _, title in REGISTER_COLUMNS:
+        cell = WriteOnlyCell(sheet, value=title)
+        cell.font = bold
+        heading.append(cell)
+    sheet.append(heading)
+    count = 0
+    for row in rows:
+        cells = []
+        for value in row:
+            cell = WriteOnlyCell(sheet, value=value)
+            if isinstance(value, float):
+                cell.number_format = '#,##0.00'
+            cells.append(cell)
+        sheet.append(cells)
+        count += 1
+    workbook.save(target)
+    return count
+
+
+__all__ = ["REGISTER_COLUMNS", "EXPORT_FORMATS", "register_row", "register_rows", "matching_invoices",
+           "check_date", "csv_chunks", "write_xlsx"]
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import sys
+
+    parser = argparse.ArgumentParser(description="Export the invoice register as CSV or Excel.")
+    parser.add_argument("output", help="output file (.csv or .xlsx), or - for CSV on stdout")
+    parser.add_argument("--from", dest="date_from", help="first invoice date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", help="last invoice date (YYYY-MM-DD)")
+    parser.add_argument("--buyer", help="buyer GSTIN or part of the buyer name")
+    args = parser.parse_args()
+    try:
+        date_from = check_date(args.date_from, 'from')
+        date_to = check_date(args.date_to, 'to')
+    except ValueError as e:
+        parser.error(str(e))
+    as_csv = args.output == '-' or args.output.lower().endswith('.csv')
+    if not as_csv and not args.output.lower().endswith('.xlsx'):
+        parser.error("output must end in .csv or .xlsx")
+
+    from config import INVOICE_INDEX_JSON, OUTPUT_DIR
+    from invoice_index import InvoiceIndex, invoice_summary
+    from invoice_listing import InvoiceListing
+    from app import read_invoice_metadata
+
+    index = InvoiceIndex(INVOICE_INDEX_JSON, OUTPUT_DIR, read_invoice_metadata)
+    listing = InvoiceListing()
+    listing.rebuild(invoice_summary(f, e) for f, e in index.refresh().items())
+    rows = register_rows(listing.iterate('date', (date_from or '',)), date_from, date_to, args.buyer)
+    if as_csv:
+        out = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8-sig')
+        with out:
+            for chunk in csv_chunks(rows):
+                out.write(chunk)
+    else:
+        print(f"{write_xlsx(rows, args.output)} invoices written to {os.path.abspath(args.output)}")
@@ -0,0 +1,209 @@
+"""GST summary reports: running totals per month, buyer and tax type.
+
+Month-end GST filing meant opening every workbook of the month to add up
+the IGST / CGST / SGST rows (I30:I32).  The invoice index already reads those
+amounts once per workbook (see ``read_invoice_metadata``); this module keeps
+running totals of them in memory:
+
+* per month (``2025-04``),
+* per month and buyer (GSTIN, or the name for unregistered buyers),
+* per month and tax type (IGST, CGST+SGST, or no tax),
+
+Each invoice's contribution is remembered, so a regenerated or deleted
+invoice is subtracted before its new amounts are added.  The totals are
+updated through ``InvoiceIndex``'s listener on every ``generate_invoice`` and
+built from the index (not the workbooks) on first use; a financial year's
+report just adds up its twelve months.  Amounts are exact decimals.
+"""
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+AMOUNT_FIELDS = ('taxable_value', 'igst', 'cgst', 'sgst', 'grand_total')
+
+_PAISE = Decimal('0.01')
+
+
+class Contribution(NamedTuple):
+    month: str                 # YYYY-MM
+    buyer: str                 # GSTIN, or 'name:<buyer name>'
+    buyer_name: str
+    tax_type: str
+    amounts: tuple             # Decimals in AMOUNT_FIELDS order
+
+
+def financial_year(month: str) -> str:
+    """'2026-02' -> '2025-26' (April to March)."""
+    year, mon = int(month[:4]), int(month[5:7])
+    start = year if mon >= 4 else year - 1
+    return f"{start}-{str(start + 1)[-2:]}"
+
+
+def financial_year_months(fy: str) -> List[str]:
+    """'2025-26' -> ['2025-04', ..., '2026-03']."""
+    start = int(fy[:4])
+    return [f"{start + (m < 4)}-{m:02d}" for m in (4, 5, 6, 7, 8, 9, 10, 11, 12, 1, 2, 3)]
+
+
+def _decimal(value) -> Decimal:
+    try:
+        return Decimal(str(value or 0)).quantize(_PAISE)
+    except ArithmeticError:
+        return Decimal('0.00')
+
+
+def contribution(summary: Dict) -> Optional[Contribution]:
+    """What one invoice summary adds to the reports (None without a usable date)."""
+    date = str(summary.get('invoice_date') or '')
+    if len(date) < 7 or not date[:4].isdigit() or not date[5:7].isdigit():
+        return None
+    amounts = tuple(_decimal(summary.get(field)) for field in AMOUNT_FIELDS)
+    igst, cgst, sgst = amounts[1:4]
+    if igst:
+        tax_type = 'IGST'
+    elif cgst or sgst:
+        tax_type = 'CGST+SGST'
+    else:
+        tax_type = 'No tax'
+    gstin = str(summary.get('gstin') or '').upper()
+    buyer_name = str(summary.get('buyer_name') or '')
+    return Contribution(date[:7], gstin or f"name:{buyer_name.lower()}", buyer_name, tax_type, amounts)
+
+
+class _Bucket:
+    __slots__ = ('invoices', 'amounts')
+
+    def __init__(self):
+        self.invoices = 0
+        self.amounts = [Decimal('0.00')] * len(AMOUNT_FIELDS)
+
+    def add(self, amounts: tuple, sign: int) -> None:
+        self.invoices += sign
+        for i, amount in enumerate(amounts):
+            self.amounts[i] += amount * sign
+
+    def merge(self, other: '_Bucket') -> None:
+        self.invoices += other.invoices
+        for i, amount in enumerate(other.amounts):
+            self.amounts[i] += amount
+
+    def row(self, **labels) -> Dict:
+        row = dict(labels, invoices=self.invoices)
+        row.update((field, f"{amount:.2f}") for field, amount in zip(AMOUNT_FIELDS, self.amounts))
+        row['total_tax'] = f"{self.amounts[1] + self.amounts[2] + self.amounts[3]:.2f}"
+        return row
+
+
+class GstReports:
+    """Running GST totals, updated one invoice at a time."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._clear()
+        self.ready = False
+
+    def _clear(self) -> None:
+        self._contributions: Dict[str, Contribution] = {}
+        self._months: Dict[str, _Bucket] = {}
+        # month -> buyer / tax type -> totals
+        self._buyers: Dict[str, Dict[str, _Bucket]] = defaultdict(dict)
+        self._tax_types: Dict[str, Dict[str, _Bucket]] = defaultdict(dict)
+        self._buyer_names: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._contributions)
+
+    # ---------- maintenance ----------
+
+    def _apply(self, c: Contribution, sign: int) -> None:
+        for buckets, key in ((self._months, c.month), (self._buyers[c.month], c.buyer),
+                             (self._tax_types[c.month], c.tax_type)):
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = _Bucket()
+            bucket.add(c.amounts, sign)
+            if not bucket.invoices:
+                del buckets[key]
+        if sign > 0:
+            self._buyer_names[c.buyer] = c.buyer_name
+
+    def update(self, filename: str, summary: Optional[Dict]) -> None:
+        """Replace one invoice's contribution; ``summary=None`` removes it."""
+        with self._lock:
+            old = self._contributions.pop(filename, None)
+            if old is not None:
+                self._apply(old, -1)
+            new = contribution(summary) if summary is not None else None
+            if new is not None:
+                self._contributions[filename] = new
+                self._apply(new, 1)
+
+    def rebuild(self, summaries: Iterable[Dict]) -> None:
+        """Recompute every total from the given invoice summaries."""
+        with self._lock:
+            self._clear()
+            for summary in summaries:
+                c = contribution(summary)
+                if c is not None:
+                    self._contributions[summary['filename']] = c
+                    self._apply(c, 1)
+            self.ready = True
+
+    # ---------- reports ----------
+
+    def financial_years(self) -> List[str]:
+        """Financial years with invoices, newest first."""
+        with self._lock:
+            return sorted({financial_year(m) for m in self._months}, reverse=True)
+
+    def _months_of(self, fy: str, month: Optional[str]) -> List[str]:
+        if month:
+            if financial_year(month) != fy:
+                raise ValueError(f"Month {month} is not in financial year {fy}")
+            return [month]
+        return financial_year_months(fy)
+
+    def monthly(self, fy: str) -> Dict:
+        """One row per month of the financial year, plus the year's total."""
+        with self._lock:
+            rows, total = [], _Bucket()
+            for month in financial_year_months(fy):
+                bucket = self._months.get(month) or _Bucket()
+                rows.append(bucket.row(month=month))
+                total.merge(bucket)
+        return {'financial_year': fy, 'rows': rows, 'total': total.row(month='')}
+
+    def by_buyer(self, fy: str, month: Optional[str] = None) -> Dict:
+        """One row per buyer for the year (or one month), largest taxable value first."""
+        return self._grouped(self._buyers, 'buyer', fy, month)
+
+    def by_tax_type(self, fy: str, month: Optional[str] = None) -> Dict:
+        """One row per tax type for the year (or one month)."""
+        return self._grouped(self._tax_types, 'tax_type', fy, month)
+
+    def _grouped(self, buckets: Dict[str, Dict[str, _Bucket]], label: str, fy: str,
+                 month: Optional[str]) -> Dict:
+        months = self._months_of(fy, month)
+        with self._lock:
+            grouped: Dict[str, _Bucket] = defaultdict(_Bucket)
+            total = _Bucket()
+            for m in months:
+                for key, bucket in buckets.get(m, {}).items():
+                    grouped[key].merge(bucket)
+                    total.merge(bucket)
+            rows = []
+            for key, bucket in grouped.items():
+                if label == 'buyer':
+                    row = bucket.row(gstin='' if key.startswith('name:') else key,
+                                     buyer_name=self._buyer_names.get(key, ''))
+                else:
+                    row = bucket.row(tax_type=key)
+                rows.append(row)
+        rows.sort(key=lambda r: (-Decimal(r['taxable_value']), r.get('buyer_name') or r.get('tax_type')))
+        return {'financial_year': fy, 'month': month or '', 'rows': rows, 'total': total.row()}
+
+
+__all__ = ["GstReports", "contribution", "financial_year", "financial_year_months", "AMOUNT_FIELDS"]
@@ -0,0 +1,257 @@
+"""Optional embedded SQLite storage for profiles, transport modes and invoices.
+
+With ``STORAGE_BACKEND=sqlite`` (see config.py) the app keeps its state in a
+single SQLite database instead of rewriting ``buyer_profiles.json`` and
+``transport_modes.json`` in full on every edit:
+
+* ``profiles``        - one row per buyer profile, indexed by id, GSTIN and name
+* ``transport_modes`` - one row per mode
+* ``invoices``        - the invoice register, indexed by number, buyer, date
+  and total (mirrors the invoice index of ``OUTPUT_DIR``)
+
+``save_profiles`` / ``save_transport_modes`` accept the same full lists the
+JSON call sites pass to ``save_data`` but only write the rows that actually
+changed, so an edit touches one row instead of the whole file.
+
+Reads inside the app still go through the in-memory views (``ProfileStore``
+with its id index, the invoice listing, search and reports), which are
+loaded once and kept current by listeners; the indexed ``invoices`` table is
+the register for querying the database directly (e.g. with ``sqlite3``).
+
+The first start migrates the existing JSON files once; run
+``python sqlite_store.py migrate --force`` to import them again.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS profiles (
+    profile_id TEXT PRIMARY KEY,
+    buyer_name TEXT NOT NULL DEFAULT '',
+    gstin TEXT NOT NULL DEFAULT '',
+    default_tax_type TEXT NOT NULL DEFAULT '',
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS profiles_gstin ON profiles (gstin);
+CREATE INDEX IF NOT EXISTS profiles_name ON profiles (buyer_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS profiles_position ON profiles (position);
+CREATE TABLE IF NOT EXISTS transport_modes (
+    mode TEXT PRIMARY KEY,
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS invoices (
+    filename TEXT PRIMARY KEY,
+    invoice_number TEXT NOT NULL DEFAULT '',
+    buyer_name TEXT NOT NULL DEFAULT '',
+    invoice_date TEXT NOT NULL DEFAULT '',
+    total REAL,
+    tax_type TEXT NOT NULL DEFAULT '',
+    transport_mode TEXT NOT NULL DEFAULT '',
+    mtime REAL,
+    size INTEGER,
+    meta TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS invoices_number ON invoices (invoice_number);
+CREATE INDEX IF NOT EXISTS invoices_buyer ON invoices (buyer_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS invoices_date ON invoices (invoice_date);
+CREATE INDEX IF NOT EXISTS invoices_total ON invoices (total);
+"""
+
+
+def _parse_total(value) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(',', '')) if value not in (None, '') else None
+    except ValueError:
+        return None
+
+
+class SqliteStore:
+    """SQLite-backed storage with one connection per thread."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', ?)",
+                         (str(SCHEMA_VERSION),))
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('profiles_version', '0')")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else default
+
+    def _set_meta(self, conn: sqlite3.Connection, key: str, value: str) -> None:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # ---------- profiles ----------
+
+    def profiles_version(self) -> int:
+        """Bumped on every profile change (used to invalidate caches)."""
+        return int(self.get_meta('profiles_version', '0'))
+
+    def load_profiles(self) -> List[Dict]:
+        rows = self._connect().execute("SELECT data FROM profiles ORDER BY position").fetchall()
+        return [json.loads(row['data']) for row in rows]
+
+    def save_profiles(self, profiles: Iterable[Dict]) -> int:
+        """Store the given list, writing only new, changed, moved or removed rows.
+
+        Returns the number of rows written.  Later duplicates of a profile_id
+        are ignored (the first occurrence wins, as in ProfileStore).
+        """
+        with self._write_lock, self._connect() as conn:
+            # Take the write lock before reading so concurrent workers serialise
+            conn.execute("BEGIN IMMEDIATE")
+            existing = {row['profile_id']: (row['position'], row['data'])
+                        for row in conn.execute("SELECT profile_id, position, data FROM profiles")}
+            written = 0
+            seen = set()
+            last_position = -1
+            for profile in profiles:
+                pid = profile.get('profile_id')
+                if not pid or pid in seen:
+                    continue
+                seen.add(pid)
+                data = json.dumps(profile, ensure_ascii=False, sort_keys=True)
+                old = existing.get(pid)
+                # Keep stored positions while they stay in order; only rows
+                # that moved (or are new) get a new position.
+                position = old[0] if old and old[0] > last_position else last_position + 1
+                last_position = position
+                if old and old == (position, data):
+                    continue
+                conn.execute(
+                    "INSERT OR REPLACE INTO profiles "
+                    "(profile_id, buyer_name, gstin, default_tax_type, position, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (pid, profile.get('buyer_name', '') or '', (profile.get('gstin') or '').upper(),
+                     profile.get('default_tax_type', '') or '', position, data))
+                written += 1
+            removed = [pid for pid in existing if pid not in seen]
+            conn.executemany("DELETE FROM profiles WHERE profile_id = ?", [(pid,) for pid in removed])
+            written += len(removed)
+            if written:
+                conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 "
+                             "WHERE key = 'profiles_version'")
+            return written
+
+    # ---------- transport modes ----------
+
+    def load_transport_modes(self) -> List[str]:
+        rows = self._connect().execute("SELECT mode FROM transport_modes ORDER BY position").fetchall()
+        return [row['mode'] for row in rows]
+
+    def save_transport_modes(self, modes: Iterable[str]) -> int:
+        """Store the given list; only added/removed modes are written."""
+        modes = list(dict.fromkeys(m for m in modes if m))
+        with self._write_lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            existing = {row['mode'] for row in conn.execute("SELECT mode FROM transport_modes")}
+            next_position = conn.execute(
+                "SELECT COALESCE(MAX(position), -1) + 1 FROM transport_modes").fetchone()[0]
+            added = [m for m in modes if m not in existing]
+            conn.executemany("INSERT INTO transport_modes (mode, position) VALUES (?, ?)",
+                             [(m, next_position + i) for i, m in enumerate(added)])
+            keep = set(modes)
+            removed = [m for m in existing if m not in keep]
+            conn.executemany("DELETE FROM transport_modes WHERE mode = ?", [(m,) for m in removed])
+            return len(added) + len(removed)
+
+    # ---------- invoice register ----------
+
+    def upsert_invoice(self, summary: Dict) -> None:
+        """Insert/update one invoice from an invoice_index.invoice_summary() dict."""
+        with self._write_lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO invoices (filename, invoice_number, buyer_name, invoice_date, "
+                "total, tax_type, transport_mode, mtime, size, meta) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (summary['filename'], summary.get('invoice_number', ''), summary.get('buyer_name', ''),
+                 summary.get('invoice_date', ''), _parse_total(summary.get('total_amount')),
+                 summary.get('tax_type', ''), summary.get('transport_mode', ''),
+                 summary.get('mtime'), summary.get('size'),
+                 json.dumps(summary, ensure_ascii=False, default=str)))
+
+    def delete_invoice(self, filename: str) -> None:
+        with self._write_lock, self._connect() as conn:
+            conn.execute("DELETE FROM invoices WHERE filename = ?", (filename,))
+
+    # ---------- migration ----------
+
+    def migrate_from_json(self, profiles_path: str, transport_path: str,
+                          invoice_summaries: Iterable[Dict] = (), force: bool = False) -> bool:
+        """Import the JSON data files once.  Returns True if an import ran."""
+        if self.get_meta('migrated_from_json') and not force:
+            return False
+
+        def read(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                return []
+            except json.JSONDecodeError as e:
+                print(f"WARNING: Skipping unreadable {path}: {e}")
+                return []
+
+        profiles = [p for p in read(profiles_path) if isinstance(p, dict)]
+        modes = [m for m in read(transport_path) if isinstance(m, str)]
+        self.save_profiles(profiles)
+        self.save_transport_modes(modes)
+        invoices = 0
+        for summary in invoice_summaries:
+            self.upsert_invoice(summary)
+            invoices += 1
+        with self._write_lock, self._connect() as conn:
+            self._set_meta(conn, 'migrated_from_json', '1')
+        print(f"Migrated {len(profiles)} profiles, {len(modes)} transport modes and "
+              f"{invoices} invoices into {self.db_path}")
+        return True
+
+
+__all__ = ["SqliteStore", "SCHEMA_VERSION"]
+
+
+if __name__ == '__main__':
+    # One-shot migration: python sqlite_store.py migrate [--force]
+    import argparse
+    from config import BUYER_PROFILES_JSON, INVOICE_INDEX_JSON, OUTPUT_DIR, SQLITE_DB, TRANSPORT_MODES_JSON
+    from invoice_index import InvoiceIndex, invoice_summary
+
+    parser = argparse.ArgumentParser(description="Import the JSON data files into the SQLite database.")
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("--force", action="store_true", help="import again even if already migrated")
+    args = parser.parse_args()
+
+    from app import read_invoice_metadata
+    index = InvoiceIndex(INVOICE_INDEX_JSON, OUTPUT_DIR, read_invoice_metadata)
+    store = SqliteStore(SQLITE_DB)
+    if not store.migrate_from_json(BUYER_PROFILES_JSON, TRANSPORT_MODES_JSON,
+                                   (invoice_summary(f, e) for f, e in index.items()), force=args.force):
+        print(f"{SQLITE_DB} was already migrated (use --force to import again).")
@@ -0,0 +1,267 @@
+"""GST rules and invoice totals, shared by the server and the browser.
+
+The tax rates, the round-off rule and the amount-in-words text used to be
+written out twice in Python (``/calculate_preview`` and
+``copy1.invoice_cell_values``), and the invoice form asked the server for the
+totals on every keystroke.  The rules are now declared once here:
+
+* ``invoice_cell_values`` and ``/calculate_preview`` use ``compute_totals`` /
+  ``preview_values`` below;
+* ``templates/tax_rules.js`` is the same calculation in JavaScript.  It reads
+  ``TAX_RULES`` from this module (rendered into the page) and is included in
+  the invoice form, which now computes its preview locally.
+
+Amounts are exact decimals: every number is taken at its shortest decimal
+form (``Decimal(str(x))``), line amounts and taxes are rounded to paise and
+the total to whole rupees, half away from zero.  Each line item can carry its
+own GST rate (``gst_rate``, in percent; ``DEFAULT_GST_RATE`` otherwise); tax
+is charged per rate slab and split between IGST or CGST + SGST by the
+invoice's tax type.  ``compute_batch`` works on whole columns of line items
+at once, e.g. to recompute every invoice for a report.  The JavaScript side
+uses BigInt fixed-point arithmetic for the same results.  Run
+``python tax_rules.py`` to check both implementations agree (needs ``node``).
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import amount_words
+
+# Tax rows of the invoice (rows 30-32 of the template), in order
+TAX_COMPONENTS = [
+    {'key': 'igst', 'label': "G.S.T SALES I.G.S.T @"},
+    {'key': 'cgst', 'label': "G.S.T SALES C.G.S.T @"},
+    {'key': 'sgst', 'label': "G.S.T SALES S.G.S.T @"},
+]
+
+# GST rate (percent) of line items that do not specify one
+DEFAULT_GST_RATE = '5'
+
+# GST slabs offered on the invoice form
+GST_RATE_SLABS = ['0', '5', '12', '18', '28']
+
+# Share of each line's GST rate charged as each component, per tax type;
+# components not listed are 0%
+TAX_RULES: Dict[str, Dict[str, str]] = {
+    'IGST': {'igst': '1'},
+    'CGST_SGST': {'cgst': '0.5', 'sgst': '0.5'},
+}
+
+ZERO = Decimal('0.00')
+_PAISE = Decimal('0.01')
+_RUPEE = Decimal('1')
+_PERCENT = Decimal('0.01')
+
+
+class InvoiceTotals(NamedTuple):
+    item_amounts: List[Decimal]
+    subtotal: Decimal
+    taxes: Dict[str, Decimal]             # component key -> amount
+    tax_rates: Dict[str, List[Decimal]]   # component key -> effective % charged
+    total_before_round_off: Decimal
+    round_off: Decimal
+    rounded_total: Decimal
+
+
+def to_decimal(value) -> Decimal:
+    """Exact decimal of a form value or number ('' and None are 0)."""
+    if value is None or value == '':
+        return Decimal(0)
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value).strip())
+
+
+def _round(value: Decimal, step: Decimal) -> Decimal:
+    value = value.quantize(step, rounding=ROUND_HALF_UP)
+    return value if value else abs(value)  # no -0.00
+
+
+def rate_label(rates: Sequence[Decimal]) -> str:
+    """[5] -> '5.00%' as printed next to the tax row ('5.00%/12.00%' if mixed)."""
+    return '/'.join(f"{rate:.2f}%" for rate in rates) or "0.00%"
+
+
+def compute_batch(invoice_of_line: Sequence[int], quantities: Sequence, rates: Sequence,
+                  gst_rates: Sequence, tax_types: Sequence[str]) -> List[InvoiceTotals]:
+    """Totals of many invoices from columns of line items, in one pass.
+
+    Line ``i`` belongs to invoice ``invoice_of_line[i]`` (an index into
+    ``tax_types``) and has ``quantities[i]``, ``rates[i]`` and GST rate
+    ``gst_rates[i]`` (None or '' for the default).  Unknown tax types carry
+    no tax.
+    """
+    count = len(tax_types)
+    item_amounts: List[List[Decimal]] = [[] for _ in range(count)]
+    subtotals = [ZERO] * count
+    taxable: List[Dict[Decimal, Decimal]] = [defaultdict(Decimal) for _ in range(count)]
+    default_rate = Decimal(DEFAULT_GST_RATE)
+
+    for inv, qty, rate, gst in zip(invoice_of_line, quantities, rates, gst_rates):
+        amount = _round(to_decimal(qty) * to_decimal(rate), _PAISE)
+        item_amounts[inv].append(amount)
+        subtotals[inv] += amount
+        taxable[inv][to_decimal(gst) if gst not in (None, '') else default_rate] += amount
+
+    results = []
+    for inv, tax_type in enumerate(tax_types):
+        shares = TAX_RULES.get(tax_type, {})
+        taxes = {c['key']: ZERO for c in TAX_COMPONENTS}
+        tax_rates = {c['key']: [] for c in TAX_COMPONENTS}
+        for gst_rate in sorted(taxable[inv]):
+            for key, share in shares.items():
+                effective = gst_rate * Decimal(share)
+                taxes[key] += _round(taxable[inv][gst_rate] * effective * _PERCENT, _PAISE)
+                tax_rates[key].append(effective)
+        total = subtotals[inv] + sum(taxes.values())
+        rounded_total = _round(total, _RUPEE)
+        results.append(InvoiceTotals(
+            item_amounts=item_amounts[inv],
+            subtotal=subtotals[inv],
+            taxes=taxes,
+            tax_rates=tax_rates,
+            total_before_round_off=total,
+            round_off=_round(rounded_total - total, _PAISE),
+            rounded_total=rounded_total,
+        ))
+    return results
+
+
+def compute_totals(items: List[Dict], tax_type: str) -> InvoiceTotals:
+    """Totals of one invoice; items have ``quantity``, ``rate`` and optional ``gst_rate``."""
+    return compute_batch([0] * len(items),
+                         [item.get('quantity', 0) for item in items],
+                         [item.get('rate', 0) for item in items],
+                         [item.get('gst_rate') for item in items],
+                         [tax_type])[0]
+
+
+def amount_in_words(rounded_total) -> str:
+    """'One Lakh Twenty Three Thousand Four Hundred And Fifty Six Only'."""
+    if not rounded_total or rounded_total <= 0:
+        return "Zero Only"
+    if rounded_total >= amount_words.MAX_AMOUNT:
+        # Above 999 crore
+        return ""
+    return amount_words.amount_in_words(rounded_total, comma='')
+
+
+def preview_values(items: List[Dict], tax_type: str) -> Dict[str, object]:
+    """The live-preview figures, formatted as shown on the invoice form."""
+    totals = compute_totals(items, tax_type)
+    item_amounts = totals.item_amounts
+    return {
+        "item_amounts": [f"{a:.2f}" for a in item_amounts],
+        "item_amount": f"{item_amounts[0]:.2f}" if item_amounts else "0.00",
+        "subtotal": f"{totals.subtotal:.2f}",
+        **{f"{key}_amount": f"{amount:.2f}" for key, amount in totals.taxes.items()},
+        "total_before_round_off": f"{totals.total_before_round_off:.2f}",
+        "round_off_value": f"{totals.round_off:.2f}",
+        "rounded_total": f"{totals.rounded_total:.2f}",
+        "amount_in_words": amount_in_words(totals.rounded_total),
+    }
+
+
+def client_rules() -> Dict:
+    """What templates/tax_rules.js needs, for rendering into the page."""
+    return {'components': TAX_COMPONENTS, 'rules': TAX_RULES,
+            'default_rate': DEFAULT_GST_RATE, 'slabs': GST_RATE_SLABS}
+
+
+def check_parity(cases: List[Dict], script: Optional[str] = None) -> List[str]:
+    """Run ``cases`` through both implementations; return the mismatches.
+
+    Each case is ``{'items': [...], 'tax_type': ...}``.  Uses node to run the
+    rendered templates/tax_rules.js.
+    """
+    import json
+    import os
+    import subprocess
+    from jinja2 import Environment, FileSystemLoader
+
+    if script is None:
+        env = Environment(loader=FileSystemLoader(os.path.join(os.path.dirname(__file__), 'templates')))
+        script = env.get_template('tax_rules.js').render(tax_rules=client_rules())
+    runner = script + """
+const cases = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+process.stdout.write(JSON.stringify(cases.map(c => computePreview(c.items, c.tax_type))));
+"""
+    result = subprocess.run(['node', '-e', runner], input=json.dumps(cases),
+                            capture_output=True, text=True, check=True)
+    mismatches = []
+    for case, js in zip(cases, json.loads(result.stdout)):
+        py = preview_values(case['items'], case['tax_type'])
+        if py != js:
+            diff = {k: (py.get(k), js.get(k)) for k in set(py) | set(js) if py.get(k) != js.get(k)}
+            mismatches.append(f"{case}: {diff}")
+    return mismatches
+
+
+__all__ = [
+    "TAX_COMPONENTS", "TAX_RULES", "DEFAULT_GST_RATE", "GST_RATE_SLABS", "InvoiceTotals",
+    "to_decimal", "rate_label", "compute_batch", "compute_totals", "amount_in_words",
+    "preview_values", "client_rules",
+]
+
+
+if __name__ == '__main__':
+    # Parity check: python tax_rules.py [number of random cases]
+    import random
+    import sys
+
+    rng = random.Random(2025)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    def random_number():
+        kind = rng.random()
+        if kind < 0.3:
+            return float(rng.randint(0, 500))
+        if kind < 0.6:
+            return round(rng.uniform(0, 2000), 2)
+        if kind < 0.8:
+            return round(rng.uniform(0, 100), 3)
+        return rng.choice([0.0, 0.125, 0.5, 2.5, 10.0, 12.5, 1e6, 99999999.99, -3.0])
+
+    cases = [
+        {'items': [], 'tax_type': 'IGST'},
+        {'items': [{'quantity': 10, 'rate': 1}], 'tax_type': 'IGST'},        # 10.50 -> 11
+        {'items': [{'quantity': 0.125, 'rate': 1}], 'tax_type': 'NONE'},    # 0.125 -> 0.13
+        {'items': [{'quantity': -1.0, 'rate': 0.0}], 'tax_type': 'CGST_SGST'},  # no -0.00
+        {'items': [{'quantity': 1e-7, 'rate': 3}, {'quantity': 2, 'rate': 1e16}], 'tax_type': 'IGST'},
+        {'items': [{'quantity': 3, 'rate': 99.99, 'gst_rate': 12},
+                   {'quantity': 1, 'rate': 10, 'gst_rate': ''}], 'tax_type': 'CGST_SGST'},
+        {'items': [{'quantity': 1e5, 'rate': 1e5}], 'tax_type': 'IGST'},    # > 999 crore
+        {'items': [{'quantity': 2.5, 'rate': 0.05}], 'tax_type': 'NONE'},
+    ]
+    for _ in range(count):
+        items = [{'quantity': random_number(), 'rate': random_number(),
+                  'gst_rate': rng.choice([None, None, 0, 5, 12, 18, 28, 2.5, '18'])}
+                 for _ in range(rng.randint(1, 10))]
+        cases.append({'items': items, 'tax_type': rng.choice(['IGST', 'CGST_SGST', 'IGST', 'CGST_SGST', 'NONE'])})
+    for n in list(range(0, 2000)) + [rng.randint(0, 10 ** 10 - 1) for _ in range(5000)]:
+        cases.append({'items': [{'quantity': n, 'rate': 1}], 'tax_type': 'NONE'})
+
+    mismatches = check_parity(cases)
+    print(f"{len(cases)} cases, {len(mismatches)} mismatches")
+    for line in mismatches[:20]:
+        print(line)
+
+    # Recomputing many invoices: one batch vs one call per invoice
+    import time
+    columns = ([], [], [], [])
+    for inv, case in enumerate(cases):
+        for item in case['items']:
+            for column, value in zip(columns, (inv, item['quantity'], item['rate'], item.get('gst_rate'))):
+                column.append(value)
+    tax_types = [case['tax_type'] for case in cases]
+    start = time.perf_counter()
+    batch = compute_batch(*columns, tax_types)
+    batch_time = time.perf_counter() - start
+    start = time.perf_counter()
+    single = [compute_totals(case['items'], case['tax_type']) for case in cases]
+    single_time = time.perf_counter() - start
+    assert batch == single
+    print(f"batch: {batch_time:.2f}s, one call per invoice: {single_time:.2f}s")
+    sys.exit(1 if mismatches else 0)
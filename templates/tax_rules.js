@@ -0,0 +1,147 @@
+// Invoice totals in the browser - the JavaScript twin of tax_rules.py.
+// Keep the two in step; `python tax_rules.py` checks they agree.
+const TAX_RULES = {{ tax_rules|tojson }};
+
+// Exact decimals as BigInt fixed point: {n, s} is n / 10^s
+function toDec(value) {
+    if (value === undefined || value === null || value === '') return {n: 0n, s: 0};
+    const m = String(value).trim().match(/^([+-]?)(\d*)(?:\.(\d*))?(?:e([+-]?\d+))?$/i);
+    if (!m) return {n: 0n, s: 0};
+    const frac = m[3] || '';
+    let n = BigInt((m[2] || '0') + frac);
+    let s = frac.length - parseInt(m[4] || '0', 10);
+    if (s < 0) { n *= 10n ** BigInt(-s); s = 0; }
+    return {n: m[1] === '-' ? -n : n, s};
+}
+
+function decScale(a, s) {
+    return s > a.s ? {n: a.n * 10n ** BigInt(s - a.s), s} : a;
+}
+
+function decAdd(a, b) {
+    const s = Math.max(a.s, b.s);
+    return {n: decScale(a, s).n + decScale(b, s).n, s};
+}
+
+function decMul(a, b) {
+    return {n: a.n * b.n, s: a.s + b.s};
+}
+
+// Round to s decimals, half away from zero (Decimal ROUND_HALF_UP)
+function decRound(a, s) {
+    if (a.s <= s) return decScale(a, s);
+    const factor = 10n ** BigInt(a.s - s);
+    let q = a.n / factor;
+    const r = a.n % factor;
+    if (2n * (r < 0n ? -r : r) >= factor) q += a.n < 0n ? -1n : 1n;
+    return {n: q, s};
+}
+
+function decFormat(a, s) {
+    const d = decRound(a, s);
+    const digits = (d.n < 0n ? -d.n : d.n).toString().padStart(s + 1, '0');
+    const text = s ? `${digits.slice(0, -s)}.${digits.slice(-s)}` : digits;
+    return (d.n < 0n ? '-' : '') + text;
+}
+
+// Two decimals, as shown for amounts
+function formatAmount(value) {
+    return decFormat(toDec(value), 2);
+}
+
+function computeTotals(items, taxType) {
+    const PAISE = 2, PERCENT = {n: 1n, s: 2};
+    const itemAmounts = [];
+    let subtotal = {n: 0n, s: PAISE};
+    const taxable = new Map();  // GST rate text -> taxable amount
+    items.forEach(item => {
+        const amount = decRound(decMul(toDec(item.quantity), toDec(item.rate)), PAISE);
+        itemAmounts.push(amount);
+        subtotal = decAdd(subtotal, amount);
+        const gst = (item.gst_rate === undefined || item.gst_rate === null || item.gst_rate === '')
+            ? TAX_RULES.default_rate : item.gst_rate;
+        const rate = toDec(gst);
+        const key = decFormat(rate, 6);
+        const slab = taxable.get(key) || {rate, amount: {n: 0n, s: PAISE}};
+        slab.amount = decAdd(slab.amount, amount);
+        taxable.set(key, slab);
+    });
+    const shares = TAX_RULES.rules[taxType] || {};
+    const taxes = {};
+    TAX_RULES.components.forEach(c => { taxes[c.key] = {n: 0n, s: PAISE}; });
+    taxable.forEach(slab => {
+        Object.entries(shares).forEach(([key, share]) => {
+            const effective = decMul(slab.rate, toDec(share));
+            taxes[key] = decAdd(taxes[key], decRound(decMul(decMul(slab.amount, effective), PERCENT), PAISE));
+        });
+    });
+    let totalBeforeRoundOff = subtotal;
+    TAX_RULES.components.forEach(c => { totalBeforeRoundOff = decAdd(totalBeforeRoundOff, taxes[c.key]); });
+    const roundedTotal = decRound(totalBeforeRoundOff, 0);
+    return {
+        itemAmounts,
+        subtotal,
+        taxes,
+        totalBeforeRoundOff,
+        roundOff: decAdd(roundedTotal, {n: -totalBeforeRoundOff.n, s: totalBeforeRoundOff.s}),
+        roundedTotal
+    };
+}
+
+// Indian numbering words, as num2words(n, lang='en_IN') after clean-up
+const WORDS_ONES = ['zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine',
+    'ten', 'eleven', 'twelve', 'thirteen', 'fourteen', 'fifteen', 'sixteen', 'seventeen',
+    'eighteen', 'nineteen'];
+const WORDS_TENS = ['', '', 'twenty', 'thirty', 'forty', 'fifty', 'sixty', 'seventy', 'eighty', 'ninety'];
+
+function wordsBelow100(n) {
+    if (n < 20) return [WORDS_ONES[n]];
+    const tens = Math.floor(n / 10), ones = n % 10;
+    return ones ? [WORDS_TENS[tens], WORDS_ONES[ones]] : [WORDS_TENS[tens]];
+}
+
+function wordsBelow1000(n) {
+    const hundreds = Math.floor(n / 100), rest = n % 100;
+    const words = hundreds ? [WORDS_ONES[hundreds], 'hundred'] : [];
+    if (rest) {
+        if (hundreds) words.push('and');
+        words.push(...wordsBelow100(rest));
+    }
+    return words;
+}
+
+function amountInWords(roundedTotal) {
+    const n = Number(roundedTotal.n / 10n ** BigInt(roundedTotal.s));
+    if (n <= 0) return 'Zero Only';
+    if (n >= 1e10) return '';  // above 999 crore
+    const crore = Math.floor(n / 1e7), lakh = Math.floor(n % 1e7 / 1e5);
+    const thousand = Math.floor(n % 1e5 / 1000), rest = n % 1000;
+    const words = [];
+    if (crore) words.push(...wordsBelow1000(crore), 'crore');
+    if (lakh) words.push(...wordsBelow100(lakh), 'lakh');
+    if (thousand) words.push(...wordsBelow100(thousand), 'thousand');
+    if (rest) {
+        if (rest < 100 && words.length) words.push('and');
+        words.push(...wordsBelow1000(rest));
+    }
+    return words.map(w => w[0].toUpperCase() + w.slice(1)).join(' ') + ' Only';
+}
+
+// Same keys and strings as preview_values() / the /calculate_preview endpoint
+function computePreview(items, taxType) {
+    const totals = computeTotals(items, taxType);
+    const money = d => decFormat(d, 2);
+    const preview = {
+        item_amounts: totals.itemAmounts.map(money),
+        item_amount: totals.itemAmounts.length ? money(totals.itemAmounts[0]) : '0.00',
+        subtotal: money(totals.subtotal),
+        total_before_round_off: money(totals.totalBeforeRoundOff),
+        round_off_value: money(totals.roundOff),
+        rounded_total: money(totals.roundedTotal),
+        amount_in_words: amountInWords(totals.roundedTotal)
+    };
+    TAX_RULES.components.forEach(c => {
+        preview[`${c.key}_amount`] = money(totals.taxes[c.key]);
+    });
+    return preview;
+}
@@ -0,0 +1,29 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# The app is a flat set of modules in the project directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def app(request, tmp_path, monkeypatch):
+    """The app module, imported against data files in tmp_path."""
+    import config
+    for attr, filename in [('BASE_DIR', ''), ('BUYER_PROFILES_JSON', 'buyer_profiles.json'),
+                           ('TRANSPORT_MODES_JSON', 'transport_modes.json'),
+                           ('INVOICE_INDEX_JSON', 'invoice_index.json'),
+                           ('IMPORT_MANIFEST_JSON', 'import_manifest.json'),
+                           ('INVOICE_NUMBERS_JSON', 'invoice_numbers.json'),
+                           ('OUTPUT_DIR', 'Generated_Invoices'), ('PDF_OUTPUT_DIR', 'Generated_Invoices_PDF'),
+                           ('SQLITE_DB', 'invoice_data.db'), ('JOURNAL_DIR', '_journal'),
+                           ('CHANGE_LOG_DIR', '_changes')]:
+        monkeypatch.setattr(config, attr, os.path.join(str(tmp_path), filename))
+    monkeypatch.setattr(config, 'STORAGE_BACKEND', request.param)
+    monkeypatch.setattr(config, 'PDF_BACKEND', 'none')
+    sys.modules.pop('app', None)
+    module = importlib.import_module('app')
+    yield module
+    sys.modules.pop('app', None)
@@ -0,0 +1,63 @@
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from atomic_io import FileLock, atomic_write_json, lock_for
+
+WORKERS = 4
+INCREMENTS = 50
+
+
+def bump(path, times):
+    """Read-modify-write a shared counter, the way the app saves its data files."""
+    for _ in range(times):
+        with lock_for(path):
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            # Nested acquisition by the same thread must not deadlock
+            with lock_for(path):
+                data['count'] += 1
+                atomic_write_json(path, data)
+
+
+def test_lock_serialises_writers_in_other_processes(tmp_path):
+    path = str(tmp_path / 'counter.json')
+    atomic_write_json(path, {'count': 0})
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=bump, args=(path, INCREMENTS)) for _ in range(WORKERS)]
+    for worker in workers:
+        worker.start()
+    bump(path, INCREMENTS)
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f) == {'count': (WORKERS + 1) * INCREMENTS}
+    # No temp files left behind
+    assert sorted(os.listdir(tmp_path)) == ['counter.json', 'counter.json.lock']
+
+
+def hold(lock_path, ready, done):
+    with FileLock(lock_path):
+        ready.set()
+        done.wait(30)
+
+
+def test_lock_held_by_another_process_times_out(tmp_path):
+    lock_path = str(tmp_path / 'data.json.lock')
+    context = multiprocessing.get_context('spawn')
+    ready, done = context.Event(), context.Event()
+    holder = context.Process(target=hold, args=(lock_path, ready, done))
+    holder.start()
+    try:
+        assert ready.wait(30)
+        with pytest.raises(TimeoutError):
+            FileLock(lock_path, timeout=0.2).acquire()
+    finally:
+        done.set()
+        holder.join(30)
+    # Released when the other process lets go
+    with FileLock(lock_path, timeout=5):
+        pass
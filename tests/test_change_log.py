@@ -0,0 +1,114 @@
+import os
+
+import change_log
+from change_log import ChangeLog, content_token
+
+
+def two_workers(tmp_path, name='invoices'):
+    """Two ChangeLogs on the same file, as two worker processes would have."""
+    path = str(tmp_path / f"{name}.log")
+    return ChangeLog(name, path), ChangeLog(name, path)
+
+
+def test_versions_are_shared_between_workers(tmp_path):
+    a, b = two_workers(tmp_path)
+    start = a.sync()
+    assert b.sync() == start
+    a.record('one', content_token({'total': 1}))
+    version = a.sync()
+    assert version != start
+    assert b.sync() == version
+    assert b.since(start) == (['one'], [])
+    assert b.etag(version) == a.etag(version)
+
+
+def test_change_seen_by_every_worker_counts_once(tmp_path):
+    a, b = two_workers(tmp_path)
+    for log in (a, b):
+        log.record('one', content_token({'total': 1}))
+    version = a.sync()
+    assert b.sync() == version
+    b.record('one', content_token({'total': 2}))
+    assert b.sync() != version
+
+
+def test_since_lists_changes_and_deletions_newest_first(tmp_path):
+    log, _ = two_workers(tmp_path)
+    log.record('one', 'a')
+    log.record('two', 'a')
+    start = log.sync()
+    log.record('three', 'a')
+    log.sync()
+    log.record('one', None)
+    log.sync()
+    log.record('two', 'b')
+    log.sync()
+    assert log.since(start) == (['two', 'three'], ['one'])
+
+
+def test_unknown_or_forgotten_versions(tmp_path, monkeypatch):
+    log, _ = two_workers(tmp_path)
+    version = log.sync()
+    log_id = version.split('.')[0]
+    assert log.since('') is None
+    assert log.since('deadbeef.0') is None
+    assert log.since(f"{log_id}.99") is None
+    monkeypatch.setattr(change_log, 'MAX_TOMBSTONES', 2)
+    for key in ('one', 'two', 'three'):
+        log.record(key, None)
+        log.sync()
+    # The oldest deletion was forgotten, so its version can no longer be answered
+    assert log.since(version) is None
+    assert log.since(f"{log_id}.1") == ([], ['three', 'two'])
+
+
+def test_reset_log_gets_a_new_id(tmp_path):
+    a, b = two_workers(tmp_path)
+    version = a.sync()
+    (tmp_path / "invoices.log").unlink()
+    assert b.sync() != version
+    assert b.since(version) is None
+
+
+def test_sync_appends_only_the_changes(tmp_path):
+    log, other = two_workers(tmp_path)
+    for i in range(200):
+        log.record(f"invoice-{i}", 'a')
+    log.sync()
+    size = os.path.getsize(log.path)
+    log.record('invoice-7', 'b')
+    version = log.sync()
+    grown = os.path.getsize(log.path) - size
+    assert 0 < grown < 100
+    # The other worker reads just the new line and agrees
+    assert other.sync() == version
+    assert other.since(f"{version.split('.')[0]}.1") == (['invoice-7'], [])
+
+
+def test_superseded_lines_are_compacted_away(tmp_path, monkeypatch):
+    monkeypatch.setattr(change_log, 'COMPACT_SLACK', 10)
+    log, other = two_workers(tmp_path)
+    start = log.sync()
+    for i in range(100):
+        log.record('busy', str(i))
+        log.sync()
+    with open(log.path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    # Header plus at most one line per record and the slack
+    assert len(lines) <= 1 + 2 * 1 + 10
+    # A worker that read the file before the rewrite still follows it
+    assert other.sync() == log.sync()
+    assert other.since(start) == (['busy'], [])
+
+
+def test_torn_last_line_is_ignored_and_replaced(tmp_path):
+    log, other = two_workers(tmp_path)
+    log.record('one', 'a')
+    version = log.sync()
+    with open(log.path, 'ab') as f:
+        f.write(b'[99,"half')
+    assert other.sync() == version
+    other.record('two', 'a')
+    newer = other.sync()
+    assert log.sync() == newer
+    assert log.since(version) == (['two'], [])
@@ -0,0 +1,109 @@
+import json
+import os
+
+import pytest
+
+from invoice_numbers import DuplicateInvoiceNumber, InvoiceNumberAllocator
+
+FY = '/2025-26'
+
+
+@pytest.fixture
+def invoices_dir(tmp_path):
+    path = tmp_path / 'Generated_Invoices'
+    path.mkdir()
+    return path
+
+
+@pytest.fixture
+def allocator(tmp_path, invoices_dir):
+    return InvoiceNumberAllocator(str(tmp_path / 'invoice_numbers.json'), str(invoices_dir))
+
+
+def touch(invoices_dir, name):
+    (invoices_dir / name).write_bytes(b'')
+    return name
+
+
+def backdate(allocator, field, seq, hours):
+    """Move the timestamp of ``seq`` in ``field`` (reserved/claimed) into the past."""
+    with open(allocator.state_path, encoding='utf-8') as f:
+        state = json.load(f)
+    state['years'][FY][field][str(seq)] = f"2000-01-01T{hours:02d}:00:00"
+    with open(allocator.state_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+
+
+def test_seeded_from_existing_invoices(allocator, invoices_dir):
+    touch(invoices_dir, 'Invoice_001_2025_26_Shree_Traders.xlsx')
+    touch(invoices_dir, 'Invoice_007_2025_26_Ram_Stores.xlsx')
+    touch(invoices_dir, 'Invoice_003_2024_25_Old.xlsx')
+    touch(invoices_dir, 'notes.txt')
+    assert allocator.suggest(FY) == f"008{FY}"
+    assert allocator.suggest('/2024-25') == '004/2024-25'
+    assert allocator.owner(f"7{FY}") == 'Invoice_007_2025_26_Ram_Stores.xlsx'
+    assert os.path.exists(allocator.state_path)
+
+
+def test_reserve_release_and_free_list_collapse(allocator):
+    numbers = [allocator.reserve(FY) for _ in range(4)]
+    assert numbers == [f"00{n}{FY}" for n in range(1, 5)]
+    # A released number in the middle is handed out again first
+    assert allocator.release(numbers[1]) is True
+    assert allocator.suggest(FY) == numbers[1]
+    assert allocator.reserve(FY) == numbers[1]
+    # Releasing from the top collapses trailing free numbers into the counter
+    assert allocator.release(numbers[2]) is True
+    assert allocator.release(numbers[3]) is True
+    assert allocator.suggest(FY) == numbers[2]
+    state = json.load(open(allocator.state_path, encoding='utf-8'))['years'][FY]
+    assert state['next'] == 3 and state['free'] == []
+    assert allocator.release(numbers[3]) is False
+    assert allocator.release('not a number') is False
+
+
+def test_expired_reservations_return_to_the_pool(allocator):
+    first = allocator.reserve(FY)
+    allocator.reserve(FY)
+    backdate(allocator, 'reserved', 1, 0)
+    # suggest() sees the expiry without writing, and reserve() agrees with it
+    assert allocator.suggest(FY) == first
+    assert allocator.reserve(FY) == first
+
+
+def test_claim_rejects_numbers_used_by_other_invoices(allocator, invoices_dir):
+    name_a = touch(invoices_dir, 'Invoice_001_2025_26_BuyerA.xlsx')
+    allocator.claim(f"001{FY}", name_a)
+    with pytest.raises(DuplicateInvoiceNumber) as error:
+        allocator.claim(f"001{FY}", 'Invoice_001_2025_26_BuyerB.xlsx')
+    assert error.value.filename == name_a
+    # Re-generating the same invoice is fine
+    allocator.claim(f"001{FY}", name_a)
+    # Free-form numbers are not tracked
+    allocator.claim('A-17', 'Invoice_A_17_BuyerA.xlsx')
+
+
+def test_claim_before_the_workbook_is_written_is_not_raced(allocator):
+    # generate_invoice claims first and writes the workbook afterwards
+    allocator.claim(f"001{FY}", 'Invoice_001_2025_26_BuyerA.xlsx')
+    with pytest.raises(DuplicateInvoiceNumber):
+        allocator.claim(f"001{FY}", 'Invoice_001_2025_26_BuyerB.xlsx')
+    assert allocator.owner(f"001{FY}") == 'Invoice_001_2025_26_BuyerA.xlsx'
+
+
+def test_number_of_a_missing_invoice_can_be_reused_once_the_claim_is_stale(allocator):
+    allocator.claim(f"001{FY}", 'Invoice_001_2025_26_BuyerA.xlsx')
+    backdate(allocator, 'claimed', 1, 0)
+    allocator.claim(f"001{FY}", 'Invoice_001_2025_26_BuyerB.xlsx')
+    assert allocator.owner(f"001{FY}") == 'Invoice_001_2025_26_BuyerB.xlsx'
+
+
+def test_claim_takes_a_reservation_and_skipped_numbers_are_reused(allocator):
+    reserved = allocator.reserve(FY)
+    allocator.claim(reserved, 'Invoice_001_2025_26_A.xlsx')
+    # A manually typed higher number leaves 2-4 free for later invoices
+    allocator.claim(f"005{FY}", 'Invoice_005_2025_26_B.xlsx')
+    assert [allocator.reserve(FY) for _ in range(4)] == [f"00{n}{FY}" for n in (2, 3, 4, 6)]
+    state = json.load(open(allocator.state_path, encoding='utf-8'))['years'][FY]
+    assert state['reserved'].keys() == {'2', '3', '4', '6'}
+    assert '1' not in state['reserved']
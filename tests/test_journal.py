@@ -0,0 +1,111 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import journal as journal_module
+from journal import ChangeJournal, apply_change, diff_changes
+
+NAME = 'buyer_profiles.json'
+
+
+def profile(pid, name):
+    return {'profile_id': pid, 'buyer_name': name}
+
+
+def moment():
+    """A timestamp strictly between two journal records."""
+    time.sleep(0.002)
+    at = datetime.now()
+    time.sleep(0.002)
+    return at
+
+
+def test_diff_changes_replays_exactly():
+    old = [profile('a', 'A'), profile('b', 'B'), profile('c', 'C')]
+    new = [profile('a', 'A2'), profile('c', 'C'), profile('d', 'D')]
+    changes = diff_changes(old, new)
+    assert sorted(c['op'] for c in changes) == ['delete', 'upsert', 'upsert']
+    state = old
+    for change in changes:
+        state = apply_change(state, change)
+    assert state == new
+    # Reordered lists fall back to one exact replace
+    assert diff_changes(old, old[::-1]) == [{'op': 'replace', 'value': old[::-1]}]
+
+
+def test_state_at_replays_records_and_snapshots(tmp_path):
+    journal = ChangeJournal(str(tmp_path), compact_every=3)
+    states = [[]]
+    points = []
+    for i in range(7):
+        new = states[-1] + [profile(str(i), f"Buyer {i}")]
+        journal.record(NAME, states[-1], new)
+        states.append(new)
+        points.append(moment())
+    # Compaction started new segments along the way
+    assert len(journal.stamps(NAME)) >= 3
+    for point, state in zip(points, states[1:]):
+        assert journal.state_at(NAME, point) == state
+    assert journal.state_at(NAME, datetime(2000, 1, 1)) is None
+    assert [row['op'] for row in journal.history(NAME)].count('upsert') == 7
+
+
+def test_change_behind_the_journals_back_is_recorded_as_replace(tmp_path):
+    journal = ChangeJournal(str(tmp_path))
+    journal.record(NAME, [], [profile('a', 'A')])
+    edited = [profile('a', 'A'), profile('x', 'Imported')]
+    journal.record(NAME, edited, edited + [profile('b', 'B')])
+    at = moment()
+    assert journal.state_at(NAME, at) == edited + [profile('b', 'B')]
+    assert [row['op'] for row in journal.history(NAME)][-2:] == ['replace', 'upsert']
+
+
+def test_retention_prunes_old_segments(tmp_path, monkeypatch):
+    journal = ChangeJournal(str(tmp_path), compact_every=1000, retention_days=1)
+    journal.record(NAME, [], [profile('a', 'A')])
+    journal.compact(NAME, [profile('a', 'A')])
+    assert len(journal.stamps(NAME)) == 2
+    later = datetime.now() + timedelta(days=3)
+
+    class Later(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return later
+
+    monkeypatch.setattr(journal_module, 'datetime', Later)
+    # A quiet journal: nothing is saved, pruning on startup drops the old segment
+    ChangeJournal(str(tmp_path), retention_days=1).prune()
+    assert len(journal.stamps(NAME)) == 1
+    # The next save rolls the now stale segment over to a fresh snapshot
+    journal.record(NAME, [profile('a', 'A')], [profile('a', 'A2')])
+    stamps = journal.stamps(NAME)
+    assert len(stamps) == 2 and stamps[-1] >= later.strftime('%Y%m%d')
+
+
+def test_restore_round_trip_through_the_storage_backend(app):
+    path = app.BUYER_PROFILES_JSON
+    v1 = [profile('a', 'A'), profile('b', 'B')]
+    v2 = [profile('a', 'A renamed')]
+    assert app.save_data(path, v1)
+    at = moment()
+    assert app.save_data(path, v2)
+    assert app.load_data(path) == v2
+
+    restored = app.journal.restore(NAME, at, lambda data: app.save_data(path, data))
+    assert restored == v1
+    assert app.load_data(path) == v1
+    if app.sqlite_store is not None:
+        assert app.sqlite_store.load_profiles() == v1
+        # The tables are the data; the JSON file is not written
+        assert not os.path.exists(path)
+    else:
+        with open(path, encoding='utf-8') as f:
+            assert json.load(f) == v1
+    # The restore is journaled, so replaying to now gives the restored state
+    assert app.journal.state_at(NAME, datetime.now()) == v1
+    assert app.journal.history(NAME)[-1]['op'] in ('upsert', 'delete')
+
+
+def test_restore_without_history(app):
+    assert app.journal.restore(NAME, datetime.now(), lambda data: app.save_data(app.BUYER_PROFILES_JSON, data)) is None
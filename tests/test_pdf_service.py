@@ -0,0 +1,131 @@
+import os
+import time
+
+import pytest
+
+from pdf_service import ConverterBackend, FakeConverter, PdfConverterService
+
+
+class Factory:
+    """Backend factory that keeps every FakeConverter it made."""
+
+    def __init__(self, **options):
+        self.options = options
+        self.made = []
+
+    def __call__(self):
+        backend = FakeConverter(**self.options)
+        self.made.append(backend)
+        return backend
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    return lambda name: str(tmp_path / f"{name}.pdf")
+
+
+def test_converter_backend_is_abstract():
+    with pytest.raises(TypeError):
+        ConverterBackend()
+
+
+def test_burst_is_queued_on_warm_workers(pdf_path):
+    factory = Factory(delay=0.02)
+    service = PdfConverterService(factory, workers=2, queue_size=4, timeout=5)
+    futures = [service.submit('in.xlsx', pdf_path(i), {}) for i in range(10)]
+    assert [f.result(timeout=5) for f in futures] == [True] * 10
+    assert all(os.path.exists(pdf_path(i)) for i in range(10))
+    # Two warm backends served every job
+    assert len(factory.made) == 2
+    assert sum(len(b.jobs) for b in factory.made) == 10
+    assert service.stats['submitted'] == 10
+    service.shutdown()
+
+
+def test_full_queue_rejects_after_timeout(pdf_path):
+    factory = Factory(delay=1.0)
+    service = PdfConverterService(factory, workers=1, queue_size=1, timeout=0.1)
+    first = service.submit('in.xlsx', pdf_path('first'), {})
+    wait_for(lambda: factory.made and factory.made[0].calls == 1)
+    service.submit('in.xlsx', pdf_path('queued'), {})
+    rejected = service.submit('in.xlsx', pdf_path('rejected'), {})
+    assert rejected.result(timeout=0) is False
+    assert service.stats['rejected'] == 1
+    assert first.result(timeout=5) is True
+    service.shutdown(wait=False)
+
+
+def test_failed_conversion_returns_false(pdf_path):
+    factory = Factory(fail=True)
+    service = PdfConverterService(factory, workers=1, timeout=5)
+    assert service.convert('in.xlsx', pdf_path('out'), {}) is False
+    assert not os.path.exists(pdf_path('out'))
+    assert service.stats['failed'] == 1
+    assert service.stats['converted'] == 0
+    # A plain failure keeps the backend
+    assert service.stats['restarts'] == 0
+    assert len(factory.made) == 1
+    service.shutdown()
+
+
+def test_backend_restarted_after_exception(pdf_path):
+    factory = Factory(crash_every=2)
+    service = PdfConverterService(factory, workers=1, timeout=5)
+    results = [service.convert('in.xlsx', pdf_path(i), {}) for i in range(3)]
+    # Each crashed job is retried once on a fresh backend (which crashes on its 2nd call again)
+    assert results == [True, True, True]
+    assert service.stats['restarts'] == 2
+    assert len(factory.made) == 3
+    assert [b.closed for b in factory.made[:2]] == [1, 1]
+    service.shutdown()
+
+
+def test_stuck_worker_is_killed_and_replaced(pdf_path):
+    factory = Factory(delay=10.0)
+    service = PdfConverterService(factory, workers=1, timeout=0.2)
+    assert service.convert('in.xlsx', pdf_path('stuck'), {}) is False
+    assert service.stats['timeouts'] == 1
+    wait_for(lambda: factory.made[0].killed == 1)
+    factory.options['delay'] = 0.0  # the replacement backend is quick
+    assert service.convert('in.xlsx', pdf_path('next'), {}, timeout=5) is True
+    assert factory.made[0] not in [w.backend for w in service._workers]
+    assert len(factory.made) == 2
+    # The retired worker closes its killed backend and exits
+    wait_for(lambda: factory.made[0].closed == 1)
+    assert service.stats['restarts'] == 0
+    service.shutdown()
+
+
+def test_queued_job_past_timeout_is_cancelled(pdf_path):
+    factory = Factory(delay=0.5)
+    service = PdfConverterService(factory, workers=1, timeout=5)
+    busy = service.submit('in.xlsx', pdf_path('busy'), {})
+    wait_for(lambda: factory.made and factory.made[0].calls == 1)
+    assert service.convert('in.xlsx', pdf_path('queued'), {}, timeout=0.05) is False
+    assert busy.result(timeout=5) is True
+    service.shutdown()
+    # The busy worker was left alone and the queued job never ran
+    assert factory.made[0].killed == 0
+    assert len(factory.made) == 1
+    assert [os.path.basename(j.pdf_filepath) for j in factory.made[0].jobs] == ['busy.pdf']
+
+
+def test_shutdown_closes_backends_and_refuses_jobs(pdf_path):
+    factory = Factory()
+    service = PdfConverterService(factory, workers=3, timeout=5)
+    futures = [service.submit('in.xlsx', pdf_path(i), {}) for i in range(6)]
+    assert all(f.result(timeout=5) for f in futures)
+    threads = [w.thread for w in service._workers]
+    service.shutdown()
+    assert not any(t.is_alive() for t in threads)
+    assert all(b.closed == b.started for b in factory.made)
+    with pytest.raises(RuntimeError):
+        service.submit('in.xlsx', pdf_path('late'), {})
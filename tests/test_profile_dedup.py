@@ -0,0 +1,81 @@
+from profile_dedup import apply_plan, normalize_gstin, normalize_name, plan_cleanup
+
+
+def profile(pid, name, gstin='', details=()):
+    return {'profile_id': pid, 'buyer_name': name, 'gstin': gstin, 'buyer_details': list(details)}
+
+
+def ids(profiles):
+    return sorted(p['profile_id'] for p in profiles)
+
+
+def test_normalization():
+    assert normalize_gstin(' 22 aaaaa-0000a1z5 ') == '22AAAAA0000A1Z5'
+    assert normalize_name('M/s. Shri Traders Private Limited') == 'shree traders pvt ltd'
+    assert normalize_name('Messrs Patel & Sons') == 'patel and sons'
+
+
+def test_same_gstin_typed_differently_is_merged():
+    plan = plan_cleanup([profile('a', 'Balaji Agro', '27ABCDE1234F1Z5'),
+                         profile('b', 'Balaji Agro Foods Ltd', '27 abcde-1234f1z5', ['Pune'])])
+    [group] = plan.groups
+    assert group.reason == 'gstin'
+    # The profile with more details survives
+    assert group.keep['profile_id'] == 'b'
+    assert ids(group.remove) == ['a']
+    assert ids(plan.final_profiles) == ['b']
+
+
+def test_ms_prefix_and_similar_names_are_merged():
+    plan = plan_cleanup([profile('a', 'Laxmi Steel Traders', '24AAAAA0000A1Z5'),
+                         profile('b', 'M/s Laxmi Steel Traders'),
+                         profile('c', 'Messrs. Laxmi Steels Traders'),
+                         profile('d', 'Krishna Textiles')])
+    [group] = plan.groups
+    assert group.keep['profile_id'] == 'a'  # has a GSTIN
+    assert ids(group.remove) == ['b', 'c']
+    assert group.reason == 'similar name'
+    assert ids(plan.final_profiles) == ['a', 'd']
+
+
+def test_different_gstins_or_numbers_are_never_merged():
+    plan = plan_cleanup([profile('a', 'Ganesh Traders', '27ABCDE1234F1Z5'),
+                         profile('b', 'Ganesh Traders', '29ABCDE1234F1Z5'),
+                         # Joins one of them, never both
+                         profile('c', 'M/s Ganesh Traders'),
+                         profile('d', 'Sai Industries Shop No 12'),
+                         profile('e', 'Sai Industries Shop No 13')])
+    assert [(g.keep['profile_id'], ids(g.remove)) for g in plan.groups] == [('a', ['c'])]
+    assert ids(plan.final_profiles) == ['a', 'b', 'd', 'e']
+
+
+def test_invalid_and_repeated_ids_are_dropped():
+    plan = plan_cleanup([profile('a', 'Om Foods'), profile('', 'No Id'), profile('x', ''),
+                         profile('a', 'Om Foods again')])
+    assert ids(plan.invalid) == ['', 'x']
+    assert [p['buyer_name'] for p in plan.repeated_ids] == ['Om Foods again']
+    assert plan.removed_count == 3
+    assert apply_plan(plan, set()) == [profile('a', 'Om Foods')]
+
+
+def test_only_approved_groups_are_merged():
+    profiles = [profile('a', 'Durga Agro', '27AAAAA1111A1Z5'), profile('b', 'M/s Durga Agro'),
+                profile('c', 'Hari Om Textiles', '27BBBBB2222B1Z5'), profile('d', 'Hari Om Textiles')]
+    plan = plan_cleanup(profiles)
+    assert len(plan.groups) == 2
+    assert ids(apply_plan(plan)) == ['a', 'c']
+    assert ids(apply_plan(plan, {'a'})) == ['a', 'c', 'd']
+    assert ids(apply_plan(plan, set())) == ['a', 'b', 'c', 'd']
+
+
+def test_cleanup_form_merges_the_ticked_groups(app):
+    client = app.app.test_client()
+    assert app.profile_store.replace_all([
+        profile('a', 'Durga Agro', '27AAAAA1111A1Z5'), profile('b', 'M/s Durga Agro'),
+        profile('c', 'Hari Om Textiles', '27BBBBB2222B1Z5'), profile('d', 'Hari Om Textiles')])
+    token = plan_cleanup(app.profile_store.all()).token
+    # A stale preview changes nothing
+    assert client.post('/cleanup_profiles', data={'plan_token': 'stale', 'merge': 'a'}).status_code == 302
+    assert len(app.profile_store.all()) == 4
+    client.post('/cleanup_profiles', data={'plan_token': token, 'merge': 'c'})
+    assert ids(app.profile_store.all()) == ['a', 'b', 'c']
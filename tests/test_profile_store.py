@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from atomic_io import atomic_write_json, lock_for
+from profile_store import ProfileConflict, ProfileStore, profile_version
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save(path, data):
+    atomic_write_json(path, data)
+    return True
+
+
+def make_store(path):
+    return ProfileStore(path, load, save, lock=lambda: lock_for(path))
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / 'buyer_profiles.json')
+    save(path, [{'profile_id': 'acme', 'buyer_name': 'Acme', 'gstin': ''}])
+    return path
+
+
+def test_stale_profile_version_is_a_conflict(path):
+    mine, theirs = make_store(path), make_store(path)
+    opened = profile_version(mine.get('acme'))
+    assert theirs.update('acme', {'buyer_name': 'Acme Traders'}, expected_version=opened)
+    with pytest.raises(ProfileConflict) as conflict:
+        mine.update('acme', {'buyer_name': 'Acme Ltd'}, expected_version=opened)
+    assert conflict.value.current['buyer_name'] == 'Acme Traders'
+    assert load(path)[0]['buyer_name'] == 'Acme Traders'
+    with pytest.raises(ProfileConflict):
+        mine.delete('acme', expected_version=opened)
+    # Saving again from the current version goes through
+    current = profile_version(conflict.value.current)
+    assert mine.update('acme', {'buyer_name': 'Acme Ltd'}, expected_version=current)
+    assert theirs.get('acme')['buyer_name'] == 'Acme Ltd'
+
+
+def test_adding_a_taken_id_is_a_conflict(path):
+    with pytest.raises(ProfileConflict):
+        make_store(path).add({'profile_id': 'acme', 'buyer_name': 'Other'})
+    assert len(load(path)) == 1
+
+
+def test_edit_form_with_stale_version_gets_409(app):
+    client = app.app.test_client()
+    assert app.profile_store.add({'profile_id': 'acme', 'buyer_name': 'Acme', 'buyer_details': [],
+                                  'gstin': '', 'default_tax_type': 'IGST'})
+    opened = profile_version(app.profile_store.get('acme'))
+    assert app.profile_store.update('acme', {'buyer_name': 'Acme Traders'})
+    form = {'buyer_name': 'Acme Ltd', 'buyer_details_textarea': '', 'gstin': '',
+            'default_tax_type': 'IGST', 'profile_version': opened}
+    response = client.post('/manage_profile/acme', data=form)
+    assert response.status_code == 409
+    assert b'changed by someone else' in response.data
+    assert app.profile_store.get('acme')['buyer_name'] == 'Acme Traders'
+    # The re-rendered form carries the current version, so saving again overwrites
+    form['profile_version'] = profile_version(app.profile_store.get('acme'))
+    assert client.post('/manage_profile/acme', data=form).status_code == 302
+    assert app.profile_store.get('acme')['buyer_name'] == 'Acme Ltd'
@@ -0,0 +1,84 @@
+"""The browser preview (templates/tax_rules.js) must agree with tax_rules.py."""
+import random
+import shutil
+
+import pytest
+
+from tax_rules import check_parity, preview_values
+
+pytestmark = pytest.mark.skipif(shutil.which('node') is None, reason="needs node to run tax_rules.js")
+
+
+def case(tax_type, *items):
+    return {'items': [dict(zip(('quantity', 'rate', 'gst_rate'), item)) for item in items],
+            'tax_type': tax_type}
+
+
+EDGE_CASES = {
+    # Half a paisa rounds away from zero, in line amounts, taxes and the total
+    'half_paise_line': case('NONE', (0.125, 1)),
+    'half_paise_tax': case('IGST', (1, 0.1, 5)),
+    'half_paise_cgst_split': case('CGST_SGST', (1, 0.3, 5)),
+    'half_rupee_total': case('IGST', (10, 1)),
+    'tiny_quantities': case('NONE', (2.5, 0.05), (1e-7, 3)),
+    # Several slabs on one invoice, each taxed separately
+    'mixed_slabs': case('CGST_SGST', (3, 99.99, 12), (1, 10, ''), (7, 14.3, 18), (2, 5.55, 28)),
+    'mixed_slabs_igst': case('IGST', (1, 333.33, 5), (1, 333.33, 12), (1, 333.34, 18)),
+    'fractional_slab': case('CGST_SGST', (4, 12.5, 2.5), (1, 100, '18')),
+    # Zero and blank rates
+    'zero_gst_rate': case('IGST', (5, 100, 0)),
+    'zero_gst_rate_text': case('CGST_SGST', (5, 100, '0')),
+    'blank_gst_rate_is_default': case('IGST', (5, 100, ''), (1, 1, None)),
+    'blank_quantity_and_rate': case('CGST_SGST', ('', 100, 5), (3, '', 12)),
+    'zero_amounts': case('CGST_SGST', (-1.0, 0.0), (0, 0)),
+    'no_items': case('IGST'),
+    # The same invoice as IGST and as CGST + SGST
+    'igst': case('IGST', (17, 23.45, 18), (3, 0.99, 5)),
+    'cgst_sgst': case('CGST_SGST', (17, 23.45, 18), (3, 0.99, 5)),
+    'unknown_tax_type': case('NONE', (17, 23.45, 18)),
+    # Large amounts, including totals past what amount-in-words covers
+    'lakhs_and_crores': case('IGST', (1234, 98765.43, 28), (1, 1e6, 5)),
+    'above_999_crore': case('IGST', (1e5, 1e5)),
+    'huge_rate': case('CGST_SGST', (2, 1e16), (1, 99999999.99, 12)),
+}
+
+
+@pytest.mark.parametrize('name', sorted(EDGE_CASES))
+def test_edge_case_parity(name):
+    assert check_parity([EDGE_CASES[name]]) == []
+
+
+def test_edge_case_values():
+    # Anchor a few of the edge cases to the amounts a person would write
+    assert preview_values(**EDGE_CASES['half_paise_line'])['item_amount'] == '0.13'
+    assert preview_values(**EDGE_CASES['half_rupee_total'])['rounded_total'] == '11.00'
+    zero = preview_values(**EDGE_CASES['zero_amounts'])
+    assert zero['item_amounts'] == ['0.00', '0.00'] and zero['amount_in_words'] == 'Zero Only'
+    igst = preview_values(**EDGE_CASES['igst'])
+    split = preview_values(**EDGE_CASES['cgst_sgst'])
+    assert igst['subtotal'] == split['subtotal']
+    assert split['cgst_amount'] == split['sgst_amount'] and igst['cgst_amount'] == '0.00'
+    assert preview_values(**EDGE_CASES['above_999_crore'])['amount_in_words'] == ''
+
+
+def random_number(rng):
+    kind = rng.random()
+    if kind < 0.3:
+        return float(rng.randint(0, 500))
+    if kind < 0.6:
+        return round(rng.uniform(0, 2000), 2)
+    if kind < 0.8:
+        return round(rng.uniform(0, 100), 3)
+    return rng.choice([0.0, 0.125, 0.5, 2.5, 10.0, 12.5, 1e6, 99999999.99, -3.0, ''])
+
+
+def test_random_invoice_parity():
+    rng = random.Random(2025)
+    cases = []
+    for _ in range(2000):
+        items = [(random_number(rng), random_number(rng), rng.choice([None, '', 0, 5, 12, 18, 28, 2.5, '18']))
+                 for _ in range(rng.randint(1, 10))]
+        cases.append(case(rng.choice(['IGST', 'CGST_SGST', 'NONE']), *items))
+    # Whole-rupee totals across the amount-in-words range
+    cases += [case('NONE', (rng.randint(0, 10 ** 10 - 1), 1)) for _ in range(500)]
+    assert check_parity(cases) == []
@@ -0,0 +1,74 @@
+from decimal import Decimal
+
+import pytest
+
+from tax_rules import compute_batch, compute_totals, preview_values, rate_label
+
+D = Decimal
+
+# 299.97 at 12%, 10.00 at the default 5% and 100.10 at 18%
+MIXED = [{'quantity': 3, 'rate': 99.99, 'gst_rate': 12},
+         {'quantity': 1, 'rate': 10, 'gst_rate': ''},
+         {'quantity': 7, 'rate': 14.3, 'gst_rate': '18'}]
+
+
+def test_mixed_slabs_are_taxed_per_slab_and_split_by_tax_type():
+    cgst_sgst, igst, none = compute_batch([0, 0, 0, 1, 1, 1, 2, 2, 2],
+                                          [item['quantity'] for item in MIXED] * 3,
+                                          [item['rate'] for item in MIXED] * 3,
+                                          [item['gst_rate'] for item in MIXED] * 3,
+                                          ['CGST_SGST', 'IGST', 'NONE'])
+
+    assert cgst_sgst.item_amounts == [D('299.97'), D('10.00'), D('100.10')]
+    assert cgst_sgst.subtotal == D('410.07')
+    # 0.25 (2.5% of 10.00) + 18.00 (6% of 299.97 = 17.9982) + 9.01 (9% of 100.10 = 9.009)
+    assert cgst_sgst.taxes == {'igst': D('0.00'), 'cgst': D('27.26'), 'sgst': D('27.26')}
+    assert cgst_sgst.tax_rates == {'igst': [], 'cgst': [D('2.5'), D('6'), D('9')],
+                                   'sgst': [D('2.5'), D('6'), D('9')]}
+    assert rate_label(cgst_sgst.tax_rates['cgst']) == '2.50%/6.00%/9.00%'
+    assert cgst_sgst.total_before_round_off == D('464.59')
+    assert (cgst_sgst.round_off, cgst_sgst.rounded_total) == (D('0.41'), D('465'))
+
+    # 0.50 + 36.00 (35.9964) + 18.02 (18.018)
+    assert igst.taxes == {'igst': D('54.52'), 'cgst': D('0.00'), 'sgst': D('0.00')}
+    assert igst.tax_rates['igst'] == [D('5'), D('12'), D('18')]
+    assert igst.rounded_total == D('465')
+
+    # Unknown tax types carry no tax
+    assert sum(none.taxes.values()) == 0
+    assert none.rounded_total == D('410')
+
+    # The batch agrees with one call per invoice
+    assert [cgst_sgst, igst, none] == [compute_totals(MIXED, tax_type)
+                                       for tax_type in ['CGST_SGST', 'IGST', 'NONE']]
+
+
+@pytest.mark.parametrize('items, tax_type, field, expected', [
+    # Half a paisa in a line amount rounds up
+    ([{'quantity': 0.125, 'rate': 1}], 'NONE', 'item_amounts', [D('0.13')]),
+    # ...even where the float is a hair below it in binary
+    ([{'quantity': 1.005, 'rate': 1}], 'NONE', 'item_amounts', [D('1.01')]),
+    # ...and away from zero for negative amounts
+    ([{'quantity': -0.125, 'rate': 1}], 'NONE', 'item_amounts', [D('-0.13')]),
+    # 5% of 0.10 = 0.005
+    ([{'quantity': 1, 'rate': 0.1, 'gst_rate': 5}], 'IGST', 'taxes',
+     {'igst': D('0.01'), 'cgst': D('0.00'), 'sgst': D('0.00')}),
+    # 2.5% of 0.20 = 0.005, in each half of the split
+    ([{'quantity': 1, 'rate': 0.2, 'gst_rate': 5}], 'CGST_SGST', 'taxes',
+     {'igst': D('0.00'), 'cgst': D('0.01'), 'sgst': D('0.01')}),
+    # 10.00 + 0.50 IGST = 10.50 rounds up to 11
+    ([{'quantity': 10, 'rate': 1}], 'IGST', 'rounded_total', D('11')),
+    ([{'quantity': 10, 'rate': 1}], 'IGST', 'round_off', D('0.50')),
+    # Just under half a rupee rounds down
+    ([{'quantity': 1, 'rate': 10.49}], 'NONE', 'rounded_total', D('10')),
+])
+def test_halves_round_up(items, tax_type, field, expected):
+    assert getattr(compute_totals(items, tax_type), field) == expected
+
+
+def test_zero_totals_have_no_negative_zero():
+    totals = compute_totals([{'quantity': -1.0, 'rate': 0.0}], 'CGST_SGST')
+    values = preview_values([{'quantity': -1.0, 'rate': 0.0}], 'CGST_SGST')
+    assert str(totals.item_amounts[0]) == '0.00'
+    assert values['rounded_total'] == '0.00'
+    assert values['amount_in_words'] == 'Zero Only'
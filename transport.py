@@ -0,0 +1,27 @@
+"""Transport mode normalisation shared by the app and the bulk importer."""
+
+TRANSPORT_PREFIX_VARIANTS = [
+    'mode of transport:', 'mode of transports:', 
+    'mode of transport', 'mode of transports'
+]
+
+
+def extract_transport_core(raw: str) -> str:
+    """Extract the core transport value without prefix."""
+    if not raw:
+        return ''
+    val = raw.strip()
+    low = val.lower()
+    for prefix in TRANSPORT_PREFIX_VARIANTS:
+        if low.startswith(prefix):
+            val = val[len(prefix):].strip(' -:')
+            break
+    return val.strip()
+
+
+def normalize_transport_mode(raw: str) -> str:
+    """Normalize transport mode to a canonical format."""
+    core = extract_transport_core(raw)
+    if not core:
+        return ''
+    return f"Mode of Transport: {core}"
@@ -0,0 +1,313 @@
+"""Zip-level invoice writer: patch the template .xlsx instead of rebuilding it.
+
+An .xlsx file is a zip of XML parts.  Instead of loading the template into
+openpyxl's object model and saving a brand new workbook (which drops images,
+print areas, conditional formatting and anything else openpyxl does not
+model), this engine copies every part of the template through unchanged and
+only rewrites:
+
+* the ``<c>`` elements of the variable invoice cells in the first worksheet
+  (keeping each cell's template style ``s``), and
+* ``xl/sharedStrings.xml``, to which the new text values are appended.
+
+Cell values come from ``copy1.invoice_cell_values`` so both engines write the
+same data.  Select it with ``INVOICE_ENGINE=zip`` (see config.py).
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+import zipfile
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from xml.sax.saxutils import escape, unescape
+
+from copy1 import invoice_cell_values
+from xlsx_reader import first_sheet_part
+
+_ROW_RE = re.compile(r'<row\b([^>]*?)(/>|>(.*?)</row>)', re.S)
+_CELL_RE = re.compile(r'<c\b([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+_ATTR_R_RE = re.compile(r'\br="([A-Z]+)(\d+)"')
+_ATTR_S_RE = re.compile(r'\bs="(\d+)"')
+_FORMULA_VALUE_RE = re.compile(r'(<f\b.*?(?:/>|</f>))\s*<v>.*?</v>', re.S)
+_SST_COUNT_RE = re.compile(r'\b(count|uniqueCount)="(\d+)"')
+_SI_RE = re.compile(r'<si\b[^>]*>(.*?)</si>', re.S)
+_PLAIN_SI_RE = re.compile(r'<t(?:\s[^>]*)?>([^<]*)</t>$')
+_CALC_CHAIN = 'xl/calcChain.xml'
+_CALC_CHAIN_REL_RE = re.compile(r'<Relationship\b[^>]*?\bTarget="[^"]*calcChain\.xml"[^>]*/>')
+_CALC_CHAIN_TYPE_RE = re.compile(r'<Override\b[^>]*?\bPartName="/xl/calcChain\.xml"[^>]*/>')
+_CALC_PR_RE = re.compile(r'<calcPr\b([^>]*?)\s*(/?)>')
+_FULL_CALC_RE = re.compile(r'\s+fullCalcOnLoad="[^"]*"')
+# workbook.xml children that follow <calcPr> in the schema
+_AFTER_CALC_PR_RE = re.compile(r'<(?:oleSize|customWorkbookViews|pivotCaches|smartTagPr|smartTagTypes|'
+                               r'webPublishing|fileRecoveryPr|webPublishObjects|extLst)\b|</workbook>')
+
+
+def _col_index(letters: str) -> int:
+    idx = 0
+    for ch in letters:
+        idx = idx * 26 + (ord(ch) - 64)
+    return idx
+
+
+def _split_ref(ref: str) -> Tuple[str, int]:
+    m = re.match(r'([A-Z]+)(\d+)$', ref)
+    return m.group(1), int(m.group(2))
+
+
+class _Row(NamedTuple):
+    attrs: str                      # attributes of the <row> tag (incl. r=)
+    cells: Tuple[Tuple[int, str, str], ...]  # (column index, style attr, cell xml)
+    xml: str                        # original row xml, reused when untouched
+
+
+class PatchTemplate(NamedTuple):
+    """Template parts pre-split for patching (cached per template mtime)."""
+    mtime: float
+    parts: Tuple[Tuple[zipfile.ZipInfo, bytes], ...]
+    sheet_name: str
+    sheet_head: str
+    sheet_tail: str
+    rows: Dict[int, _Row]
+    sst_name: Optional[str]
+    sst_xml: Optional[str]
+    sst_unique: int
+    sst_index: Dict[str, int]       # plain template strings -> shared index
+
+
+_cache: Dict[str, PatchTemplate] = {}
+_cache_lock = threading.Lock()
+
+
+def _parse_rows(sheet_data: str) -> Dict[int, _Row]:
+    rows = {}
+    for m in _ROW_RE.finditer(sheet_data):
+        attrs = m.group(1)
+        row_num = int(re.search(r'\br="(\d+)"', attrs).group(1))
+        cells = []
+        for cm in _CELL_RE.finditer(m.group(3) or ''):
+            ref = _ATTR_R_RE.search(cm.group(1))
+            style = _ATTR_S_RE.search(cm.group(1))
+            cells.append((_col_index(ref.group(1)), style.group(1) if style else '', cm.group(0)))
+        rows[row_num] = _Row(attrs=attrs, cells=tuple(cells), xml=m.group(0))
+    return rows
+
+
+def _recalculate_on_load(workbook_xml: str) -> str:
+    """Set ``<calcPr fullCalcOnLoad="1"/>`` so the formulas are recalculated on open."""
+    m = _CALC_PR_RE.search(workbook_xml)
+    if m:
+        attrs = _FULL_CALC_RE.sub('', m.group(1))
+        return (workbook_xml[:m.start()] + f'<calcPr{attrs} fullCalcOnLoad="1"{m.group(2)}>'
+                + workbook_xml[m.end():])
+    at = _AFTER_CALC_PR_RE.search(workbook_xml).start()
+    return workbook_xml[:at] + '<calcPr fullCalcOnLoad="1"/>' + workbook_xml[at:]
+
+
+def _template_parts(zf: zipfile.ZipFile) -> Tuple[Tuple[zipfile.ZipInfo, bytes], ...]:
+    """The template's parts, minus the calculation chain.
+
+    The invoice writes constants over some template formula cells (I29,
+    I33), so a calcChain.xml saved by Excel would point at cells without a
+    formula and Excel would offer to "repair" the file.  The chain is
+    dropped (with its relationship and content type) and the workbook is
+    marked for a full recalculation on load, which also fills in the
+    formula results removed from the sheet.
+    """
+    parts = []
+    for info in zf.infolist():
+        if info.filename == _CALC_CHAIN:
+            continue
+        data = zf.read(info.filename)
+        if info.filename == 'xl/_rels/workbook.xml.rels':
+            data = _CALC_CHAIN_REL_RE.sub('', data.decode('utf-8')).encode('utf-8')
+        elif info.filename == '[Content_Types].xml':
+            data = _CALC_CHAIN_TYPE_RE.sub('', data.decode('utf-8')).encode('utf-8')
+        elif info.filename == 'xl/workbook.xml':
+            data = _recalculate_on_load(data.decode('utf-8')).encode('utf-8')
+        parts.append((info, data))
+    return tuple(parts)
+
+
+def _load_template(source_filepath: str, mtime: float) -> PatchTemplate:
+    with zipfile.ZipFile(source_filepath) as zf:
+        sheet_name = first_sheet_part(zf)
+        sst_name = 'xl/sharedStrings.xml' if 'xl/sharedStrings.xml' in zf.namelist() else None
+        parts = _template_parts(zf)
+    contents = {info.filename: data for info, data in parts}
+
+    sheet_xml = contents[sheet_name].decode('utf-8')
+    m = re.search(r'<sheetData\s*/>|<sheetData\b[^>]*>(.*?)</sheetData>', sheet_xml, re.S)
+    sheet_head = sheet_xml[:m.start()]
+    sheet_tail = sheet_xml[m.end():]
+    # Drop cached results of template formulas; fullCalcOnLoad (see
+    # _template_parts) makes Excel recalculate them with the new values.
+    rows = _parse_rows(_FORMULA_VALUE_RE.sub(r'\1', m.group(1) or ''))
+
+    sst_xml = contents[sst_name].decode('utf-8') if sst_name else None
+    sst_items = _SI_RE.findall(sst_xml) if sst_xml else []
+    sst_index = {}
+    for idx, item in enumerate(sst_items):
+        plain = _PLAIN_SI_RE.match(item)
+        if plain:
+            sst_index.setdefault(unescape(plain.group(1)), idx)
+    return PatchTemplate(mtime=mtime, parts=parts, sheet_name=sheet_name,
+                         sheet_head=sheet_head + '<sheetData>', sheet_tail='</sheetData>' + sheet_tail,
+                         rows=rows, sst_name=sst_name, sst_xml=sst_xml,
+                         sst_unique=len(sst_items), sst_index=sst_index)
+
+
+def get_patch_template(source_filepath: str) -> Optional[PatchTemplate]:
+    try:
+        mtime = os.path.getmtime(source_filepath)
+    except OSError:
+        return None
+    with _cache_lock:
+        cached = _cache.get(source_filepath)
+        if cached is None or cached.mtime != mtime:
+            cached = _load_template(source_filepath, mtime)
+            _cache[source_filepath] = cached
+        return cached
+
+
+def _number_xml(value) -> str:
+    # Same formatting openpyxl uses, so both engines store identical numbers
+    return "%.16g" % value
+
+
+class _SharedStrings:
+    """Appends new strings to the template's shared string table.
+
+    Strings already present in the template are referenced, not duplicated.
+    """
+
+    def __init__(self, template: PatchTemplate):
+        self.enabled = template.sst_xml is not None
+        self.next_index = template.sst_unique
+        self.template_index = template.sst_index
+        self.added: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def add(self, text: str) -> int:
+        if text in self.template_index:
+            return self.template_index[text]
+        if text not in self.index:
+            self.index[text] = self.next_index + len(self.added)
+            self.added.append(text)
+        return self.index[text]
+
+    def render(self, sst_xml: str) -> str:
+        if not self.added:
+            return sst_xml
+        new_items = ''.join(f'<si><t xml:space="preserve">{escape(t)}</t></si>' for t in self.added)
+
+        def bump(m):
+            return f'{m.group(1)}="{int(m.group(2)) + len(self.added)}"'
+
+        head, sep, tail = sst_xml.rpartition('</sst>')
+        open_end = head.index('>', head.index('<sst')) + 1
+        head = _SST_COUNT_RE.sub(bump, head[:open_end]) + head[open_end:]
+        return head + new_items + sep + tail
+
+
+def _cell_xml(ref: str, style: str, value, strings: _SharedStrings) -> str:
+    s_attr = f' s="{style}"' if style else ''
+    if value is None or value == '':
+        return f'<c r="{ref}"{s_attr}/>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"{s_attr}><v>{_number_xml(value)}</v></c>'
+    text = str(value)
+    if strings.enabled:
+        return f'<c r="{ref}"{s_attr} t="s"><v>{strings.add(text)}</v></c>'
+    return f'<c r="{ref}"{s_attr} t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _render_sheet_data(template: PatchTemplate, values: Dict, strings: _SharedStrings) -> str:
+    by_row: Dict[int, Dict[int, Tuple[str, object]]] = {}
+    for ref, value in values.items():
+        col, row = _split_ref(ref)
+        by_row.setdefault(row, {})[_col_index(col)] = (ref, value)
+
+    out = []
+    for row_num in sorted(set(template.rows) | set(by_row)):
+        row = template.rows.get(row_num)
+        updates = by_row.get(row_num)
+        if not updates:
+            out.append(row.xml)
+            continue
+        cells = {col: (style, xml) for col, style, xml in row.cells} if row else {}
+        for col, (ref, value) in updates.items():
+            style = cells.get(col, ('', ''))[0]
+            cells[col] = (style, _cell_xml(ref, style, value, strings))
+        attrs = row.attrs if row else f' r="{row_num}"'
+        out.append(f'<row{attrs}>' + ''.join(cells[c][1] for c in sorted(cells)) + '</row>')
+    return ''.join(out)
+
+
+def patch_excel_template(source_filepath, destination_filepath, config):
+    """
+    Creates an invoice by patching the template .xlsx at the zip/XML level.
+
+    Same signature as copy1.copy_excel_with_formatting.  Every template part
+    except the first worksheet and the shared string table is written back
+    unchanged, apart from dropping the calculation chain (see
+    _template_parts).
+    """
+    template = get_patch_template(source_filepath)
+    if template is None:
+        print(f"Error: Source file not found at {source_filepath}")
+        return
+
+    strings = _SharedStrings(template)
+    sheet_xml = (template.sheet_head
+                 + _render_sheet_data(template, invoice_cell_values(config), strings)
+                 + template.sheet_tail)
+    replaced = {template.sheet_name: sheet_xml.encode('utf-8')}
+    if template.sst_name:
+        replaced[template.sst_name] = strings.render(template.sst_xml).encode('utf-8')
+
+    try:
+        with zipfile.ZipFile(destination_filepath, 'w', zipfile.ZIP_DEFLATED) as out:
+            for info, data in template.parts:
+                out.writestr(info, replaced.get(info.filename, data))
+        print(f"File patched successfully to {destination_filepath}")
+    except Exception as e:
+        print(f"Error saving destination file in xlsx_patch.py: {e}")
+        raise  # Re-raise the exception to be caught by app.py
+
+
+def compare_with_openpyxl_engine(source_filepath, config) -> List[str]:
+    """Generate with both engines and return the cells whose values differ."""
+    import tempfile
+    import openpyxl
+    from copy1 import copy_excel_with_formatting
+
+    with tempfile.TemporaryDirectory() as tmp:
+        a = os.path.join(tmp, 'openpyxl.xlsx')
+        b = os.path.join(tmp, 'zip.xlsx')
+        copy_excel_with_formatting(source_filepath, a, config)
+        patch_excel_template(source_filepath, b, config)
+        wa = openpyxl.load_workbook(a).active
+        wb = openpyxl.load_workbook(b).active
+        refs = {c.coordinate for ws in (wa, wb) for row in ws.iter_rows() for c in row}
+        return sorted(ref for ref in refs if wa[ref].value != wb[ref].value)
+
+
+if __name__ == '__main__':
+    # Manual check: python xlsx_patch.py "GST Invoices/Bill.xlsx"
+    import sys
+    from config import TEMPLATE_EXCEL_FILE
+
+    template_path = sys.argv[1] if len(sys.argv) > 1 else TEMPLATE_EXCEL_FILE
+    sample = {
+        "buyer_details": ["Buyer :", "Sample Traders", "Main Road", "GSTIN : 22AAAAA0000A1Z5"],
+        "mode_of_transport": "Mode of Transport: By Road",
+        "items": [{"description": "1. Aluminium Utensils (5 Bags)", "quantity": 12.5, "rate": 240.75},
+                  {"description": "2. Steel Utensils", "quantity": 3, "rate": 99.99}],
+        "tax_type": "CGST_SGST",
+        "invoice_number": "INVOICE No. 001/2025-26",
+        "invoice_date": "Date : 01/04/2025",
+    }
+    for tax_type in ("IGST", "CGST_SGST"):
+        diff = compare_with_openpyxl_engine(template_path, dict(sample, tax_type=tax_type))
+        print(f"{tax_type}: {'identical cell values' if not diff else 'differs at ' + ', '.join(diff)}")
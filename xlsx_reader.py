@@ -0,0 +1,298 @@
+"""Fast reader for a handful of fixed cells in invoice workbooks.
+
+The app and the importer only ever need ~30 known cells from an invoice
+(buyer block, transport, item rows, tax totals).  ``openpyxl.load_workbook``
+builds the whole workbook with styles to get them.  ``read_cells`` opens the
+.xlsx zip, streams the first worksheet with an incremental XML parser, stops
+as soon as every requested cell has been seen and only resolves the shared
+strings that are actually referenced.
+
+Values match ``openpyxl.load_workbook(path, data_only=True)[ref].value``:
+shared/inline/formula strings -> str, numbers -> int or float, booleans ->
+bool, errors -> the error string, date-formatted numbers -> datetime, and
+formulas without a cached result -> None.
+"""
+from __future__ import annotations
+
+import posixpath
+import re
+import zipfile
+from typing import Dict, Iterable, List
+from xml.etree.ElementTree import iterparse
+
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REF_RE = re.compile(r'([A-Z]+)(\d+)$')
+
+# Every cell the app and importer read from an invoice workbook
+INVOICE_CELLS = tuple(
+    ['E2', 'H2', 'E10']
+    + [f'A{r}' for r in range(8, 16)]
+    + [f'{c}{r}' for r in range(18, 28) for c in 'AFGI']
+    + ['C30', 'C31', 'E30', 'E31']
+    + [f'I{r}' for r in range(29, 36)]
+)
+
+
+def _col_index(letters: str) -> int:
+    idx = 0
+    for ch in letters:
+        idx = idx * 26 + (ord(ch) - 64)
+    return idx
+
+
+def _col_letters(idx: int) -> str:
+    letters = ''
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def first_sheet_part(zf: zipfile.ZipFile) -> str:
+    """Resolve the zip member of the first worksheet via workbook.xml rels."""
+    try:
+        workbook = zf.read('xl/workbook.xml').decode('utf-8')
+        rels = zf.read('xl/_rels/workbook.xml.rels').decode('utf-8')
+        sheet = re.search(r'<(?:\w+:)?sheet\b[^>]*?\br:id="([^"]+)"', workbook)
+        if sheet is None:
+            sheet = re.search(r'<(?:\w+:)?sheet\b[^>]*?\bid="([^"]+)"', workbook)
+        rel = re.search(r'<Relationship\b[^>]*?\bId="%s"[^>]*?/>' % re.escape(sheet.group(1)), rels)
+        target = re.search(r'\bTarget="([^"]+)"', rel.group(0)).group(1)
+        if target.startswith('/'):
+            return target.lstrip('/')
+        return posixpath.normpath(posixpath.join('xl', target))
+    except (KeyError, AttributeError):
+        return 'xl/worksheets/sheet1.xml'
+
+
+def _text(elem) -> str:
+    """Concatenate <t> runs (plain and rich text), skipping phonetic runs."""
+    parts = []
+    for child in elem:
+        if child.tag == _NS + 't':
+            parts.append(child.text or '')
+        elif child.tag == _NS + 'r':
+            t = child.find(_NS + 't')
+            if t is not None:
+                parts.append(t.text or '')
+    return ''.join(parts)
+
+
+def _shared_strings(zf: zipfile.ZipFile, wanted: Iterable[int]) -> Dict[int, str]:
+    """Read only the shared strings with the given indices (stops early)."""
+    wanted = set(wanted)
+    found: Dict[int, str] = {}
+    if not wanted:
+        return found
+    try:
+        fh = zf.open('xl/sharedStrings.xml')
+    except KeyError:
+        return found
+    last = max(wanted)
+    with fh:
+        idx = 0
+        for _, elem in iterparse(fh):
+            if elem.tag != _NS + 'si':
+                continue
+            if idx in wanted:
+                found[idx] = _text(elem)
+            elem.clear()
+            if idx >= last:
+                break
+            idx += 1
+    return found
+
+
+_date_style_cache: Dict[tuple, frozenset] = {}
+
+
+def _date_style_ids(zf: zipfile.ZipFile) -> frozenset:
+    """Indices of cellXfs entries that use a date/time number format.
+
+    Invoices generated from the same template share an identical styles.xml,
+    so results are cached by the part's CRC and size from the zip directory.
+    """
+    try:
+        info = zf.getinfo('xl/styles.xml')
+    except KeyError:
+        return frozenset()
+    key = (info.CRC, info.file_size)
+    if key not in _date_style_cache:
+        _date_style_cache[key] = frozenset(_parse_date_style_ids(zf))
+    return _date_style_cache[key]
+
+
+def _parse_date_style_ids(zf: zipfile.ZipFile) -> set:
+    try:
+        from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+    except ImportError:
+        return set()
+    custom = {}
+    date_ids = set()
+    try:
+        fh = zf.open('xl/styles.xml')
+    except KeyError:
+        return date_ids
+    with fh:
+        in_xfs = False
+        xf_idx = 0
+        for event, elem in iterparse(fh, events=('start', 'end')):
+            if event == 'start':
+                if elem.tag == _NS + 'cellXfs':
+                    in_xfs = True
+                continue
+            if elem.tag == _NS + 'numFmt':
+                custom[int(elem.get('numFmtId'))] = elem.get('formatCode', '')
+            elif elem.tag == _NS + 'xf' and in_xfs:
+                fmt_id = int(elem.get('numFmtId', 0))
+                fmt = custom.get(fmt_id, BUILTIN_FORMATS.get(fmt_id, 'General'))
+                if is_date_format(fmt):
+                    date_ids.add(xf_idx)
+                xf_idx += 1
+            elif elem.tag == _NS + 'cellXfs':
+                break
+    return date_ids
+
+
+def _is_1904(zf: zipfile.ZipFile) -> bool:
+    try:
+        return b'date1904="1"' in zf.read('xl/workbook.xml') or \
+            b'date1904="true"' in zf.read('xl/workbook.xml')
+    except KeyError:
+        return False
+
+
+def _cast_number(value: str):
+    if '.' in value or 'E' in value or 'e' in value:
+        return float(value)
+    return int(value)
+
+
+def read_cells(filepath: str, refs: Iterable[str] = INVOICE_CELLS) -> Dict[str, object]:
+    """Return {ref: value} for the requested cells of the first worksheet.
+
+    Missing cells are returned as None, like openpyxl does.
+    """
+    refs = list(refs)
+    wanted = set(refs)
+    last_row = max(int(_REF_RE.match(r).group(2)) for r in refs) if refs else 0
+    raw: Dict[str, tuple] = {}
+
+    with zipfile.ZipFile(filepath) as zf:
+        with zf.open(first_sheet_part(zf)) as fh:
+            row_num = 0
+            col_num = 0
+            for _, elem in iterparse(fh):
+                tag = elem.tag
+                if tag == _NS + 'c':
+                    ref = elem.get('r')
+                    if ref:
+                        m = _REF_RE.match(ref)
+                        row_num = int(m.group(2))
+                        col_num = _col_index(m.group(1))
+                    else:
+                        col_num += 1
+                        ref = f'{_col_letters(col_num)}{row_num + 1}'
+                    if row_num > last_row:
+                        break
+                    if ref in wanted:
+                        v = elem.find(_NS + 'v')
+                        if elem.get('t') == 'inlineStr':
+                            is_ = elem.find(_NS + 'is')
+                            value = _text(is_) if is_ is not None else None
+                        else:
+                            value = v.text if v is not None else None
+                        raw[ref] = (elem.get('t', 'n'), value, elem.get('s'))
+                        if len(raw) == len(wanted):
+                            break
+                elif tag == _NS + 'row':
+                    # Cells without r= are numbered from their row's position
+                    row_num = int(elem.get('r', row_num + 1))
+                    col_num = 0
+                    elem.clear()
+                    if row_num >= last_row:
+                        break
+                elif tag == _NS + 'sheetData':
+                    break
+
+        strings = _shared_strings(
+            zf, (int(v) for t, v, _ in raw.values() if t == 's' and v is not None))
+        date_ids = None
+        epoch_1904 = None
+        result: Dict[str, object] = {}
+        for ref in refs:
+            cell_type, value, style = raw.get(ref, ('n', None, None))
+            if value is None:
+                result[ref] = None
+            elif cell_type == 's':
+                result[ref] = strings.get(int(value))
+            elif cell_type in ('str', 'inlineStr', 'e'):
+                result[ref] = value
+            elif cell_type == 'b':
+                result[ref] = value == '1' or value.lower() == 'true'
+            elif cell_type == 'd':
+                from openpyxl.utils.datetime import from_ISO8601
+                result[ref] = from_ISO8601(value)
+            else:
+                number = _cast_number(value)
+                if style and style != '0':
+                    if date_ids is None:
+                        date_ids = _date_style_ids(zf)
+                    if int(style) in date_ids:
+                        from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel
+                        if epoch_1904 is None:
+                            epoch_1904 = _is_1904(zf)
+                        number = from_excel(number, CALENDAR_MAC_1904 if epoch_1904 else CALENDAR_WINDOWS_1900)
+                result[ref] = number
+    return result
+
+
+def compare_with_openpyxl(paths: List[str], refs: Iterable[str] = INVOICE_CELLS) -> Dict[str, object]:
+    """Benchmark read_cells against openpyxl.load_workbook on the given files."""
+    import time
+    import openpyxl
+
+    refs = list(refs)
+    mismatches: List[str] = []
+    t0 = time.perf_counter()
+    fast = [read_cells(p, refs) for p in paths]
+    t1 = time.perf_counter()
+    slow = []
+    for path in paths:
+        wb = openpyxl.load_workbook(path, data_only=True)
+        sheet = wb.active
+        slow.append({ref: sheet[ref].value for ref in refs})
+        wb.close()
+    t2 = time.perf_counter()
+    for path, fast_values, slow_values in zip(paths, fast, slow):
+        for ref in refs:
+            if slow_values[ref] != fast_values[ref]:
+                mismatches.append(f"{path}!{ref}: {slow_values[ref]!r} != {fast_values[ref]!r}")
+    return {
+        'files': len(paths),
+        'read_cells_ms': (t1 - t0) * 1000,
+        'load_workbook_ms': (t2 - t1) * 1000,
+        'mismatches': mismatches,
+    }
+
+
+if __name__ == '__main__':
+    # Benchmark against openpyxl: python xlsx_reader.py [folder]
+    import os
+    import sys
+    from config import OUTPUT_DIR
+
+    folder = sys.argv[1] if len(sys.argv) > 1 else OUTPUT_DIR
+    files = [os.path.join(folder, f) for f in sorted(os.listdir(folder))
+             if f.endswith('.xlsx') and not f.startswith('~')]
+    if not files:
+        print(f"No .xlsx files found in {folder}")
+        sys.exit(0)
+    report = compare_with_openpyxl(files)
+    print(f"Files:          {report['files']}")
+    print(f"read_cells:     {report['read_cells_ms']:.1f} ms")
+    print(f"load_workbook:  {report['load_workbook_ms']:.1f} ms")
+    for line in report['mismatches'][:20]:
+        print(f"MISMATCH {line}")
+    print("All values identical." if not report['mismatches'] else
+          f"{len(report['mismatches'])} mismatching cells.")